@@ -0,0 +1,257 @@
+"""Analysis of the results of `benchmark.py`. in_tests and out_tests are read once into NumPy arrays
+(see `load()`), from which every statistic is computed without a loop over the results:
+    `lengthStats()`:    the mean, quantiles and bootstrap confidence interval of the mean of a time, for
+                        each method and bin of expression lengths
+    `fitExponents()`:   the empirical complexity exponent k of each method, fitted by least squares as
+                        log(t) = log(c) + k log(length) for the construction time, the time per word
+                        and the size of the structure which evaluates the words (see `memory.py`)
+    `counterStats()`:   the mean operations of each method per word and per symbol read (see `counters.py`)
+
+The tables are exported as CSV files for reports (see `export()`).
+
+Running:
+    From the root directory:
+    $ python2 benchmark/analysis.py [directory [length bin width]]
+
+Output:
+    The exponents of each method, and the files exponents.csv, counters.csv and <measure>.csv for each
+    of MEASURES in directory ("analysis" by default)
+"""
+from __future__ import print_function
+import collections
+import csv
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+
+from util import DBWrapper
+
+UNSOLVED_TIME = 1000000.0       # the time saved for a method which could not finish (see `benchmark.py`)
+QUANTILES = [5, 25, 50, 75, 95]
+BOOTSTRAP_SAMPLES = 200         # resamples of each length bin for the confidence interval of its mean
+BOOTSTRAP_MAX_N = 1000          # larger bins use the normal approximation of the mean instead
+CONFIDENCE = 95                 # percent covered by the confidence intervals
+# the measures compared across methods: not the peaks m_pre and m_eval (see `memory.PeakMemory`)
+MEASURES = ["t_pre", "t_word", "m_retained"]
+
+class Results(object):
+    """The results of out_tests as columns: element i of every array is about the same result"""
+    def __init__(self, methods, method, length, t_pre, t_evalA, t_evalR, n_evalA, n_evalR,
+            m_pre=None, m_eval=None, m_retained=None):
+        """
+        :param list<str> methods: the names of the methods
+        :param array-like method: the index in methods of the method of each result
+        :param array-like length: the length of each result's expression (see in_tests)
+        :param array-like m_pre: the bytes of each result in out_memory, NaN if it was not measured
+        """
+        self.methods = list(methods)
+        self.method = np.asarray(method, dtype=np.int64)
+        self.length = np.asarray(length, dtype=np.float64)
+        self.t_pre = np.asarray(t_pre, dtype=np.float64)
+        self.t_evalA = np.asarray(t_evalA, dtype=np.float64)
+        self.t_evalR = np.asarray(t_evalR, dtype=np.float64)
+        n_eval = np.asarray(n_evalA, dtype=np.float64) + np.asarray(n_evalR, dtype=np.float64)
+
+        # a result is only used if its method finished (not timed out) on every word
+        self.solved = (self.t_pre < UNSOLVED_TIME) & (self.t_evalA < UNSOLVED_TIME) \
+            & (self.t_evalR < UNSOLVED_TIME) & (n_eval > 0)
+        self.t_word = np.full(len(self.method), np.nan)
+        self.t_word[n_eval > 0] = (self.t_evalA + self.t_evalR)[n_eval > 0] / n_eval[n_eval > 0]
+        for name, values in [("m_pre", m_pre), ("m_eval", m_eval), ("m_retained", m_retained)]:
+            setattr(self, name, np.full(len(self.method), np.nan) if values is None
+                else np.asarray(values, dtype=np.float64))
+
+    def __len__(self):
+        return len(self.method)
+
+def load(db):
+    """Reads every result of out_tests, with the length and the number of words of its expression and
+    its memory in out_memory
+    :param DBWrapper db:
+    :returns Results:
+    """
+    methods = db.selectall("""
+        SELECT tout.method, count(*)
+        FROM in_tests as tin, out_tests as tout
+        WHERE tin.re_math==tout.re_math
+        GROUP BY tout.method
+        ORDER BY tout.method;
+    """)
+    rows = np.array(db.selectall("""
+        SELECT tin.length, tout.t_pre, tout.t_evalA, tout.t_evalR, tin.n_evalA, tin.n_evalR,
+            tmem.m_pre, tmem.m_eval, tmem.m_retained
+        FROM in_tests as tin
+            JOIN out_tests as tout ON tin.re_math==tout.re_math
+            LEFT JOIN out_memory as tmem ON tout.re_math==tmem.re_math AND tout.method==tmem.method
+        ORDER BY tout.method;
+    """), dtype=np.float64).reshape(-1, 9) # NULL memory is NaN
+    method = np.repeat(np.arange(len(methods)), [count for _, count in methods])
+    return Results([m for m, _ in methods], method, *rows.T)
+
+def _groups(results, lengthBucketSize):
+    """:returns Tuple(numpy.ndarray, numpy.ndarray): the key of the (method, length bin) group of each
+        result, which sorts by method and then by bin, and its bin
+    """
+    bins = (results.length // lengthBucketSize).astype(np.int64)
+    return results.method * (bins.max() + 1 if len(bins) > 0 else 1) + bins, bins
+
+def bootstrapMean(values, nboot=BOOTSTRAP_SAMPLES, confidence=CONFIDENCE, rng=None):
+    """:param numpy.ndarray values:
+    :returns Tuple(float, float): the confidence interval of the mean of values, from the percentiles
+        of the means of nboot resamples of values (or the normal approximation, for more than
+        BOOTSTRAP_MAX_N values)
+    """
+    rng = rng or np.random.RandomState(0)
+    alpha = (100 - confidence) / 2.0
+    if len(values) > BOOTSTRAP_MAX_N:
+        z = {90: 1.645, 95: 1.960, 99: 2.576}.get(confidence, 1.960)
+        error = z * values.std(ddof=1) / np.sqrt(len(values))
+        return values.mean() - error, values.mean() + error
+    means = values[rng.randint(0, len(values), (nboot, len(values)))].mean(axis=1)
+    low, high = np.percentile(means, [alpha, 100 - alpha])
+    return low, high
+
+def lengthStats(results, values, lengthBucketSize=1, nboot=BOOTSTRAP_SAMPLES, rng=None):
+    """The statistics of values for each method and bin of lengthBucketSize expression lengths, over
+    the solved results
+    :param numpy.ndarray values: of each result (e.g., results.t_pre)
+    :param int nboot: the resamples of the confidence interval of the means (see `bootstrapMean()`),
+        or 0 to skip them
+    :returns OrderedDict<str, numpy.ndarray>: the columns method, bin, count, unsolved (the results of
+        the bin which are not counted), length (the mean), mean, low, high (the confidence interval of
+        the mean) and a column pX for each X of QUANTILES, one row per bin with solved results
+    """
+    rng = rng or np.random.RandomState(0)
+    key, bins = _groups(results, lengthBucketSize)
+    keep = results.solved & ~np.isnan(values)
+    order = np.flatnonzero(keep)[np.lexsort((values[keep], key[keep]))] # by group, then by value
+    sortedValues = values[order]
+    groups, starts, counts = np.unique(key[order], return_index=True, return_counts=True)
+    first = order[starts]
+
+    table = collections.OrderedDict()
+    table["method"] = np.array(results.methods, dtype=object)[results.method[first]]
+    table["bin"] = bins[first] * lengthBucketSize
+    table["count"] = counts
+    table["unsolved"] = np.bincount(key[~keep], minlength=key.max() + 1 if len(key) > 0 else 0)[groups]
+    table["length"] = np.add.reduceat(results.length[order], starts) / counts if len(groups) > 0 else np.zeros(0)
+    table["mean"] = np.add.reduceat(sortedValues, starts) / counts if len(groups) > 0 else np.zeros(0)
+    table["low"] = np.full(len(groups), np.nan)
+    table["high"] = np.full(len(groups), np.nan)
+    if nboot > 0:
+        for i, (start, count) in enumerate(zip(starts, counts)):
+            if count > 1:
+                table["low"][i], table["high"][i] = bootstrapMean(sortedValues[start:start+count], nboot,
+                    rng=rng)
+
+    for q in QUANTILES: # linear interpolation between the closest ranks, like numpy.percentile
+        position = starts + (counts - 1) * (q / 100.0)
+        below = np.floor(position).astype(np.int64)
+        above = np.ceil(position).astype(np.int64)
+        table["p{0}".format(q)] = sortedValues[below] + (sortedValues[above] - sortedValues[below]) \
+            * (position - below)
+    return table
+
+def fitExponents(results, measures=MEASURES):
+    """Fits t = c * length^k for each method by the least squares regression of log(t) on log(length),
+    over the solved results with a positive time and length
+    :param list<str> measures: attributes of results
+    :returns OrderedDict<str, numpy.ndarray>: the columns method, measure, n (the results fitted),
+        exponent (k), stderr (the standard error of k), coefficient (c) and r2 (the coefficient of
+        determination), one row per method and measure with at least 3 results
+    """
+    table = collections.OrderedDict((column, []) for column in
+        ["method", "measure", "n", "exponent", "stderr", "coefficient", "r2"])
+    nmethods = len(results.methods)
+    for measure in measures:
+        t = getattr(results, measure)
+        keep = results.solved & (t > 0) & (results.length > 0)
+        x = np.log(results.length[keep])
+        y = np.log(t[keep])
+        method = results.method[keep]
+        total = lambda weights=None: np.bincount(method, weights, minlength=nmethods)
+
+        n = total()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xmean = total(x) / n
+            ymean = total(y) / n
+            sxx = total(x * x) - n * xmean ** 2
+            sxy = total(x * y) - n * xmean * ymean
+            syy = total(y * y) - n * ymean ** 2
+            k = sxy / sxx
+            sse = np.maximum(syy - k * sxy, 0)
+            stderr = np.sqrt(sse / (n - 2) / sxx)
+            r2 = 1 - sse / syy
+        for m in xrange(nmethods):
+            if n[m] < 3 or sxx[m] <= 0:
+                continue
+            for column, value in zip(table, [results.methods[m], measure, int(n[m]), k[m], stderr[m],
+                    np.exp(ymean[m] - k[m] * xmean[m]), r2[m]]):
+                table[column].append(value)
+    return collections.OrderedDict((column, np.array(values)) for column, values in table.iteritems())
+
+def counterStats(db):
+    """The mean of each operation counter of out_counters per word and per symbol read, for each method
+    :param DBWrapper db:
+    :returns OrderedDict<str, numpy.ndarray>: the columns method, counter, n (the results counted),
+        perWord and perSymbol (NaN if the method reads no symbols, e.g. backtrack)
+    """
+    table = collections.OrderedDict((column, []) for column in ["method", "counter", "n", "perWord", "perSymbol"])
+    rows = db.selectall("""
+        SELECT tc.method, tc.counter, tc.value, tw.value, ts.value
+        FROM out_counters as tc
+            JOIN out_counters as tw ON tc.re_math==tw.re_math AND tc.method==tw.method AND tw.counter=='words'
+            LEFT JOIN out_counters as ts ON tc.re_math==ts.re_math AND tc.method==ts.method AND ts.counter=='symbols'
+        WHERE tc.counter!='words' AND tw.value>0
+        ORDER BY tc.method, tc.counter;
+    """)
+    for (method, counter), group in itertools.groupby(rows, lambda row: row[:2]):
+        value, words, symbols = np.array([row[2:] for row in group], dtype=np.float64).T # NULL is NaN
+        with np.errstate(invalid="ignore"):
+            read = symbols > 0
+        for column, v in zip(table, [method, counter, len(value), (value / words).mean(),
+                (value[read] / symbols[read]).mean() if read.any() else np.nan]):
+            table[column].append(v)
+    return collections.OrderedDict((column, np.array(values)) for column, values in table.iteritems())
+
+def export(tables, directory):
+    """Writes each table as the CSV file directory/name.csv
+    :param dict<str, OrderedDict<str, numpy.ndarray>> tables: the columns of each table by name
+    :returns list<str>: the paths of the files
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    paths = []
+    for name, table in sorted(tables.iteritems()):
+        paths.append(os.path.join(directory, name + ".csv"))
+        with open(paths[-1], "wb") as f:
+            writer = csv.writer(f)
+            writer.writerow(table.keys())
+            writer.writerows(zip(*table.values()))
+    return paths
+
+def report(db, directory="analysis", lengthBucketSize=1):
+    """Computes and exports every table of the results in db (see `export()`)
+    :returns OrderedDict<str, numpy.ndarray>: the exponents (see `fitExponents()`)
+    """
+    results = load(db)
+    tables = dict((measure, lengthStats(results, getattr(results, measure), lengthBucketSize))
+        for measure in MEASURES)
+    tables["exponents"] = fitExponents(results)
+    tables["counters"] = counterStats(db)
+    export(tables, directory)
+    return tables["exponents"]
+
+if __name__ == "__main__":
+    directory = sys.argv[1] if len(sys.argv) > 1 else "analysis"
+    lengthBucketSize = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    t = time.time()
+    exponents = report(DBWrapper(), directory, lengthBucketSize)
+    print("Method           Measure     Results   Exponent       R^2")
+    for method, measure, n, k, stderr, _, r2 in zip(*exponents.values()):
+        print(method.ljust(16), measure.ljust(11), str(n).ljust(9),
+            "{:.2f} +- {:.2f}".format(k, stderr).ljust(14), "{:.3f}".format(r2))
+    print("\nExported to", directory, "in {:.1f}s".format(time.time() - t))
@@ -0,0 +1,177 @@
+import errno
+import fcntl
+import hashlib
+import os
+import tempfile
+import time
+import zlib
+
+import dill
+
+import errors
+import fa_binary
+
+CACHE_DIRECTORY = "artifact_cache"  # relative to the project's root, like database.db
+MAX_CACHE_BYTES = 2 * 1024**3       # the least recently used artifacts are evicted past this size
+STALE_TMP_SECONDS = 3600            # age of a temporary file of `ArtifactCache#put()` after which its writer is assumed dead
+
+def _codeVersion():
+    """:returns str: a digest of every source file which parsing and constructions depend on, so
+    artifacts made by a different version of the code are never used
+    """
+    sha = hashlib.sha1(str(fa_binary.FORMAT_VERSION))
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in ["re.lark", "convert.py", "math_parser.py", "reex_ext.py", "fa_ext.py", "pddag.py", "fa_binary.py"]:
+        with open(os.path.join(directory, name), "rb") as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+CODE_VERSION = _codeVersion()
+
+def _removeIfExists(path):
+    """Removes the file path, unless another process already did"""
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+class ArtifactCache(object):
+    """An on-disk cache of regexp trees and compiled InvariantNFA's, keyed by expression, method,
+    partialMatch flag and `CODE_VERSION`. It is safe to share between processes: artifacts are written
+    to a temporary file and renamed into place, and eviction holds an exclusive lock.
+
+    ..note: only use it where the construction is not being timed
+    """
+    def __init__(self, directory=CACHE_DIRECTORY, maxBytes=MAX_CACHE_BYTES):
+        """:param str directory: where the artifacts are saved (created if needed)
+        :param int maxBytes: the size above which the least recently used artifacts are evicted
+        """
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self._written = 0 # bytes written since the last eviction by this process
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def key(self, kind, re_math, method="", partialMatch=False):
+        """:param str kind: the kind of artifact, i.e., "tree" or "nfa"
+        :param unicode|str re_math: the expression in `re.lark` format
+        :returns str: the hexadecimal key of the artifact
+        """
+        if type(re_math) is unicode:
+            re_math = re_math.encode("utf-8")
+        sha = hashlib.sha1(CODE_VERSION)
+        sha.update("\0".join([kind, method, "1" if partialMatch else "0", hashlib.sha1(re_math).hexdigest()]))
+        return sha.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """:returns str|None: the artifact saved under key, or None if there is none"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except IOError:
+            return None
+        try:
+            os.utime(path, None) # mark as recently used
+        except OSError:
+            pass # evicted by another process since it was read
+        return data
+
+    def put(self, key, data):
+        """Atomically saves the artifact data under key, replacing any previous one"""
+        path = self._path(key)
+        try:
+            os.mkdir(os.path.dirname(path))
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.rename(tmp, path)
+        except:
+            _removeIfExists(tmp) # (a function, so the raise below is not of its caught error in Python 2)
+            raise
+
+        self._written += len(data)
+        if self._written > self.maxBytes // 16:
+            self.evict()
+
+    def evict(self):
+        """Removes the least recently used artifacts until the cache is below 90% of maxBytes, and the
+        temporary files of writers which were killed (see STALE_TMP_SECONDS). The temporary files being
+        written are neither artifacts nor removed, since `#put()` does not hold the lock.
+        """
+        self._written = 0
+        with open(os.path.join(self.directory, "lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            artifacts = []
+            total = 0
+            for subdirectory in os.listdir(self.directory):
+                subdirectory = os.path.join(self.directory, subdirectory)
+                if not os.path.isdir(subdirectory):
+                    continue
+                for name in os.listdir(subdirectory):
+                    path = os.path.join(subdirectory, name)
+                    try:
+                        stat = os.stat(path)
+                        if name.startswith(".tmp"):
+                            if stat.st_mtime < time.time() - STALE_TMP_SECONDS:
+                                os.remove(path)
+                            continue
+                    except OSError:
+                        continue
+                    artifacts.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+
+            if total <= self.maxBytes:
+                return
+            artifacts.sort()
+            for _, size, path in artifacts:
+                if total <= self.maxBytes * 9 // 10:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+
+    def tree(self, converter, re_math, partialMatch=False):
+        """Like `converter.math(re_math, partialMatch)` (see `Converter#math()`) but cached
+        :returns uregexp: the regexp tree
+        """
+        key = self.key("tree", re_math, partialMatch=partialMatch)
+        data = self.get(key)
+        if data is not None:
+            try:
+                return dill.loads(zlib.decompress(data))
+            except Exception:
+                pass # corrupted or unreadable, so it is replaced
+        re = converter.math(re_math, partialMatch=partialMatch)
+        self.put(key, zlib.compress(dill.dumps(re)))
+        return re
+
+    def nfa(self, re, re_math, method, partialMatch=False):
+        """Like `re.toInvariantNFA(method)` followed by `InvariantNFA#compact()` but cached
+        :param uregexp re: the regexp tree of re_math (with partialMatch applied if it is set)
+        :returns InvariantNFA: the compact automaton
+        """
+        key = self.key("nfa", re_math, method, partialMatch)
+        data = self.get(key)
+        if data is not None:
+            try:
+                return fa_binary.loads(data)
+            except errors.NFAFormatError:
+                pass # corrupted or written by an older format, so it is replaced
+        nfa = re.toInvariantNFA(method)
+        nfa.compact()
+        self.put(key, fa_binary.dumps(nfa))
+        return nfa
@@ -3,28 +3,152 @@ import matplotlib
 matplotlib.use('WebAgg') # TkAgg work well for native display
 import matplotlib.pyplot as plt
 import sys
-import os
 import psutil
-import time
 import timeit
 import random
 import gc
 import datetime
+import functools
+import hashlib
+import marshal
+import zlib
+import numpy as np
 
-from util import DBWrapper, Deque, parseIntSafe # ConsoleOverwrite
+import errors
+import analysis
+import counters
+import latency
+import memory
+import native_regex
+import spans
+from util import BottomK, DBWrapper, Deque, parseIntSafe, timeLimited # ConsoleOverwrite
 from convert import Converter
+from artifact_cache import ArtifactCache
+from fa_ext import LazyDFA
+from scheduler import Scheduler
 
 WORD_SAMPLE_SIZE = 10000            # maximum number words in the accepting or rejecting word sets
+WARMUP_WORDS = 25                   # words evaluated before the per-word latencies are timed (see `Benchmarker#measure()`)
+FILTER_BATCH_SIZE = 1024            # possibly rejected words filtered together (see `LazyDFA#evalWordsP()`)
 MAX_EVAL_PER_WORD_TIME = .25        # maximum allowable time per word evaluation before the total time is estimated
+UNSOLVED_TIME = 1000000.0           # the time saved for a method which could not finish (see `Benchmarker#measure()`)
+MAX_EVAL_WORD_TIME = 5.0            # maximum time of one word's evaluation before it is aborted and the method is censored as timed out
+COUNTED_WORDS = 250                 # accepted and rejected words evaluated by each method in the counting mode (see `Benchmarker#countOperations()`)
+GENERATOR_VERSION = 3               # the version of `Benchmarker#generateWords()`: increase it when the words it generates change
+
+def _mutations(words):
+    """Generates the words which are slightly changed from words, which may not be accepted:
+        1. delete one character
+        2. replace each character with '~'
+        3. swap all neighbouring character pairs
+    ..note: the changes of one word are distinct, but different words can have the same changes
+    """
+    for word in words:
+        changed = set()
+        for i in xrange(0, len(word)):
+            changed.add(word[:i] + word[i+1:])
+            changed.add(word[:i] + "~" + word[i+1:])
+        for i in xrange(1, len(word)):
+            changed.add(word[:i-1] + word[i] + word[i-1] + word[i+1:])
+        for w in changed:
+            yield w
 
 class Benchmarker():
-    def __init__(self):
+    def __init__(self, latency=False, countOps=False):
+        """:param bool latency: if the latency of each word evaluation is recorded in out_word_latency
+        (see `#measure()`)
+        :param bool countOps: if the operations of the word evaluations are counted in out_counters
+        (see `#countOperations()`)
+        """
+        self.latency = latency
+        self.countOps = countOps
         self.db = DBWrapper()
+        self.db.useWAL()
         # console = ConsoleOverwrite()
         self.write = lambda *x: print(datetime.datetime.now().strftime("%H:%M:%S"), *x)
         self.convert = Converter()
+        self.cache = ArtifactCache()
         self.code_lines = Deque(open("./example_code_file.txt", "r").read().splitlines())
         self.methods = list(x[0] for x in self.db.selectall("SELECT method FROM methods;"))
+        self._words = None # (re_math, hash, accepted, rejected, unsaved) of the most recent expression (see `#words()`)
+
+        # the words of each expression, generated once by each GENERATOR_VERSION (see `#words()`)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS words (
+                re_math     TEXT,
+                version     INTEGER,
+                hash        TEXT,
+                n_evalA     INTEGER,
+                n_evalR     INTEGER,
+                accepted    BLOB,
+                rejected    BLOB,
+                PRIMARY KEY (re_math, version)
+            );
+
+            -- the latencies of the word evaluations of each method, when they are recorded
+            CREATE TABLE IF NOT EXISTS out_word_latency (
+                re_math     TEXT,
+                method      TEXT,
+                accepting   INTEGER,
+                n           INTEGER,
+                p50         REAL,
+                p95         REAL,
+                p99         REAL,
+                max         REAL,
+                histogram   BLOB,
+                PRIMARY KEY (re_math, method, accepting),
+                FOREIGN KEY (method) REFERENCES methods (method),
+                FOREIGN KEY (re_math) REFERENCES in_tests (re_math)
+            );
+
+            -- the memory of each method in bytes (see `#measure()`), and the size of its NFA if it has one.
+            -- m_pre and m_eval are how much the peak resident set grew: a lower bound of the memory
+            -- allocated, page-granular and missing memory reused from earlier operations of the worker,
+            -- so they are not comparable across methods; m_retained is (see `memory.deepSizeof()`)
+            CREATE TABLE IF NOT EXISTS out_memory (
+                re_math     TEXT,
+                method      TEXT,
+                m_pre       INTEGER,
+                m_eval      INTEGER,
+                m_retained  INTEGER,
+                nstates     INTEGER,
+                ntrans      INTEGER,
+                PRIMARY KEY (re_math, method),
+                FOREIGN KEY (method) REFERENCES methods (method),
+                FOREIGN KEY (re_math) REFERENCES in_tests (re_math)
+            );
+
+            -- the seconds and calls of each phase of the parse and the construction of the fastest
+            -- iteration of each method, or the total of a counter with seconds NULL (see `spans.py`)
+            CREATE TABLE IF NOT EXISTS out_phases (
+                re_math     TEXT,
+                method      TEXT,
+                phase       TEXT,
+                seconds     REAL,
+                count       INTEGER,
+                PRIMARY KEY (re_math, method, phase),
+                FOREIGN KEY (method) REFERENCES methods (method),
+                FOREIGN KEY (re_math) REFERENCES in_tests (re_math)
+            );
+
+            -- the operations of evaluating the first COUNTED_WORDS accepted and rejected words with each
+            -- method, and the words evaluated as the counter 'words' (see `#countOperations()`)
+            CREATE TABLE IF NOT EXISTS out_counters (
+                re_math     TEXT,
+                method      TEXT,
+                counter     TEXT,
+                value       INTEGER,
+                PRIMARY KEY (re_math, method, counter),
+                FOREIGN KEY (method) REFERENCES methods (method),
+                FOREIGN KEY (re_math) REFERENCES in_tests (re_math)
+            );
+        """)
+        inTests = [column[1] for column in self.db.selectall("PRAGMA table_info(in_tests);")]
+        if len(inTests) > 0 and "words_hash" not in inTests: # made before the words were saved
+            self.db.execute("ALTER TABLE in_tests ADD COLUMN words_hash TEXT DEFAULT '';")
+        outTests = [column[1] for column in self.db.selectall("PRAGMA table_info(out_tests);")]
+        if len(outTests) > 0 and "timed_out" not in outTests: # made before words were timed out
+            self.db.execute("ALTER TABLE out_tests ADD COLUMN timed_out TEXT DEFAULT '';")
 
     def isDone(self):
         return self.db.selectall("SELECT sum(itersleft) FROM in_tests WHERE error='' AND length<1600;")[0][0] == 0
@@ -57,12 +181,15 @@ class Benchmarker():
             INSERT OR IGNORE INTO methods (method, colour) VALUES ('nfaFollow', '#dcbeff');
             INSERT OR IGNORE INTO methods (method, colour) VALUES ('nfaThompson', '#800000');
             INSERT OR IGNORE INTO methods (method, colour) VALUES ('nfaGlushkov', '#f58231');
+            INSERT OR IGNORE INTO methods (method, colour) VALUES ('re', '#3cb44b');                -- Python's backtracking engine
+            INSERT OR IGNORE INTO methods (method, colour) VALUES ('regex', '#808000');
 
             DROP TABLE IF EXISTS in_tests;
             CREATE TABLE in_tests AS
                 SELECT DISTINCT e.re_math,
                     -1 as n_evalA,
                     -1 as n_evalR,
+                    '' as words_hash,
                     -1 as length,
                     1 as itersleft,
                     '' as error
@@ -82,10 +209,15 @@ class Benchmarker():
                 t_pre   REAL,
                 t_evalA REAL,
                 t_evalR REAL,
+                timed_out TEXT DEFAULT '',
                 PRIMARY KEY (re_math, method),
                 FOREIGN KEY (method) REFERENCES methods (method),
                 FOREIGN KEY (re_math) REFERENCES in_tests (re_math)
             );
+            DELETE FROM out_word_latency;
+            DELETE FROM out_memory;
+            DELETE FROM out_phases;
+            DELETE FROM out_counters;
         """)
         self.write("Setting in_tests length by python string length; this can be changed later")
         for re_math, in self.db.selectall("SELECT re_math FROM in_tests;"):
@@ -96,10 +228,11 @@ class Benchmarker():
             """, [len(re_math), re_math])
 
     def generateWords(self, re_math):
-        re = self.convert.math(re_math)
+        re = self.cache.tree(self.convert, re_math)
         pmre = re.partialMatch()
-        nfa = pmre.toInvariantNFA("nfaPDDAG")
+        nfa = self.cache.nfa(pmre, re_math, "nfaPDDAG", partialMatch=True)
         enum = nfa.enumNFA()
+        stats = enum.stats()
         accepted = list()
         rejected = set()
 
@@ -126,180 +259,441 @@ class Benchmarker():
 
         # ACCEPTING: language enumeration
         self.write(re_math[:50], "generating enumerated words")
-        minlen = enum.shortestWordLength()
-        maxlen = min(minlen + 50, enum.longestWordLength())
+        enumerated = list()
+        minlen = stats.shortest if not stats.empty() else 0
+        maxlen = min(minlen + 50, stats.longest) if not stats.empty() else -1
         for l in xrange(minlen, maxlen + 1):
             n = 0
             for word in enum.enumCrossSection(l):
                 if n > 10: break
                 n += 1
-                accepted.append(word)
-
-                # REJECTING: slightly changed words may not be accepted...
-                # 1. delete one character
-                # 2. replace each character with '~'
-                for i in xrange(0, len(word)):
-                    rejected.add(word[:i] + word[i+1:])
-                    rejected.add(word[:i] + "~" + word[i+1:])
-                # 3. swap all neighbouring character pairs
-                for i in xrange(1, len(word)):
-                    rejected.add(word[:i-1] + word[i] + word[i-1] + word[i+1:])
-
-        # REJECTING: filter out words which are really accepted
-        self.write(re_math[:50], "filtering", len(rejected), "possibly rejected words")
-        rejected = list(w for w in rejected if not nfa.evalWordP(w))
+                enumerated.append(word)
+        accepted.extend(enumerated)
+
+        # REJECTING: slightly changed words which are not accepted, filtered in batches and
+        # sampled as they are generated so only WORD_SAMPLE_SIZE of them are kept (uniformly over the
+        # distinct words: a mutation repeated by many enumerated words is not more likely)
+        self.write(re_math[:50], "filtering possibly rejected words")
+        dfa = LazyDFA(nfa)
+        rejected = BottomK(WORD_SAMPLE_SIZE)
+        def _filter(batch):
+            for word, acceptedP in zip(batch, dfa.evalWordsP(batch)):
+                if not acceptedP:
+                    rejected.add(word)
+
+        batch = list()
+        for candidate in _mutations(enumerated):
+            # (words with a length outside of [shortest, longest] can not be accepted)
+            if stats.rejectsLength(len(candidate)):
+                rejected.add(candidate)
+                continue
+            batch.append(candidate)
+            if len(batch) == FILTER_BATCH_SIZE:
+                _filter(batch)
+                batch = list()
+        _filter(batch)
+        self.write(re_math[:50], "sampled", len(rejected), "of", rejected.seen, "rejected words (with repeats)")
 
         # choose a pseudo-random sample of up to 10,000 words
-        self.write(re_math[:50], "choosing pseudo-random sample up to size WORD_SAMPLE_SIZE for A and R")
+        self.write(re_math[:50], "choosing pseudo-random sample up to size WORD_SAMPLE_SIZE for A")
         r = random.Random(1)
         accepted = r.sample(accepted, min(len(accepted), WORD_SAMPLE_SIZE))
-        rejected = r.sample(rejected, min(len(rejected), WORD_SAMPLE_SIZE))
-        return (accepted, rejected)
+        return (accepted, rejected.items)
 
-    def benchmark(self, re_math):
-        prev_itersleft = self.db.selectall("SELECT itersleft FROM in_tests WHERE re_math=?;", [re_math])[0][0]
-        def _rollback():
-            self.db.execute("""
-                DELETE FROM out_tests
-                WHERE re_math=?;
-            """, [re_math])
-            self.db.execute("""
-                UPDATE in_tests
-                SET itersleft=?
-                WHERE re_math=?;
-            """, [prev_itersleft, re_math])
+    def words(self, re_math):
+        """:returns Tuple(list<unicode>, list<unicode>): the accepted and rejected words of re_math,
+        kept until the words of another expression are needed. They are loaded from the table words,
+        or generated (see `#generateWords()`) if this GENERATOR_VERSION has not saved them yet.
+        """
+        if self._words is None or self._words[0] != re_math:
+            self.forgetWords() # before loading the next ones
+            rows = self.db.selectall("""
+                SELECT hash, accepted, rejected
+                FROM words
+                WHERE re_math=? AND version=?;
+            """, [re_math, GENERATOR_VERSION])
+            if len(rows) > 0:
+                wordsHash, accepted, rejected = rows[0]
+                self._words = (re_math, wordsHash, marshal.loads(zlib.decompress(accepted)),
+                    marshal.loads(zlib.decompress(rejected)), False)
+            else:
+                accepted, rejected = self.generateWords(re_math)
+                wordsHash = hashlib.sha1(marshal.dumps(accepted) + marshal.dumps(rejected)).hexdigest()
+                self._words = (re_math, wordsHash, accepted, rejected, True)
+        return self._words[2:4]
 
-        try: # catch errors and delete the results of the test
-            GROUP_SIZE = 25
-            w_accepted, w_rejected = self.generateWords(re_math)
-            self.write("running gc")
-            gc.collect() # remove unused words from memory... especially the potentially rejected ones
+    def wordsHash(self, re_math):
+        """:returns str: the digest of the words of re_math (see `#words()`), which identifies them in
+        in_tests instead of their numbers
+        """
+        return self._words[1] if self._words is not None and self._words[0] == re_math else None
 
-            # if less than 256 MB RAM is available, return before doing any DB work
-            if psutil.virtual_memory().available < 256 * 1024 * 1024:  # 256 MB
-                print("\nRan out of memory!")
-                return
+    def unsavedWords(self, re_math):
+        """:returns tuple|None: the row of the table words of re_math, if its words were generated by
+        this Benchmarker and not returned here yet (see `#save()`)
+        """
+        if self._words is None or self._words[0] != re_math or not self._words[4]:
+            return None
+        _, wordsHash, accepted, rejected, _ = self._words
+        self._words = self._words[:4] + (False,)
+        return (re_math, GENERATOR_VERSION, wordsHash, len(accepted), len(rejected),
+            zlib.compress(marshal.dumps(accepted)), zlib.compress(marshal.dumps(rejected)))
 
-            n_evalA, n_evalR = self.db.selectall("""
-                SELECT n_evalA, n_evalR
-                FROM in_tests
-                WHERE re_math==?;
-            """, [re_math])[0]
-            if len(w_accepted) != n_evalA or len(w_rejected) != n_evalR: # different word generating scheme... reset
-                self.db.execute("DELETE FROM out_tests WHERE re_math==?;", [re_math])
-                self.db.execute("UPDATE in_tests SET itersleft=1 WHERE re_math==?;", [re_math])
+    def forgetWords(self):
+        """Removes the words of the most recent expression from memory"""
+        self._words = None
+        gc.collect()
 
-            self.db.execute("""
-                    INSERT OR IGNORE INTO out_tests (re_math, method, t_pre, t_evalA, t_evalR)
-                        SELECT in_tests.re_math, methods.method,
-                            1000000.0 as t_pre,
-                            1000000.0 as t_evalA,
-                            1000000.0 as t_evalR
-                        FROM in_tests, methods
-                        WHERE in_tests.re_math=?;
-                """, [re_math])
-
-            # run 1 constructions
-            self.write(re_math[:50], "str to partial matching regular expression tree")
-            pmre = self.convert.math(re_math, partialMatch=True)
-            t_str2pmre = timeit.timeit(lambda: self.convert.math(re_math, partialMatch=True), number=1)
+    def measure(self, re_math, method, latencies=None):
+        """Times the construction and the evaluation of the words of re_math with a method
+        :param dict|None latencies: if given, WARMUP_WORDS words are evaluated first and then every
+            word is timed on its own (see `#evalTimed()`): latencies[True] and latencies[False] are set
+            to the `latency.Histogram`s of the accepted and rejected words
+        :returns Tuple(float, float, float, str, Tuple(int, int, int, int, int), list<tuple>, dict): t_pre, t_evalA and
+            t_evalR, which are UNSOLVED_TIME if the method could not finish, which words timed out, if
+            the evaluation of one took longer than MAX_EVAL_WORD_TIME (it is aborted, and the remaining
+            accepted or rejected words are not evaluated), or '', and the memory of the method: the
+            bytes the peak memory grew by in the construction and in the evaluation (lower bounds, see
+            `memory.PeakMemory`), of the structure which evaluates the words (see `#getEvalStructure()`),
+            and the states and transitions of its NFA (see `memory.py`), which are None if they were not
+            measured, the phases of the parse and the construction (see `spans.Span#rows()`), and the
+            operations of the evaluation if they are counted (see `#countOperations()`), or None
+        :raises MemoryError: if less than 256 MB of RAM is available after generating the words
+        """
+        GROUP_SIZE = 25
+        w_accepted, w_rejected = self.words(re_math)
+        if psutil.virtual_memory().available < 256 * 1024 * 1024:  # 256 MB
+            raise MemoryError("Ran out of memory!")
 
-            for method in self.methods:
-                try: # catch max. recursion errors and handle gracefully for the specific method
-                    self.write(re_math[:50], method, "partial matching regular expression tree to final")
-                    evalWord = self.getEvalMethod(pmre, method)
-                    t_pmre2final = 0.0
-                    if "nfa" in method: # finish the construction
-                        t_pmre2final = timeit.timeit(lambda: pmre.toInvariantNFA(method), number=1)
-                    self.db.execute("""
-                        UPDATE out_tests
-                        SET t_pre=?
-                        WHERE re_math=? AND method=? AND t_pre>?;
-                    """, [t_str2pmre+t_pmre2final, re_math, method, t_str2pmre+t_pmre2final])
-
-                    t_evalA = 0.0
-                    ndone = 0
-                    self.write(re_math[:50], method, "accepting", len(w_accepted), "words...")
-                    for i in xrange(0, len(w_accepted), GROUP_SIZE):
-                        tperword = -1 if ndone == 0 else t_evalA/ndone
-                        if ndone >= GROUP_SIZE and tperword > MAX_EVAL_PER_WORD_TIME: # if slower than X seconds per word estimate & move on
-                            t_evalA = tperword * len(w_accepted)
-                            self.write(re_math[:50], method, "too slow, estimating accepting time as", tperword, "per word")
-                            break
-
-                        words = w_accepted[i:i+GROUP_SIZE]
-                        t_evalA += timeit.timeit(lambda: self.evalMany(evalWord, words, True, method), number=1)
-                        ndone += GROUP_SIZE
-                    self.db.execute("""
-                        UPDATE out_tests
-                        SET t_evalA=?
-                        WHERE re_math=? AND method=? AND t_evalA>?;
-                    """, [t_evalA, re_math, method, t_evalA])
-
-                    t_evalR = 0.0
-                    ndone = 0
-                    self.write(re_math[:50], method, "rejecting", len(w_rejected), "words...")
-                    for i in xrange(0, len(w_rejected), GROUP_SIZE):
-                        tperword = -1 if ndone == 0 else t_evalR/ndone
-                        if ndone >= GROUP_SIZE and tperword > MAX_EVAL_PER_WORD_TIME: # if slower than X seconds per word estimate & move on
-                            t_evalR = tperword * len(w_rejected)
-                            self.write(re_math[:50], method, "too slow, estimating rejecting time as", tperword, "per word")
-                            break
-
-                        words = w_rejected[i:i+GROUP_SIZE]
-                        t_evalR += timeit.timeit(lambda: self.evalMany(evalWord, words, False, method), number=1)
-                        ndone += GROUP_SIZE
-                    self.db.execute("""
-                        UPDATE out_tests
-                        SET t_evalR=?
-                        WHERE re_math=? AND method=? AND t_evalR>?;
-                    """, [t_evalR, re_math, method, t_evalR])
-                except RuntimeError as error:
-                    if str(error) == "maximum recursion depth exceeded":
-                        # leave whatever calculated value as-is... might be the default 1,000,000.0
-                        # to indicate that this cannot be solved
+        # run 1 constructions
+        self.write(re_math[:50], "str to partial matching regular expression tree")
+        pmre = self.cache.tree(self.convert, re_math, partialMatch=True)
+        phases = spans.Span("")
+        with memory.PeakMemory() as parsePeak, spans.recording(phases):
+            t_str2pmre = timeit.timeit(lambda: self.convert.math(re_math, partialMatch=True, cached=False), number=1)
+
+        t_pre = t_evalA = t_evalR = UNSOLVED_TIME
+        timedOut = []
+        m_pre = m_eval = m_retained = nstates = ntrans = None
+        counts = None
+        try: # catch max. recursion errors and handle gracefully for the specific method
+            self.write(re_math[:50], method, "partial matching regular expression tree to final")
+            structure = self.getEvalStructure(pmre, method, re_math)
+            evalWord = self.getEvalMethod(pmre, method, re_math, structure)
+            t_pmre2final = 0.0
+            # timed on a new tree: pmre may have memoized parts of the construction (e.g., if it built
+            # the structure) or may be freshly unpickled, depending on the cache
+            if "nfa" in method:
+                fresh = self.convert.math(re_math, partialMatch=True, cached=False)
+            elif method in native_regex.METHODS:
+                fresh = self.convert.math(re_math, cached=False)
+            with memory.PeakMemory() as constructionPeak:
+                if "nfa" in method: # finish the construction
+                    with spans.recording(phases):
+                        t_pmre2final = timeit.timeit(lambda: fresh.toInvariantNFA(method), number=1)
+                elif method in native_regex.METHODS: # compile the pattern
+                    with spans.recording(phases), spans.span("compile"):
+                        t_pmre2final = timeit.timeit(lambda: native_regex.compile(fresh, method), number=1)
+            t_pre = t_str2pmre + t_pmre2final
+            m_pre = max(parsePeak.bytes, constructionPeak.bytes)
+            m_retained = memory.deepSizeof(structure)
+            if "nfa" in method:
+                nstates, ntrans = len(structure.States), structure.countTransitions()
+            with memory.PeakMemory() as evalPeak:
+                evalGroup = lambda words, expectedVal: timeit.timeit(
+                    lambda: self.evalMany(evalWord, words, expectedVal, method), number=1)
+                if latencies is not None:
+                    latencies[True], latencies[False] = latency.Histogram(), latency.Histogram()
+                    evalGroup = lambda words, expectedVal: self.evalTimed(
+                        evalWord, words, expectedVal, method, latencies[expectedVal])
+                    try: # the first evaluations can build lazy structures or fill caches
+                        self.evalMany(evalWord, w_accepted[:WARMUP_WORDS], True, method)
+                        self.evalMany(evalWord, w_rejected[:WARMUP_WORDS], False, method)
+                    except errors.EvalTimeoutError:
                         pass
-                    else:
-                        raise
 
-            self.write(re_math[:50], "finalizing")
-            self.db.execute("""
+                t = 0.0
+                ndone = 0
+                self.write(re_math[:50], method, "accepting", len(w_accepted), "words...")
+                for i in xrange(0, len(w_accepted), GROUP_SIZE):
+                    tperword = -1 if ndone == 0 else t/ndone
+                    if ndone >= GROUP_SIZE and tperword > MAX_EVAL_PER_WORD_TIME: # if slower than X seconds per word estimate & move on
+                        t = tperword * len(w_accepted)
+                        self.write(re_math[:50], method, "too slow, estimating accepting time as", tperword, "per word")
+                        break
+
+                    words = w_accepted[i:i+GROUP_SIZE]
+                    try:
+                        t += evalGroup(words, True)
+                    except errors.EvalTimeoutError: # censored: the time of the remaining words is unknown
+                        t = UNSOLVED_TIME
+                        timedOut.append("accepting words {0}-{1}: one timed out after {2}s".format(
+                            i, i + len(words) - 1, MAX_EVAL_WORD_TIME))
+                        self.write(re_math[:50], method, timedOut[-1])
+                        break
+                    ndone += GROUP_SIZE
+                t_evalA = t
+
+                t = 0.0
+                ndone = 0
+                self.write(re_math[:50], method, "rejecting", len(w_rejected), "words...")
+                for i in xrange(0, len(w_rejected), GROUP_SIZE):
+                    tperword = -1 if ndone == 0 else t/ndone
+                    if ndone >= GROUP_SIZE and tperword > MAX_EVAL_PER_WORD_TIME: # if slower than X seconds per word estimate & move on
+                        t = tperword * len(w_rejected)
+                        self.write(re_math[:50], method, "too slow, estimating rejecting time as", tperword, "per word")
+                        break
+
+                    words = w_rejected[i:i+GROUP_SIZE]
+                    try:
+                        t += evalGroup(words, False)
+                    except errors.EvalTimeoutError: # censored: the time of the remaining words is unknown
+                        t = UNSOLVED_TIME
+                        timedOut.append("rejecting words {0}-{1}: one timed out after {2}s".format(
+                            i, i + len(words) - 1, MAX_EVAL_WORD_TIME))
+                        self.write(re_math[:50], method, timedOut[-1])
+                        break
+                    ndone += GROUP_SIZE
+                t_evalR = t
+            m_eval = evalPeak.bytes
+            if self.countOps and method not in native_regex.METHODS:
+                counts = self.countOperations(pmre, method, re_math, structure)
+        except errors.NativeRegexError as error:
+            # leave UNSOLVED_TIME since the module cannot compile the expression
+            self.write(re_math[:50], method, str(error).splitlines()[0])
+        except RuntimeError as error:
+            if str(error) == "maximum recursion depth exceeded":
+                # leave whatever calculated value as-is... might be UNSOLVED_TIME
+                # to indicate that this cannot be solved
+                pass
+            else:
+                raise
+        return t_pre, t_evalA, t_evalR, "; ".join(timedOut), (m_pre, m_eval, m_retained, nstates, ntrans), \
+            phases.rows(), counts
+
+    def countOperations(self, pmre, method, re_math, structure):
+        """Evaluates the first COUNTED_WORDS accepted and rejected words of re_math again with method,
+        counting its operations (see `counters.py`). The evaluations of the accepted or rejected
+        words stop at the first which times out.
+        :param structure: see `#getEvalStructure()`
+        :returns dict<str, int>: the total of each counter, and the words evaluated as 'words'
+        """
+        w_accepted, w_rejected = self.words(re_math)
+        with counters.counting() as counts:
+            evalWord = self.getEvalMethod(pmre, method, re_math, structure) # the counting versions
+            for words in [w_accepted[:COUNTED_WORDS], w_rejected[:COUNTED_WORDS]]:
+                for w in words:
+                    try:
+                        evalWord(w)
+                    except errors.EvalTimeoutError:
+                        break
+                    counts["words"] += 1
+        return dict(counts)
+
+    def save(self, finished, failed=[], countIteration=True, words=[], latencies=[]):
+        """Saves the results of many expressions in one transaction, so an expression is either saved
+        with all its methods or not at all. The fastest times of every iteration are kept, and the
+        results of an expression are reset if its words changed.
+        :param list<Tuple(unicode, str, int, int, list<Tuple(str, tuple)>)> finished:
+            the re_math, the hash and the number of accepted and rejected words (see `#words()`), and
+            the times of each method (see `#measure()`) of every expression benchmarked
+        :param list<Tuple(unicode, str)> failed: the re_math and the error of every expression which
+            could not be benchmarked; its results are deleted
+        :param bool countIteration: if an iteration of each finished expression is counted as done
+        :param list<tuple> words: rows of the table words (see `#unsavedWords()`)
+        :param list<Tuple(unicode, str, bool, str)> latencies: the re_math, method, if the words are
+            accepted, and the dumped `latency.Histogram` of the finished expressions' word evaluations
+            (see `#measure()`), which are merged with the ones of previous iterations
+        ..note: the phases of a method (see `#measure()`) are replaced only by the ones of an iteration
+                whose t_pre is smaller, so they add up to the t_pre which is kept
+        """
+        with self.db.transaction():
+            self.db.executemany("""
+                INSERT OR REPLACE INTO words (re_math, version, hash, n_evalA, n_evalR, accepted, rejected)
+                VALUES (?, ?, ?, ?, ?, ?, ?);
+            """, [row[:5] + (buffer(row[5]), buffer(row[6])) for row in words])
+            for re_math, wordsHash, n_evalA, n_evalR, _ in finished:
+                prev_hash, = self.db.selectall("SELECT words_hash FROM in_tests WHERE re_math==?;", [re_math])[0]
+                if wordsHash != prev_hash: # different words... reset
+                    self.db.execute("DELETE FROM out_tests WHERE re_math==?;", [re_math])
+                    self.db.execute("DELETE FROM out_word_latency WHERE re_math==?;", [re_math])
+                    self.db.execute("DELETE FROM out_memory WHERE re_math==?;", [re_math])
+                    self.db.execute("DELETE FROM out_phases WHERE re_math==?;", [re_math])
+                    self.db.execute("DELETE FROM out_counters WHERE re_math==?;", [re_math])
+                    self.db.execute("""
+                        UPDATE in_tests
+                        SET itersleft=1, n_evalA=?, n_evalR=?, words_hash=?
+                        WHERE re_math==?;
+                    """, [n_evalA, n_evalR, wordsHash, re_math])
+
+            rows = [(re_math, method) + tuple(times)
+                for re_math, _, _, _, results in finished for method, times in results]
+            self.db.executemany("""
+                INSERT OR IGNORE INTO out_tests (re_math, method, t_pre, t_evalA, t_evalR)
+                VALUES (?, ?, {0}, {0}, {0});
+            """.format(UNSOLVED_TIME), [row[:2] for row in rows])
+            faster = [row for row in rows if len(row) > 7 and row[2] < self.db.selectall(
+                "SELECT t_pre FROM out_tests WHERE re_math=? AND method=?;", row[:2])[0][0]]
+            self.db.executemany("DELETE FROM out_phases WHERE re_math=? AND method=?;", [row[:2] for row in faster])
+            self.db.executemany("""
+                INSERT INTO out_phases (re_math, method, phase, seconds, count)
+                VALUES (?, ?, ?, ?, ?);
+            """, [row[:2] + tuple(phase) for row in faster for phase in row[7]])
+            counted = [row for row in rows if len(row) > 8 and row[8] is not None] # the same words count the same
+            self.db.executemany("DELETE FROM out_counters WHERE re_math=? AND method=?;", [row[:2] for row in counted])
+            self.db.executemany("""
+                INSERT INTO out_counters (re_math, method, counter, value)
+                VALUES (?, ?, ?, ?);
+            """, [row[:2] + item for row in counted for item in sorted(row[8].iteritems())])
+            self.db.executemany("""
+                UPDATE out_tests
+                SET t_pre=min(t_pre, ?), t_evalA=min(t_evalA, ?), t_evalR=min(t_evalR, ?)
+                WHERE re_math=? AND method=?;
+            """, [row[2:5] + row[:2] for row in rows])
+            self.db.executemany("""
+                UPDATE out_tests
+                SET timed_out=CASE WHEN t_evalA<{0} AND t_evalR<{0} THEN '' WHEN ?!='' THEN ? ELSE timed_out END
+                WHERE re_math=? AND method=?;
+            """.format(UNSOLVED_TIME), [row[5:6] * 2 + row[:2] for row in rows]) # censored until an iteration finishes
+            memoryRows = [row[:2] + tuple(row[6]) for row in rows if row[6] is not None]
+            self.db.executemany("""
+                INSERT OR IGNORE INTO out_memory (re_math, method)
+                VALUES (?, ?);
+            """, [row[:2] for row in memoryRows])
+            self.db.executemany("""
+                UPDATE out_memory
+                SET m_pre=coalesce(max(m_pre, ?), m_pre, ?), m_eval=coalesce(max(m_eval, ?), m_eval, ?),
+                    m_retained=coalesce(?, m_retained), nstates=coalesce(?, nstates), ntrans=coalesce(?, ntrans)
+                WHERE re_math=? AND method=?;
+            """, [(m_pre, m_pre, m_eval, m_eval, m_retained, nstates, ntrans, re_math, method)
+                for re_math, method, m_pre, m_eval, m_retained, nstates, ntrans in memoryRows]) # the largest peaks
+            if countIteration:
+                self.db.executemany("""
+                    UPDATE in_tests
+                    SET itersleft=itersleft-1
+                    WHERE re_math=?;
+                """, [(re_math,) for re_math, _, _, _, _ in finished])
+
+            for re_math, method, accepting, data in latencies:
+                histogram = latency.Histogram.loads(data)
+                for previous, in self.db.selectall("""
+                    SELECT histogram
+                    FROM out_word_latency
+                    WHERE re_math=? AND method=? AND accepting=?;
+                """, [re_math, method, accepting]):
+                    histogram.merge(latency.Histogram.loads(previous))
+                self.db.execute("""
+                    INSERT OR REPLACE INTO out_word_latency (re_math, method, accepting, n, p50, p95, p99, max, histogram)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);
+                """, [re_math, method, accepting, histogram.n] + histogram.summary() + [buffer(histogram.dumps())])
+
+            self.db.executemany("""
                 UPDATE in_tests
-                SET itersleft=itersleft-1, n_evalA=?, n_evalR=?
+                SET error=?
                 WHERE re_math=?;
-            """, [len(w_accepted), len(w_rejected), re_math])
-            print("\tSuccess", re_math[:50])
-        except KeyboardInterrupt:
-            _rollback()
-            raise
-        except Exception as error:
-            self.db.execute("""
-                UPDATE in_tests
-                SET error=?, itersleft=1
+            """, [(str(error), re_math) for re_math, error in failed])
+            self.db.executemany("""
+                DELETE FROM out_tests
+                WHERE re_math=?;
+            """, [(re_math,) for re_math, _ in failed])
+            self.db.executemany("""
+                DELETE FROM out_word_latency
+                WHERE re_math=?;
+            """, [(re_math,) for re_math, _ in failed])
+            self.db.executemany("""
+                DELETE FROM out_memory
+                WHERE re_math=?;
+            """, [(re_math,) for re_math, _ in failed])
+            self.db.executemany("""
+                DELETE FROM out_phases
                 WHERE re_math=?;
-            """, [str(error), re_math])
-            _rollback()
+            """, [(re_math,) for re_math, _ in failed])
+            self.db.executemany("""
+                DELETE FROM out_counters
+                WHERE re_math=?;
+            """, [(re_math,) for re_math, _ in failed])
+
+    def benchmark(self, re_math):
+        """Benchmarks every method of `self.methods` on re_math in this process (see `scheduler.py`
+        to benchmark many expressions)"""
+        try: # catch errors and delete the results of the test
+            results = []
+            latencies = []
+            for method in self.methods:
+                histograms = dict() if self.latency else None
+                results.append((method, self.measure(re_math, method, histograms)))
+                latencies.extend(self.latencyRows(re_math, method, histograms))
+            w_accepted, w_rejected = self.words(re_math)
+            self.write(re_math[:50], "finalizing")
+            self.save([(re_math, self.wordsHash(re_math), len(w_accepted), len(w_rejected), results)],
+                words=filter(None, [self.unsavedWords(re_math)]), latencies=latencies)
+            print("\tSuccess", re_math[:50])
+        except MemoryError as error:
+            print("\n" + str(error))
+        except (errors.FAdoExtError, Exception) as error:
+            self.save([], [(re_math, error)])
             print(error)
         finally:
             self.write("running gc")
-            gc.collect()
+            self.forgetWords()
 
     def evalMany(self, evalWordFtn, words, expectedVal, method):
         for w in words:
             assert evalWordFtn(w) == expectedVal, w + " was not evaluated " + str(expectedVal) + " in " + method
 
-    def getEvalMethod(self, pmre, method):
+    def latencyRows(self, re_math, method, histograms):
+        """:param dict|None histograms: the latencies of `#measure()`
+        :returns list<tuple>: the latencies of the accepted and rejected words for `#save()`
+        """
+        return [(re_math, method, accepting, histogram.dumps())
+            for accepting, histogram in (histograms or dict()).items() if histogram.n > 0]
+
+    def evalTimed(self, evalWordFtn, words, expectedVal, method, histogram):
+        """Like `#evalMany()`, but each evaluation is timed with `latency.clock` and added to histogram
+        :returns float: the total seconds of the evaluations
+        """
+        clock = latency.clock
+        total = 0.0
+        for w in words:
+            t = clock()
+            result = evalWordFtn(w)
+            t = clock() - t
+            assert result == expectedVal, w + " was not evaluated " + str(expectedVal) + " in " + method
+            histogram.add(t)
+            total += t
+        return total
+
+    def getEvalStructure(self, pmre, method, re_math):
+        """:returns: what evaluates the words with method: the NFA of an NFA construction, the compiled
+            pattern of "re" or "regex", or else the partial matching tree pmre itself
+        """
+        if "nfa" in method: # state names are not needed for evaluation, so the cached nfa is compact
+            return self.cache.nfa(pmre, re_math, method, partialMatch=True)
+        elif method in native_regex.METHODS:
+            return native_regex.compile(self.cache.tree(self.convert, re_math), method)
+        return pmre
+
+    def getEvalMethod(self, pmre, method, re_math, structure=None):
+        """:param structure: see `#getEvalStructure()`, which is called if it is not given
+        :returns function: the evaluation of a word by method, which raises EvalTimeoutError if it
+            takes longer than MAX_EVAL_WORD_TIME (see `util.timeLimited()`)
+        """
+        if structure is None:
+            structure = self.getEvalStructure(pmre, method, re_math)
+        evalWordP = None
         if "nfa" in method:
-            nfa = pmre.toInvariantNFA(method)
-            return nfa.evalWordP
+            evalWordP = structure.evalWordP
         elif method == "derivative":
-            return pmre.evalWordP_Derivative
+            evalWordP = structure.evalWordP_Derivative
         elif method == "pd":
-            return pmre.evalWordP_PD
+            evalWordP = structure.evalWordP_PD
         elif method == "pdo":
-            return pmre.evalWordP_PD_Optimized
+            evalWordP = structure.evalWordP_PD_Optimized
         elif method == "backtrack":
-            return pmre.evalWordP_Backtrack
+            evalWordP = structure.evalWordP_Backtrack
+        elif method in native_regex.METHODS: # the pattern is searched for, which is partial matching
+            evalWordP = native_regex.evalWordMethod(None, method, compiled=structure)
+        return evalWordP and timeLimited(evalWordP, MAX_EVAL_WORD_TIME)
 
     def statsToDo(self):
         return self.db.selectall("""
@@ -319,12 +713,16 @@ class Benchmarker():
                 re_math = re_math.decode("utf-8")
                 print(n, re_math[:50], method)
 
-                t_str2pmre = timeit.timeit(lambda: self.convert.math(re_math, partialMatch=True), number=1)
-                pmre = self.convert.math(re_math, partialMatch=True)
+                # a new tree for every construction, since trees memoize parts of constructions
+                t_str2pmre = timeit.timeit(lambda: self.convert.math(re_math, partialMatch=True, cached=False), number=1)
+                pmre = self.convert.math(re_math, partialMatch=True, cached=False)
 
                 t_pmre2final = 0.0
                 if "nfa" in method:
                     t_pmre2final = timeit.timeit(lambda: pmre.toInvariantNFA(method), number=1)
+                elif method in native_regex.METHODS:
+                    re = self.convert.math(re_math, cached=False)
+                    t_pmre2final = timeit.timeit(lambda: native_regex.compile(re, method), number=1)
 
                 self.db.execute("""
                     UPDATE out_tests
@@ -348,8 +746,7 @@ class Benchmarker():
                     tin.n_evalA==-1
                     OR tin.n_evalR==-1
                     OR tout.t_pre==1000000.0
-                    OR tout.t_evalA==1000000.0
-                    OR tout.t_evalR==1000000.0
+                    OR (tout.timed_out=='' AND (tout.t_evalA==1000000.0 OR tout.t_evalR==1000000.0))
                 );
         """):
             re_math = re_math.decode("utf-8")
@@ -357,22 +754,39 @@ class Benchmarker():
                 DELETE FROM out_tests
                 WHERE re_math==?;
             """, [re_math])
+            self.db.execute("DELETE FROM out_word_latency WHERE re_math==?;", [re_math])
+            self.db.execute("DELETE FROM out_memory WHERE re_math==?;", [re_math])
+            self.db.execute("DELETE FROM out_phases WHERE re_math==?;", [re_math])
+            self.db.execute("DELETE FROM out_counters WHERE re_math==?;", [re_math])
             self.db.execute("""
                 UPDATE in_tests
-                SET itersleft=1, n_evalA=-1, n_evalR=-1
+                SET itersleft=1, n_evalA=-1, n_evalR=-1, words_hash=''
                 WHERE re_math=?;
             """, [re_math])
 
-    def displayResults(self, lengthBucketSize=1, nConstructions=1, nEvals=1, xmax=None, ymax=None):
+    def displayResults(self, lengthBucketSize=1, nConstructions=1, nEvals=1, xmax=None, ymax=None, memoryMeasure=None):
+        """
+        :param str|None memoryMeasure: "m_retained" to plot the mean size of the structure of each method
+            (see `#measure()`) below the times, or None. The peaks m_pre and m_eval are not plotted since
+            they are not comparable across methods (see `memory.PeakMemory`)
+        """
         print("\nDisplay parameters:")
         print("\tlengthBucketSize =", lengthBucketSize)
         print("\tnConstructions =", nConstructions)
         print("\tnEvals =", nEvals)
         print("\txmax =", xmax)
         print("\tymax =", ymax)
+        print("\tmemoryMeasure =", memoryMeasure)
 
-        time_distribution = list()
-        fig, ax = plt.subplots()
+        results = analysis.load(self.db)
+        pre = analysis.lengthStats(results, results.t_pre, lengthBucketSize, nboot=0)
+        word = analysis.lengthStats(results, results.t_word, lengthBucketSize, nboot=0) # the same bins
+        h = nConstructions*pre["mean"] + nEvals*word["mean"]
+        if memoryMeasure:
+            mem = analysis.lengthStats(results, getattr(results, memoryMeasure), lengthBucketSize, nboot=0)
+            fig, (ax, axMemory) = plt.subplots(2, 1, sharex=True)
+        else:
+            fig, ax = plt.subplots()
         line2d = dict()
 
         for method, colour in self.db.selectall("""
@@ -380,28 +794,15 @@ class Benchmarker():
             FROM methods
             ORDER BY method LIKE 'nfa%', length(method);
         """):
-            x = []
-            y = []
-            for row in self.db.selectall("""
-                SELECT avg(tin.length),
-                    avg(tout.t_pre) as avgpre,
-                    avg((tout.t_evalA + tout.t_evalR) / (tin.n_evalA + tin.n_evalR)) as avgeval
-                FROM in_tests as tin, out_tests as tout
-                WHERE tin.re_math==tout.re_math
-                    AND tout.method==?
-                GROUP BY length/?
-                ORDER BY length ASC;
-            """, [method, lengthBucketSize]):
-                length, avgpre, avgeval = row
-                h = nConstructions*avgpre + nEvals*avgeval
-                x.append(length)
-                y.append(h)
-                time_distribution.append(h)
-            line2d[method] = ax.plot(x, y, label=method, linewidth=1, color=colour)[0]
-        time_distribution.sort()
+            rows = pre["method"] == method
+            line2d[method] = [ax.plot(pre["length"][rows], h[rows], label=method, linewidth=1, color=colour)[0]]
+            if memoryMeasure:
+                rows = mem["method"] == method
+                line2d[method].append(axMemory.plot(mem["length"][rows], mem["mean"][rows] / 1e6, label=method,
+                    linewidth=1, color=colour)[0])
 
         legend_to_line = dict()
-        legend = plt.legend(loc="upper left")
+        legend = ax.legend(loc="upper left")
         legendLines = legend.get_lines()
         for l in legendLines:
             l.set_picker(True)
@@ -409,27 +810,75 @@ class Benchmarker():
             legend_to_line[l] = line2d[l.get_label()]
         def _on_pick(event):
             line = event.artist
-            legend_to_line[line].set_visible(not line.get_visible())
+            for plotted in legend_to_line[line]:
+                plotted.set_visible(not line.get_visible())
             line.set_visible(not line.get_visible())
             fig.canvas.draw()
 
-        plt.xlim(xmin=0)
-        if xmax: plt.xlim(xmax=xmax)
+        ax.set_xlim(xmin=0)
+        if xmax: ax.set_xlim(xmax=xmax)
         if ymax:
-            plt.ylim(ymin=0, ymax=ymax)
+            ax.set_ylim(ymin=0, ymax=ymax)
         else:
-            plt.ylim(ymin=0, ymax=time_distribution[int(len(time_distribution)*0.9)]) # scale to show 0.XX% of data
+            ax.set_ylim(ymin=0, ymax=np.percentile(h, 90)) # scale to show 90% of data
 
-        plt.connect("pick_event", _on_pick)
-        plt.title("Regular Expression Membership Algorithm Efficiency")
-        plt.xlabel("Regular Expression Length\nGrouped in bins of size {}".format(lengthBucketSize))
-        plt.ylabel("x{0} Construction(s), x{1} Word Evaluation(s)\n(seconds)".format(nConstructions, nEvals))
+        fig.canvas.mpl_connect("pick_event", _on_pick)
+        ax.set_title("Regular Expression Membership Algorithm Efficiency")
+        xlabel = "Regular Expression Length\nGrouped in bins of size {}".format(lengthBucketSize)
+        ax.set_ylabel("x{0} Construction(s), x{1} Word Evaluation(s)\n(seconds)".format(nConstructions, nEvals))
+        if memoryMeasure:
+            axMemory.set_ylim(ymin=0)
+            axMemory.set_xlabel(xlabel)
+            axMemory.set_ylabel({"m_retained": "Size of the structure"}[memoryMeasure] + "\n(MB)")
+        else:
+            ax.set_xlabel(xlabel)
         plt.show()
 
+    def displayLatencies(self, lengthBucketSize=1, xmax=None):
+        """Plots the percentiles of the per-word latencies of each method (see `#measure()`), over the
+        histograms of the expressions of each length bin merged together
+        """
+        print("\nDisplay parameters:")
+        print("\tlengthBucketSize =", lengthBucketSize)
+        print("\txmax =", xmax)
+
+        labels = ["p{0}".format(p) for p in latency.PERCENTILES] + ["max"]
+        fig, axes = plt.subplots(2, 2, sharex=True)
+        axes = axes.flatten()
+        for method, colour in self.db.selectall("""
+            SELECT method, colour
+            FROM methods
+            ORDER BY method LIKE 'nfa%', length(method);
+        """):
+            bins = dict() # length bin: Tuple(int, int, Histogram) (total length, expressions, latencies)
+            for length, data in self.db.selectall("""
+                SELECT tin.length, tlat.histogram
+                FROM in_tests as tin, out_word_latency as tlat
+                WHERE tin.re_math==tlat.re_math
+                    AND tlat.method==?;
+            """, [method]):
+                total, count, histogram = bins.get(length//lengthBucketSize, (0, 0, latency.Histogram()))
+                bins[length//lengthBucketSize] = (total + length, count + 1,
+                    histogram.merge(latency.Histogram.loads(data)))
+            if len(bins) == 0:
+                continue
+            x = [bins[b][0] / float(bins[b][1]) for b in sorted(bins)]
+            summaries = [bins[b][2].summary() for b in sorted(bins)]
+            for i, ax in enumerate(axes):
+                ax.plot(x, [summary[i] for summary in summaries], label=method, linewidth=1, color=colour)
+
+        for label, ax in zip(labels, axes):
+            ax.set_title(label)
+            ax.set_yscale("log")
+            ax.set_xlim(xmin=0)
+            if xmax: ax.set_xlim(xmax=xmax)
+        axes[0].legend(loc="upper left", fontsize="small")
+        fig.suptitle("Per-Word Evaluation Latency")
+        fig.text(0.5, 0.02, "Regular Expression Length\nGrouped in bins of size {}".format(lengthBucketSize),
+            ha="center")
+        fig.text(0.02, 0.5, "Latency of one word (seconds)", va="center", rotation="vertical")
+        plt.show()
 
-def gbFree():
-    """Returns an integer number of GB free on system"""
-    return psutil.virtual_memory().available / 1000 / 1000 / 1000
 
 def catchup():
     """Benchmark missing re_math/methods while saving previous results.
@@ -456,40 +905,16 @@ def catchup():
         methods.add(method)
         todo[re_math] = methods
 
-    benchmarker = None
     nworkers = parseIntSafe(raw_input("How many worker processes? (1): "), 1)
     print("Catching up. Press Ctrl+C to stop")
     print("---------------------------------")
-    workers = set()
+    scheduler = Scheduler(Benchmarker, nworkers)
     try:
-        while len(todo) > 0:
-            while len(workers) >= nworkers or gbFree() < 5:
-                for pid in workers.copy():
-                    os.waitpid(pid, os.WNOHANG)
-                    if not psutil.pid_exists(pid):
-                        workers.discard(pid)
-                time.sleep(0.25)
-
-            re_math, methods = todo.popitem()
-            printable = re_math.encode("utf-8").encode("string-escape")
-            pid = os.fork()
-            if pid == 0: # child
-                gc.disable()
-                benchmarker = Benchmarker()
-                itersleft = benchmarker.db.selectall("SELECT itersleft FROM in_tests WHERE re_math=?;", [re_math])[0][0]
-                benchmarker.methods = methods
-                try:
-                    benchmarker.benchmark(re_math)
-                except:
-                    pass
-                finally:
-                    benchmarker.db.execute("UPDATE in_tests SET itersleft=? WHERE re_math=?;", [itersleft, re_math])
-                    exit(0)
-            else: # parent
-                workers.add(pid)
-                print("Catching up", printable, "for methods", methods)
+        scheduler.run(benchmarker, todo, countIteration=False)
     except KeyboardInterrupt:
         pass
+    finally:
+        scheduler.close()
 
 if __name__ == "__main__":
     # Default recursion limit is 1,000. Backtracking algorithm would then only accept words of length < 1,000.
@@ -503,6 +928,8 @@ if __name__ == "__main__":
     while choice != "Q":
         print("\n")
         print("D. Display summary of test results")
+        print("W. Display per-word latencies")
+        print("A. Analyze results: complexity exponents and CSV tables")
         print("L. Change how regular expression length is calculated")
         print("P. Print progress/regular expression length stats")
         print("T. Test through in_tests")
@@ -512,46 +939,24 @@ if __name__ == "__main__":
 
         if choice == "T":
             nworkers = parseIntSafe(raw_input("How many worker processes? (1): "), 1)
+            recordLatency = raw_input("Record per-word latencies? y/(n): ") == "y"
+            countOps = raw_input("Count the operations of the evaluations? y/(n): ") == "y"
             print("\nRunning tests. Press Ctrl+C to stop")
             print("-----------------------------------")
 
-            workers = set()
+            scheduler = Scheduler(functools.partial(Benchmarker, latency=recordLatency, countOps=countOps), nworkers)
             try:
                 while True:
-                    if benchmarker is None:
-                        benchmarker = Benchmarker()
-                    re_maths = [re_math for re_math, itersleft, error in benchmarker if itersleft > 0 and error == ""]
-                    random.shuffle(re_maths)
-                    benchmarker = None
-                    if len(re_maths) == 0:
+                    todo = dict((re_math, benchmarker.methods)
+                        for re_math, itersleft, error in benchmarker if itersleft > 0 and error == "")
+                    if len(todo) == 0:
                         print("Done benchmarking!")
                         break
-
-                    for expr in re_maths:
-                        while len(workers) >= nworkers or gbFree() < 5:
-                            for pid in workers.copy():
-                                os.waitpid(pid, os.WNOHANG)
-                                if not psutil.pid_exists(pid):
-                                    workers.discard(pid)
-                            time.sleep(0.25)
-
-                        pid = os.fork()
-                        if pid == 0: # child
-                            try:
-                                gc.disable()
-                                Benchmarker().benchmark(expr)
-                            except:
-                                pass
-                            finally:
-                                exit(0)
-                        else: # parent
-                            workers.add(pid)
-                            print("\nBenchmarking", expr.encode("utf-8").encode("string-escape"), "...")
+                    scheduler.run(benchmarker, todo)
             except KeyboardInterrupt:
-                for pid in workers:
-                    os.kill(pid, 2)
+                pass
             finally:
-                benchmarker = Benchmarker()
+                scheduler.close()
         elif choice == "P":
             stats = dict()
             for length, count, itersleft in benchmarker.statsToDo():
@@ -601,7 +1006,27 @@ if __name__ == "__main__":
             except ValueError:
                 ymax = None
 
-            benchmarker.displayResults(lengthBucketSize, nConstructions, nEvals, xmax, ymax)
+            print("\tMemory shown below the times:")
+            print("\t\t1. None")
+            print("\t\t2. Size of the structure which evaluates the words")
+            memoryMeasure = {2: "m_retained"}.get(
+                parseIntSafe(raw_input("\tMenu option (1): "), 1))
+
+            benchmarker.displayResults(lengthBucketSize, nConstructions, nEvals, xmax, ymax, memoryMeasure)
+        elif choice == "A":
+            directory = raw_input("\tDirectory of the CSV tables (analysis): ") or "analysis"
+            lengthBucketSize = parseIntSafe(raw_input("\tExpression length bin width (1): "), 1)
+            exponents = analysis.report(benchmarker.db, directory, lengthBucketSize)
+            print("\nMethod           Measure     Results   Exponent       R^2")
+            for method, measure, n, k, stderr, _, r2 in zip(*exponents.values()):
+                print(method.ljust(16), measure.ljust(11), str(n).ljust(9),
+                    "{:.2f} +- {:.2f}".format(k, stderr).ljust(14), "{:.3f}".format(r2))
+            print("\nExported to", directory)
+            raw_input("Press Enter to continue ... ")
+        elif choice == "W":
+            lengthBucketSize = parseIntSafe(raw_input("\tExpression length bin width (1): "), 1)
+            xmax = parseIntSafe(raw_input("\tMaximum length shown (180): "), 180)
+            benchmarker.displayLatencies(lengthBucketSize, xmax)
         elif choice == "L":
             print("\nHow should the length of the regular expression be evaluated?")
             print("\t1. Python string length")
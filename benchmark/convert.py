@@ -2,20 +2,47 @@ from __future__ import print_function
 import lark
 import regex
 import subprocess
+import multiprocessing
+import select
+import fcntl
+import errno
 import json
+import os
+import hashlib
+import tempfile
+from collections import OrderedDict, deque
 
 import errors
+import math_parser
+import prog_parser
+import spans
 from reex_ext import *
 
+FADOIZE_WINDOW = 64 # requests in flight per benchmark/parse.js worker (see `Converter#FAdoize_many()`)
+PARSE_CACHE_SIZE = 256 # most recently parsed expressions kept by each Converter (see `Converter#math()`)
+
 class Converter(object):
-    _nodeProc = None
+    _nodeProcs = [] # the benchmark/parse.js workers shared by every Converter (see `#initNodeProcs()`)
+    _larkParser = None # shared by every Converter which uses Lark, loaded by the first one
 
     """A class to parse a string/unicode expression into FAdo objects."""
-    def __init__(self):
-        self._parser = lark.Lark.open("benchmark/re.lark", start="expression",
-            parser="lalr", transformer=LarkToFAdo())
+    def __init__(self, useLark=False, useProgParser=False):
+        """:param bool useLark: if `#math()` uses the Lark parser of `benchmark/re.lark` instead of the
+                                equivalent (and faster) `math_parser.py`
+        :param bool useProgParser: if `#prog()` builds its trees with `prog_parser.py` instead of formatting
+                                   expressions with `benchmark/parse.js` (see `#FAdoize()`), which is
+                                   faster but not yet verified against `parse.js` (see
+                                   `mini_experiments/prog_parser_check.py`)
+        """
+        self._useProgParser = useProgParser
+        self._parsed = OrderedDict() # (expression, partialMatch) -> regexp tree, least recently used first
+        self._parse = math_parser.parse
+        if useLark:
+            if Converter._larkParser is None:
+                Converter._larkParser = _loadLarkParser()
+            self._parse = Converter._larkParser.parse
 
-    def math(self, expression, partialMatch=False):
+    def math(self, expression, partialMatch=False, cached=True):
         """Convert a `benchmark/re.lark` formatted string into a FAdo regexp tree.
         :param unicode|str expression: the expression to convert
         ..note: if there are non-ascii symbols in the expression, it must be passed
@@ -24,16 +51,29 @@ class Converter(object):
                 (ordinals up to 2**16 (65,536) exclusive)
         :param bool partialMatch: given any text T, U, and word weL(expression),
                                   should the regexp tree match text 'TwU'?
+        :param bool cached: if the tree of a recently parsed expression can be returned (the same
+                            object, so it must not be modified), pass False when timing the parse
         :returns reex.regexp: the parsed regexp tree
         :raises: if there's a parsing error, or if anchors are found in non-"edge"
                  leaf positions
         """
+        if cached:
+            key = (expression, partialMatch)
+            re = self._parsed.pop(key, None)
+            if re is None:
+                re = self.math(expression, partialMatch, cached=False)
+                if len(self._parsed) >= PARSE_CACHE_SIZE:
+                    self._parsed.popitem(last=False)
+            self._parsed[key] = re
+            return re
+
         # \r => \\r, \t => \\t, \n ==> \\n... this seems to be the fastest method
         expression = expression.replace("\r", "\\r")
         expression = expression.replace("\t", "\\t")
         expression = expression.replace("\n", "\\n")
 
-        re = self._parser.parse(expression) # type: uregexp
+        with spans.span("parse"):
+            re = self._parse(expression) # type: uregexp
         if partialMatch:
             return re.partialMatch()
         else:
@@ -51,39 +91,60 @@ class Converter(object):
         :returns reex.regexp: the parsed regexp tree
         :raises: if there's a parsing error, or if anchors are found in non-"edge"
                  leaf positions
-        ..note: self.prog is much slower than self.math since it has to spin up a
+        ..note: without useProgParser, self.prog is much slower than self.math since it has to spin up a
             NodeJS process in order to execute additional logic
         """
+        if self._useProgParser:
+            re = prog_parser.parse(self._FAdoizeInput(expression).decode("utf-8", "replace"))
+            re = re.partialMatch() if partialMatch else re
+            re.expression = expression
+            return re
+
         formatted = self.FAdoize(expression)
         try:
-            re = self.math(formatted, partialMatch=partialMatch)
+            re = self.math(formatted, partialMatch=partialMatch, cached=False) # re.expression is set below
             re.expression = expression
             return re
         except lark.exceptions.LarkError as e:
             print(expression, "was formatted as", formatted)
             raise e
 
+    def initNodeProcs(self, processes=1):
+        """Initializes the NodeJS processes - giving access to the npm regexp-tree library
+        :param int processes: the minimum number of `benchmark/parse.js` workers to have running
+        :returns list<subprocess.Popen>: the first `processes` workers
+        """
+        if len(Converter._nodeProcs) == 0:
+            import atexit
+            atexit.register(Converter._terminateNodeProcs)
+        while len(Converter._nodeProcs) < processes:
+            Converter._nodeProcs.append(Converter._startNodeProc())
+        return Converter._nodeProcs[:processes]
+
     def initNodeProc(self):
-        """Initializes the NodeJS process - giving access to the npm regexp-tree library"""
-        if Converter._nodeProc is not None: # already referenced
-            return
-
-        # start the process
-        import atexit
-        Converter._nodeProc = subprocess.Popen(["node", "benchmark/parse.js"],
-            stderr=subprocess.STDOUT,
+        """Initializes a single NodeJS process (see `#initNodeProcs()`)"""
+        self.initNodeProcs(1)
+
+    @staticmethod
+    def _startNodeProc():
+        # stderr is not redirected into stdout, where any warning would break the protocol
+        proc = subprocess.Popen(["node", os.path.join(os.path.dirname(os.path.abspath(__file__)), "parse.js")],
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE)
-        atexit.register(lambda: Converter._nodeProc.terminate())
+        # requests are written with os.write when select allows it, so a full pipe never blocks
+        fcntl.fcntl(proc.stdin, fcntl.F_SETFL, fcntl.fcntl(proc.stdin, fcntl.F_GETFL) | os.O_NONBLOCK)
+        return proc
 
-    def FAdoize(self, expression, validate=False):
-        """Convert an "ambiguous" expression used by a programmer into an expression
-        ready to parse into FAdo using the `benchmark/re.lark` grammar.
-        :param unicode|str expression: the expression to convert into unambiguous FAdo
-        :param bool validate: if this function should try and parse into FAdo to detect edge-case
-            errors such as poorly-placed anchors.
-        :returns unicode: the parenthesized and formatted expression
-        :raises errors.FAdoizeError: if `benchmark/parse.js` throws
+    @staticmethod
+    def _terminateNodeProcs():
+        for proc in Converter._nodeProcs:
+            if proc.poll() is None:
+                proc.terminate()
+
+    def _FAdoizeInput(self, expression):
+        """Makes expression ready for `benchmark/parse.js`
+        :returns str: the utf-8 encoded expression
+        :raises errors.FAdoizeError: if expression is empty
         """
         # regexp-tree doesn't support repetition in the form a{,n} as a{0,n}... convert manually
         def repl(match):
@@ -109,27 +170,120 @@ class Converter(object):
 
         if type(expression) is unicode: # ensure expression is utf-8 encoded string
             expression = expression.encode("utf-8")
+        return expression
 
-        self.initNodeProc()
-        Converter._nodeProc.stdin.write(expression)
-        Converter._nodeProc.stdin.flush()
-        output = json.loads(Converter._nodeProc.stdout.readline())
-
+    def _FAdoizeOutput(self, expression, output, validate):
+        """:param str expression: the expression sent to `benchmark/parse.js`
+        :param dict output: the response of `benchmark/parse.js` to expression
+        :returns unicode|BaseException: the formatted expression, or the error `#FAdoize()` raises
+        """
         if output["error"] != 0:
             logs = reduce(lambda p, c: p + "\n" + c, output["logs"])
             logs_and_callback = (logs + "\n\n" + output["error"]).encode("utf-8")
-            raise errors.FAdoizeError(expression, logs_and_callback)
-        else:
-            formatted = output["formatted"] # type: unicode
-            if validate:
-                try:
-                    self.math(formatted, partialMatch=True)
-                except lark.LarkError:
-                    logs = reduce(lambda p, c: p + "\n" + c, output["logs"])
-                    print("\nExpression '{0}' formatted as '{1}'\nFAdoize Logs: {2}\n\n" \
-                        .format(expression, formatted, logs))
-                    raise
-            return formatted
+            return errors.FAdoizeError(expression, logs_and_callback)
+
+        formatted = output["formatted"] # type: unicode
+        if validate:
+            try:
+                self.math(formatted, partialMatch=True)
+            except lark.LarkError as e:
+                logs = reduce(lambda p, c: p + "\n" + c, output["logs"])
+                print("\nExpression '{0}' formatted as '{1}'\nFAdoize Logs: {2}\n\n" \
+                    .format(expression, formatted, logs))
+                return e
+        return formatted
+
+    def FAdoize(self, expression, validate=False):
+        """Convert an "ambiguous" expression used by a programmer into an expression
+        ready to parse into FAdo using the `benchmark/re.lark` grammar.
+        :param unicode|str expression: the expression to convert into unambiguous FAdo
+        :param bool validate: if this function should try and parse into FAdo to detect edge-case
+            errors such as poorly-placed anchors.
+        :returns unicode: the parenthesized and formatted expression
+        :raises errors.FAdoizeError: if `benchmark/parse.js` throws
+        ..note: use `#FAdoize_many()` to convert many expressions, it does not wait for each response
+        """
+        result = self.FAdoize_many([expression], validate=validate, processes=1)[0]
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    def FAdoize_many(self, expressions, validate=False, processes=None):
+        """Like `#FAdoize()` for many expressions, pipelined over a pool of `benchmark/parse.js`
+        workers. Each worker has up to FADOIZE_WINDOW requests in flight, and the responses are
+        matched to their expression by request id.
+        :param list<unicode|str> expressions: the expressions to convert
+        :param bool validate: (see `#FAdoize()`)
+        :param int processes: the maximum number of workers, defaults to the number of cpus
+        :returns list<unicode|BaseException>: for each expression, its formatted expression or the error
+            `#FAdoize()` would raise for it alone (i.e., errors.FAdoizeError or lark.LarkError)
+        ..note: a worker which dies fails its requests in flight with errors.FAdoizeError, and
+                is replaced
+        """
+        results = [None] * len(expressions)
+        inputs = dict() # id -> the expression sent
+        lines = dict()  # id -> the request line
+        for i, expression in enumerate(expressions):
+            try:
+                inputs[i] = self._FAdoizeInput(expression)
+            except errors.FAdoizeError as e:
+                results[i] = e
+                continue
+            lines[i] = json.dumps({"id": i, "expression": inputs[i].decode("utf-8", "replace"), "logs": validate}) + "\n"
+        if len(lines) == 0:
+            return results
+
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        processes = max(1, min(processes, (len(lines) + FADOIZE_WINDOW - 1) // FADOIZE_WINDOW))
+        workers = self.initNodeProcs(processes)
+
+        requests = sorted(lines, reverse=True) # the ids to send, popped from the end
+        inFlight = [deque() for _ in workers] # ids sent to each worker, in the order they are answered
+        outgoing = [""] * len(workers)      # bytes not yet written to each worker
+        incoming = [""] * len(workers)      # bytes of a response not yet completely read
+
+        while len(requests) > 0 or any(inFlight):
+            for k in xrange(len(workers)):
+                while len(requests) > 0 and len(inFlight[k]) < FADOIZE_WINDOW:
+                    i = requests.pop()
+                    inFlight[k].append(i)
+                    outgoing[k] += lines[i]
+
+            readable, writable, _ = select.select(
+                [workers[k].stdout for k in xrange(len(workers)) if inFlight[k]],
+                [workers[k].stdin for k in xrange(len(workers)) if outgoing[k]], [])
+            for k in xrange(len(workers)):
+                w = workers[k]
+                if w.stdin in writable:
+                    try:
+                        outgoing[k] = outgoing[k][os.write(w.stdin.fileno(), outgoing[k]):]
+                    except OSError as e:
+                        if e.errno not in (errno.EAGAIN, errno.EPIPE):
+                            raise
+                        # on EPIPE the worker died, which reading its stdout detects
+                if w.stdout not in readable:
+                    continue
+
+                data = os.read(w.stdout.fileno(), 1 << 16)
+                if data == "": # the worker died on its oldest request, the others are sent again
+                    i = inFlight[k].popleft()
+                    results[i] = errors.FAdoizeError(inputs[i], "benchmark/parse.js exited with code {0}".format(w.wait()))
+                    requests.extend(reversed(inFlight[k]))
+                    inFlight[k] = deque()
+                    outgoing[k] = incoming[k] = ""
+                    workers[k] = Converter._nodeProcs[k] = Converter._startNodeProc()
+                    continue
+
+                responses = (incoming[k] + data).split("\n")
+                incoming[k] = responses.pop()
+                for line in responses:
+                    output = json.loads(line)
+                    i = output["id"]
+                    inFlight[k].remove(i)
+                    results[i] = self._FAdoizeOutput(inputs[i], output, validate)
+
+        return results
 
 class LarkToFAdo(lark.visitors.Transformer_InPlace):
     """Used with parser="lalr" to transform the tree in real-time into FAdo objects.
@@ -151,4 +305,28 @@ class LarkToFAdo(lark.visitors.Transformer_InPlace):
     symbol_esc = lambda _, e: uatom(unicode(e.children[0].value.decode("string-escape")))
     EPSILON = lambda _0, _1: uepsilon()
     DOTANY = lambda _0, _1: dotany()
-    ANCHOR = lambda _, e: anchor(e.value)
\ No newline at end of file
+    ANCHOR = lambda _, e: anchor(e.value)
+
+def _loadLarkParser():
+    """:returns lark.Lark: the `benchmark/re.lark` LALR parser which transforms into FAdo objects
+    ..note: the parse tables are saved in the temporary directory, so they are only computed once
+            for each version of the grammar (Lark's own cache=True is broken in python2)
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "re.lark")
+    with open(path, "rb") as f:
+        grammar = f.read()
+    cache = os.path.join(tempfile.gettempdir(), ".re_lark_{0}.pickle".format(
+        hashlib.md5(grammar + lark.__version__).hexdigest()))
+    try:
+        with open(cache, "rb") as f:
+            # as Lark.load, which does not accept a transformer in this version of Lark
+            return lark.Lark.__new__(lark.Lark)._load(f, transformer=LarkToFAdo())
+    except Exception:
+        pass # not saved yet, or unreadable
+
+    parser = lark.Lark(grammar.decode("utf-8"), start="expression", parser="lalr", transformer=LarkToFAdo())
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(cache))
+    with os.fdopen(fd, "wb") as f:
+        parser.save(f)
+    os.rename(tmp, cache) # atomic, so other processes never load a partially saved parser
+    return parser
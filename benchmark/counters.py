@@ -0,0 +1,144 @@
+"""Operation counts of the word evaluations, which `benchmark.py` records in its counting mode (see
+`Benchmarker#countOperations()`) into the table out_counters, to explain why a method is faster than
+another beyond their times.
+
+Counting is opt-in and costs next to nothing otherwise: `counting()` swaps counting versions of the
+hot methods into their classes for its duration and then swaps the originals back, so outside of it
+the evaluators run their unchanged code. The partial derivative evaluators count themselves into
+`reex_ext._counts` instead, which `counting()` sets, at the cost of a test per character otherwise:
+    with counters.counting() as counts:
+        nfa.evalWordP(word)
+    counts["statesVisited"] / float(counts["symbols"]) # the states visited per character
+
+The counters (COUNTERS):
+    symbols:                characters read by `InvariantNFA#evalSymbol()` or the partial derivative
+                            evaluators (`uregexp#evalWordP_PD()`, `uregexp#evalWordP_PD_Optimized()`)
+    statesVisited:          states (or partial derivatives) a character was read from, including the
+                            steps of the enumerations (`CrossSectionEnumerator`, `InvariantNFA#minTransition()`)
+    transitionsExamined:    labels of the outgoing transitions of the visited states which were tested
+    derivative, intersect:  calls of the derivatives and intersections of regexp nodes and labels
+    memoHits, memoMisses:   partial derivatives of a (partial derivative, character) pair which the partial
+                            derivative evaluators had, or had not, already computed
+    epsilonClosures:        calls of `InvariantNFA#epsilonClosure()`
+    setAllocations:         sets and dicts built by the counted methods themselves (not by their callees)
+    backtrackCalls, backtrackSteps: calls of `_backtrackMatch()` and the suffixes they yielded
+"""
+import collections
+
+import reex_ext # before fa_ext, which it imports
+import fa_ext
+
+COUNTERS = ["symbols", "statesVisited", "transitionsExamined", "derivative", "intersect", "memoHits",
+    "memoMisses", "epsilonClosures", "setAllocations", "backtrackCalls", "backtrackSteps"]
+
+_counts = None # the Counter of the open `counting()`, or None if the originals are in place
+
+def _examined(delta, state):
+    """:returns int: the non-epsilon transition labels of state"""
+    labels = delta.get(state)
+    if labels is None:
+        return 0
+    return len(labels) - (1 if "@epsilon" in labels else 0)
+
+def _evalSymbol(evalSymbol):
+    def counted(self, stil, sym):
+        _counts["symbols"] += 1
+        _counts["statesVisited"] += len(stil)
+        _counts["transitionsExamined"] += sum(_examined(self.delta, p) for p in stil)
+        _counts["setAllocations"] += 2
+        return evalSymbol(self, stil, sym)
+    return counted
+
+def _epsilonClosure(epsilonClosure):
+    def counted(self, st):
+        _counts["epsilonClosures"] += 1
+        _counts["setAllocations"] += 2
+        return epsilonClosure(self, st)
+    return counted
+
+def _minTransition(minTransition):
+    def counted(self, state, label=None):
+        _counts["statesVisited"] += 1
+        _counts["transitionsExamined"] += len(self.delta.get(state, ()))
+        return minTransition(self, state, label)
+    return counted
+
+def _enumStep(step):
+    def counted(self, states, *args):
+        _counts["statesVisited"] += len(states)
+        _counts["transitionsExamined"] += sum(_examined(self.nfa.delta, s) for s in states)
+        _counts["setAllocations"] += 1
+        return step(self, states, *args)
+    return counted
+
+def _call(name):
+    def wrap(method):
+        def counted(self, *args):
+            _counts[name] += 1
+            return method(self, *args)
+        return counted
+    return wrap
+
+def _backtrackMatch(backtrackMatch):
+    def counted(self, word):
+        _counts["backtrackCalls"] += 1
+        for rest in backtrackMatch(self, word):
+            _counts["backtrackSteps"] += 1
+            yield rest
+    return counted
+
+def _subclasses(cls):
+    """:returns list<type>: cls and every class derived from it"""
+    classes = [cls]
+    for sub in cls.__subclasses__():
+        classes.extend(c for c in _subclasses(sub) if c not in classes)
+    return classes
+
+def _resolve(cls, name):
+    """:returns function|None: the function of cls.name (not an unbound method), if it has one"""
+    for c in cls.__mro__:
+        if name in c.__dict__:
+            return c.__dict__[name]
+    return None
+
+def _hooks():
+    """:returns list<Tuple(type, str, function)>: each class and name to swap, and the factory of the
+        counting version from the original function
+    """
+    hooks = [(fa_ext.InvariantNFA, "evalSymbol", _evalSymbol),
+             (fa_ext.InvariantNFA, "epsilonClosure", _epsilonClosure),
+             (fa_ext.InvariantNFA, "minTransition", _minTransition),
+             (fa_ext.CrossSectionEnumerator, "_step", _enumStep),
+             (fa_ext.CrossSectionEnumerator, "_minStep", _enumStep)]
+    for cls in _subclasses(reex_ext.uregexp): # each node type resolves its own
+        for name, factory in [("derivative", _call("derivative")), ("intersect", _call("intersect")),
+                ("_backtrackMatch", _backtrackMatch)]:
+            if _resolve(cls, name) is not None:
+                hooks.append((cls, name, factory))
+    return hooks
+
+class counting(object):
+    """Counts the operations of the evaluations within this context (see COUNTERS). Countings can be
+    nested: the inner one is counted on its own, and the outer one resumes after it.
+    """
+    def __enter__(self):
+        global _counts
+        self._outer = _counts
+        self._swapped = []
+        if _counts is None:
+            hooks = [(cls, name, factory, _resolve(cls, name)) for cls, name, factory in _hooks()]
+            for cls, name, factory, original in hooks: # resolved before any swap
+                self._swapped.append((cls, name, cls.__dict__.get(name)))
+                setattr(cls, name, factory(original))
+        _counts = reex_ext._counts = collections.Counter()
+        return _counts
+
+    def __exit__(self, *exc_info):
+        global _counts
+        for cls, name, own in reversed(self._swapped):
+            if own is None: # inherited
+                delattr(cls, name)
+            else:
+                setattr(cls, name, own)
+        _counts = reex_ext._counts = self._outer
+        return False
@@ -1,3 +1,5 @@
+from lark.exceptions import LarkError
+
 class FAdoExtError(BaseException):
     """The general parent class which every other exception in this module inherits from"""
     def __init__(self):
@@ -40,6 +42,19 @@ class FAdoizeError(URegexpError):
     def __str__(self):
         return "FAdoizeError on: {0}\n{1}".format(self.prog, self.trace)
 
+class MathParseError(URegexpError, LarkError):
+    """When an expression does not follow the `benchmark/re.lark` grammar (see `math_parser.py`). It is
+    a LarkError so it is handled like the errors of the Lark parser"""
+    def __init__(self, expression, column, msg):
+        super(MathParseError, self).__init__()
+        self.expression = expression
+        self.column = column
+        self.msg = msg
+
+    def __str__(self):
+        return "MathParseError at column {0}: {1}\n{2}".format(self.column, self.msg,
+            self.expression.encode("utf-8") if type(self.expression) is unicode else self.expression)
+
 class CharRangeError(URegexpError):
     """When a character range is illegally formed"""
     def __init__(self, chars, lo, hi):
@@ -65,4 +80,34 @@ class UnknownREtoNFAMethod(InvariantNFAError):
 
     def __str__(self):
         return "UnknownREtoNFAMethod: {0} not in ".format(str(self.invalidMethod)) \
-            + "nfaPD, nfaPDO, nfaPosition, nfaFollow, nfaGlushkov, nfaThompson"
\ No newline at end of file
+            + "nfaPD, nfaPDO, nfaPosition, nfaFollow, nfaGlushkov, nfaThompson"
+
+class NFAFormatError(InvariantNFAError):
+    """When a serialized InvariantNFA (see `fa_binary.py`) cannot be read or written"""
+    def __init__(self, msg):
+        super(NFAFormatError, self).__init__()
+        self.msg = msg
+
+    def __str__(self):
+        return "NFAFormatError: {0}".format(self.msg)
+
+class NativeRegexError(FAdoExtError):
+    """When Python's `re` or `regex` module cannot compile the translation of an expression (see
+    `native_regex.py`)"""
+    def __init__(self, method, pattern, msg):
+        super(NativeRegexError, self).__init__()
+        self.method = method
+        self.pattern = pattern
+        self.msg = msg
+
+    def __str__(self):
+        return "NativeRegexError in {0}: {1}\n{2}".format(self.method, self.msg, self.pattern.encode("utf-8"))
+
+class EvalTimeoutError(FAdoExtError):
+    """When the evaluation of a word takes longer than its time limit"""
+    def __init__(self, timeout):
+        super(EvalTimeoutError, self).__init__()
+        self.timeout = timeout
+
+    def __str__(self):
+        return "EvalTimeoutError: a word took longer than {0}s".format(self.timeout)
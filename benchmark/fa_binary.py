@@ -0,0 +1,254 @@
+"""A compact and versioned binary format for InvariantNFA's (see `dumps`, `loads` and `NFAView`).
+
+Every field is a little-endian unsigned 32 bit word, except the header:
+    header    magic "INFA", version (16 bits), flags (16 bits), nstates, ntrans, nlabels, nwords
+    initial   ceil(nstates/32) words, bit s is set if state s is initial
+    final     ceil(nstates/32) words, bit s is set if state s is final
+    sigma     ceil(nlabels/32) words, bit l is set if label l is in Sigma
+    rowptr    nstates+1 words, the transitions of state s are the edges rowptr[s] to rowptr[s+1]-1
+    edgeLabel ntrans words, the label index of each edge
+    edgeDest  ntrans words, the destination state of each edge
+    labelptr  nlabels+1 words, label l is the words labelptr[l] to labelptr[l+1]-1 of labels
+    labels    nwords words, each label is one of: [EPSILON], [ATOM, codepoint], [DOTANY],
+              [CHARS, lo, hi, lo, hi, ...] or [NEGCHARS, lo, hi, ...] (the ranges of a `chars`)
+
+..note: state names are not saved (see `InvariantNFA#compact()`), states are their indexes
+"""
+import array
+import mmap
+import struct
+import sys
+
+import errors
+import fa_ext
+import reex_ext
+from util import UniUtil
+
+MAGIC = "INFA"
+FORMAT_VERSION = 1 # increment on any change to the layout above
+
+EPSILON, ATOM, DOTANY, CHARS, NEGCHARS = range(5)
+
+_HEADER = struct.Struct("<4sHHIIII")
+_WORD = struct.Struct("<I")
+_TYPECODE = "I" if array.array("I").itemsize == 4 else "L"
+
+def _encodeLabel(label):
+    """:param uatom|str label: a transition label of an InvariantNFA
+    :returns Tuple(int): the words representing label
+    :raises NFAFormatError: if label is not a transition label
+    """
+    t = type(label)
+    if t is str and label == "@epsilon":
+        return (EPSILON,)
+    elif t is reex_ext.dotany:
+        return (DOTANY,)
+    elif t is reex_ext.chars:
+        words = [NEGCHARS if label.neg else CHARS]
+        for lo, hi in label.ranges:
+            words.append(UniUtil.ord(lo))
+            words.append(UniUtil.ord(hi))
+        return tuple(words)
+    elif t is reex_ext.uatom and len(label.val) == 1:
+        return (ATOM, UniUtil.ord(label.val))
+    raise errors.NFAFormatError("cannot encode the label " + repr(label))
+
+def _decodeLabel(words):
+    """:param list<int> words: the words representing a label (see `_encodeLabel`)
+    :returns uatom|str: the label
+    """
+    kind = words[0]
+    if kind == EPSILON:
+        return "@epsilon"
+    elif kind == ATOM:
+        return reex_ext.uatom(UniUtil.chr(words[1]))
+    elif kind == DOTANY:
+        return reex_ext.dotany()
+    elif kind == CHARS or kind == NEGCHARS:
+        return reex_ext.chars([(UniUtil.chr(words[i]), UniUtil.chr(words[i + 1]))
+            for i in xrange(1, len(words), 2)], neg=kind == NEGCHARS)
+    raise errors.NFAFormatError("unknown label kind " + str(kind))
+
+def _bitset(items, n):
+    """:param iterable<int> items: integers in [0, n)
+    :returns list<int>: ceil(n/32) words where bit i is set if i is in items
+    """
+    words = [0] * ((n + 31) // 32)
+    for i in items:
+        words[i >> 5] |= 1 << (i & 31)
+    return words
+
+def _members(words, n):
+    """The inverse of `_bitset`
+    :returns list<int>: the integers in [0, n) with a set bit in words
+    """
+    return [i for i in xrange(n) if words[i >> 5] >> (i & 31) & 1]
+
+def dumps(nfa):
+    """Serializes the structure of an InvariantNFA (see the module's documentation)
+    :param InvariantNFA nfa: the automaton
+    :returns str: the serialized automaton, e.g., to be saved as a BLOB or sent to another process
+    :raises NFAFormatError: if nfa has a transition label which is not from `reex_ext.py`
+    """
+    n = len(nfa.States)
+    codes = dict() # label -> words, equal labels have equal words
+    for s in nfa.delta:
+        for t in nfa.delta[s]:
+            if t not in codes:
+                codes[t] = _encodeLabel(t)
+    for t in nfa.Sigma:
+        if t not in codes:
+            codes[t] = _encodeLabel(t)
+    table = sorted(set(codes.values()))
+    index = dict((words, i) for i, words in enumerate(table))
+
+    rowptr = [0]
+    edgeLabel = []
+    edgeDest = []
+    for s in xrange(n):
+        edges = set()
+        for t, dests in nfa.delta.get(s, dict()).items():
+            l = index[codes[t]]
+            for d in dests:
+                edges.add((l, d))
+        for l, d in sorted(edges):
+            edgeLabel.append(l)
+            edgeDest.append(d)
+        rowptr.append(len(edgeLabel))
+
+    labelptr = [0]
+    for words in table:
+        labelptr.append(labelptr[-1] + len(words))
+
+    words = array.array(_TYPECODE)
+    words.extend(_bitset(nfa.Initial, n))
+    words.extend(_bitset(nfa.Final, n))
+    words.extend(_bitset([index[codes[t]] for t in nfa.Sigma], len(table)))
+    words.extend(rowptr)
+    words.extend(edgeLabel)
+    words.extend(edgeDest)
+    words.extend(labelptr)
+    for label in table:
+        words.extend(label)
+    if sys.byteorder == "big":
+        words.byteswap()
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, 0, n, len(edgeLabel), len(table), labelptr[-1]) \
+        + words.tostring()
+
+def loads(data):
+    """:param str|buffer|mmap.mmap data: a serialized InvariantNFA (see `dumps`)
+    :returns InvariantNFA: the automaton, with states named by their indexes
+    :raises NFAFormatError: if data is not a supported serialized InvariantNFA
+    """
+    return NFAView(data).toInvariantNFA()
+
+def binaryP(data):
+    """:param str|buffer|mmap.mmap data:
+    :returns bool: if data starts like a serialized InvariantNFA (as opposed to, e.g., a dill pickle)
+    """
+    return len(data) >= _HEADER.size and data[:len(MAGIC)] == MAGIC
+
+def dump(nfa, path):
+    """Serializes nfa (see `dumps`) into the file at path"""
+    with open(path, "wb") as f:
+        f.write(dumps(nfa))
+
+def load(path):
+    """Maps the file at path into memory without reading it
+    :returns NFAView: the view of the serialized InvariantNFA in the file (see `dump`)
+    """
+    with open(path, "rb") as f:
+        return NFAView(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+class NFAView(object):
+    """Read-only access to a serialized InvariantNFA without decoding it. Only the header is read
+    on creation, and every other query only reads the words it needs from the buffer, so a `mmap`ed
+    file or a sqlite BLOB can be inspected without copying or unpickling it.
+    """
+    def __init__(self, data):
+        """:param str|buffer|mmap.mmap data: a serialized InvariantNFA (see `dumps`)
+        :raises NFAFormatError: if data is not a supported serialized InvariantNFA
+        """
+        if not binaryP(data):
+            raise errors.NFAFormatError("not a serialized InvariantNFA")
+        _, version, _, self.nstates, self.ntrans, self.nlabels, nwords = _HEADER.unpack_from(data)
+        if version != FORMAT_VERSION:
+            raise errors.NFAFormatError("unsupported version {0} (expected {1})".format(version, FORMAT_VERSION))
+
+        self.data = data
+        self._initial = _HEADER.size
+        self._final = self._initial + 4 * ((self.nstates + 31) // 32)
+        self._sigma = self._final + 4 * ((self.nstates + 31) // 32)
+        self._rowptr = self._sigma + 4 * ((self.nlabels + 31) // 32)
+        self._edgeLabel = self._rowptr + 4 * (self.nstates + 1)
+        self._edgeDest = self._edgeLabel + 4 * self.ntrans
+        self._labelptr = self._edgeDest + 4 * self.ntrans
+        self._labels = self._labelptr + 4 * (self.nlabels + 1)
+        if len(data) != self._labels + 4 * nwords:
+            raise errors.NFAFormatError("expected {0} bytes, not {1}".format(self._labels + 4 * nwords, len(data)))
+
+    def _words(self, section, i, j):
+        """:returns Tuple(int): the words i to j-1 of a section"""
+        return struct.unpack_from("<{0}I".format(j - i), self.data, section + 4 * i)
+
+    def _bit(self, section, i):
+        return _WORD.unpack_from(self.data, section + 4 * (i >> 5))[0] >> (i & 31) & 1 == 1
+
+    def initialP(self, state):
+        return self._bit(self._initial, state)
+
+    def finalP(self, state):
+        return self._bit(self._final, state)
+
+    def initial(self):
+        """:returns list<int>: the initial states"""
+        return _members(self._words(self._initial, 0, (self.nstates + 31) // 32), self.nstates)
+
+    def final(self):
+        """:returns list<int>: the final states"""
+        return _members(self._words(self._final, 0, (self.nstates + 31) // 32), self.nstates)
+
+    def transitions(self, state):
+        """:returns list<Tuple(int, int)>: the (label index, destination) of each transition of state,
+        sorted by label index (see `#label()`)
+        """
+        lo, hi = self._words(self._rowptr, state, state + 2)
+        return zip(self._words(self._edgeLabel, lo, hi), self._words(self._edgeDest, lo, hi))
+
+    def label(self, index):
+        """:returns uatom|str: the label with the given index"""
+        lo, hi = self._words(self._labelptr, index, index + 2)
+        return _decodeLabel(self._words(self._labels, lo, hi))
+
+    def toInvariantNFA(self):
+        """Decodes the whole automaton
+        :returns InvariantNFA: the automaton, with states named by their indexes
+        """
+        words = array.array(_TYPECODE)
+        words.fromstring(self.data[self._initial:])
+        if sys.byteorder == "big":
+            words.byteswap()
+        at = lambda section: (section - self._initial) // 4
+
+        labelptr = words[at(self._labelptr):at(self._labels)]
+        labelWords = words[at(self._labels):]
+        labels = [_decodeLabel(labelWords[labelptr[l]:labelptr[l + 1]]) for l in xrange(self.nlabels)]
+
+        nfa = fa_ext.InvariantNFA()
+        nfa.States = range(self.nstates)
+        nfa.Initial = set(_members(words[at(self._initial):at(self._final)], self.nstates))
+        nfa.Final = set(_members(words[at(self._final):at(self._sigma)], self.nstates))
+        nfa.setSigma(set(labels[l] for l in _members(words[at(self._sigma):at(self._rowptr)], self.nlabels)))
+
+        rowptr = words[at(self._rowptr):at(self._edgeLabel)]
+        edgeLabel = words[at(self._edgeLabel):at(self._edgeDest)]
+        edgeDest = words[at(self._edgeDest):at(self._labelptr)]
+        for s in xrange(self.nstates):
+            lo, hi = rowptr[s], rowptr[s + 1]
+            if lo == hi:
+                continue
+            dests = dict() # label index -> destinations (labels hash slowly)
+            for e in xrange(lo, hi):
+                dests.setdefault(edgeLabel[e], set()).add(edgeDest[e])
+            nfa.delta[s] = dict((labels[l], ds) for l, ds in dests.items())
+        return nfa
@@ -1,9 +1,65 @@
 from FAdo import fa, reex
-from copy import deepcopy
-from random import randint
+import bisect
+import random
+import sys
 
 import reex_ext
-from util import WeightedRandomItem, Deque
+import spans
+from util import Deque, UniUtil
+
+MAX_SIMULATION_STATES = 500 # mergeSimilarStates computes a relation on pairs of states
+
+def _simulation(states, succ, accepting):
+    """Computes the simulation preorder of a transition system over symbol classes. q simulates
+    p when q accepts if p accepts, and every transition of p on a class is matched by a transition
+    of q on that class to a state simulating p's target.
+    :param iterable<int> states:
+    :param dict<int, list<Tuple(int, int, frozenset<int>)>> succ: the sorted class segments of each
+    state, see `SymbolClasses.segments`
+    :param set<int> accepting: the accepting states
+    :returns set<Tuple(int, int)>: all pairs (p, q) such that q simulates p
+    """
+    states = list(states)
+    pred = dict((s, set()) for s in states)
+    covered = dict() # {state: bitmask of the class ids it reads}
+    for s in states:
+        covered[s] = 0
+        for lo, hi, qs in succ[s]:
+            covered[s] |= ((1 << (hi - lo + 1)) - 1) << lo
+            for q in qs:
+                pred[q].add(s)
+
+    # simulators[p] is the set of states q such that (p, q) is (still) in the relation
+    simulators = dict((p, set(q for q in states if (p not in accepting or q in accepting)
+                                                and covered[p] & ~covered[q] == 0))
+                      for p in states)
+
+    def simulates(p, q):
+        j = 0
+        q_segments = succ[q]
+        for lo, hi, p_targets in succ[p]:
+            # every class lo..hi read by p must be read by q into a state simulating each target
+            current = lo
+            while current <= hi:
+                while q_segments[j][1] < current:
+                    j += 1
+                q_targets = q_segments[j][2]
+                for p2 in p_targets:
+                    if simulators[p2].isdisjoint(q_targets):
+                        return False
+                current = q_segments[j][1] + 1
+        return True
+
+    pending = [(p, q) for p in states for q in simulators[p]]
+    while len(pending) > 0:
+        p, q = pending.pop()
+        if q in simulators[p] and not simulates(p, q):
+            simulators[p].discard(q)
+            for p0 in pred[p]:
+                for q0 in pred[q]:
+                    if q0 in simulators[p0]:
+                        pending.append((p0, q0))
+    return set((p, q) for p in states for q in simulators[p])
 
 class InvariantNFA(fa.NFA):
     """A class that extends NFA to properly handle `chars` and `dotany`
@@ -48,7 +104,30 @@ class InvariantNFA(fa.NFA):
         self.delta = nfa.delta
 
     def dup(self):
-        return deepcopy(self)
+        """Duplicates the structure (States, Initial, Final and delta) of the InvariantNFA
+        :returns InvariantNFA: the copy
+        ..note: transition labels are shared with self since they are never modified after
+                construction (unlike deepcopy, which also copies every `chars` RangeList)
+        """
+        new = InvariantNFA()
+        new.setSigma(self.Sigma)
+        new.States = self.States[:]
+        new.Initial = self.Initial.copy()
+        new.Final = self.Final.copy()
+        for s in self.delta:
+            new.delta[s] = dict()
+            for t in self.delta[s]:
+                new.delta[s][t] = self.delta[s][t].copy()
+        return new
+
+    def compact(self):
+        """Replaces the state names (i.e., the RPN strings of nfaPDRPN, the dag ids of nfaPDDAG or the
+        pairs of a product) by their indexes, so only the structure of the automaton is kept (in place)
+        :returns list: names[i] is the previous name of state i, if they are needed for debugging
+        """
+        names = self.States
+        self.States = range(len(names))
+        return names
 
     def succintTransitions(self):
         transitions = super(InvariantNFA, self).succintTransitions()
@@ -79,10 +158,9 @@ class InvariantNFA(fa.NFA):
             self.delta[sti1][sym].discard(sti2)
 
             if len(self.delta[sti1][sym]) == 0:
+                del self.delta[sti1][sym]
                 if len(self.delta[sti1]) == 0:
                     del self.delta[sti1]
-                else:
-                    del self.delta[sti1][sym]
 
     def acyclicP(self):
         """Rewritten since its implementation seems incorrect and error-prone
@@ -117,49 +195,318 @@ class InvariantNFA(fa.NFA):
         except CycleFound:
             return False
 
+    def reduce(self):
+        """The reduction pipeline: trims useless states, merges parallel labels, and merges states
+        which are equivalent under forward then backward simulation (in place)
+        :returns list<Tuple(str, int, int)>: (stage, #states, #transitions) before the pipeline
+        ("construction") and after each stage
+        """
+        report = [("construction", len(self.States), self.countTransitions())]
+        for stage, reduction in [("trim", self.trim),
+                                 ("mergeParallelLabels", self.mergeParallelLabels),
+                                 ("mergeSimilarStates", self.mergeSimilarStates)]:
+            with spans.span(stage):
+                reduction()
+            report.append((stage, len(self.States), self.countTransitions()))
+        return report
+
+    def mergeParallelLabels(self):
+        """Replaces the parallel transitions between each pair of states by a single transition
+        whose label is the union of their labels (in place)
+        :returns InvariantNFA: self
+        """
+        classes = SymbolClasses(self)
+        labels = dict() # {runs of class ids: label}
+        for trans in self.delta.values():
+            for t in trans:
+                if t != "@epsilon":
+                    labels.setdefault(classes.runsOf(t), t)
+
+        for s, trans in self.delta.items():
+            byTarget = dict() # {target: labels}
+            for t, qs in trans.items():
+                if t != "@epsilon":
+                    for q in qs:
+                        byTarget.setdefault(q, list()).append(t)
+            if all(len(ts) == 1 for ts in byTarget.values()):
+                continue
+
+            merged = dict() # {label: targets}
+            for q, ts in byTarget.items():
+                label = ts[0]
+                if len(ts) > 1:
+                    runs = SymbolClasses.runs(sorted(set(cid for t in ts for cid in classes.classesOf(t))))
+                    label = labels.get(runs, None)
+                    if label is None:
+                        label = labels[runs] = classes.label(runs)
+                merged.setdefault(label, set()).add(q)
+            if "@epsilon" in trans:
+                merged["@epsilon"] = trans["@epsilon"]
+            self.delta[s] = merged
+        self.setSigma(t for trans in self.delta.values() for t in trans if t != "@epsilon")
+        return self
+
+    def mergeSimilarStates(self):
+        """Merges the states which simulate each other, first forwards then backwards (in place).
+        Simulation equivalent states can be merged without changing the language.
+        ..note: skipped for automata with @epsilon transitions or more than
+                `MAX_SIMULATION_STATES` states, since simulation is computed on pairs of states
+        :returns InvariantNFA: self
+        """
+        if len(self.States) > MAX_SIMULATION_STATES or \
+                any("@epsilon" in trans for trans in self.delta.values()):
+            return self
+
+        for backward in (False, True):
+            classes = SymbolClasses(self)
+            succ = dict() # {state: [(first class id, last class id, successors)]}
+            if backward:
+                edges = dict((s, dict()) for s in xrange(len(self.States)))
+                for s, trans in self.delta.items():
+                    for t, qs in trans.items():
+                        for q in qs:
+                            edges[q].setdefault(t, set()).add(s)
+                reverse = InvariantNFA()
+                reverse.States = self.States
+                reverse.delta = edges
+                for s in xrange(len(self.States)):
+                    succ[s] = classes.segments(reverse, s, dict())
+                accepting = self.Initial
+            else:
+                for s in xrange(len(self.States)):
+                    succ[s] = classes.segments(self, s, dict())
+                accepting = self.Final
+
+            similar = _simulation(xrange(len(self.States)), succ, accepting)
+            merged = dict() # {state: the state it is merged into}
+            for p in xrange(len(self.States)):
+                if p in merged:
+                    continue
+                for q in xrange(p + 1, len(self.States)):
+                    if q not in merged and (p, q) in similar and (q, p) in similar:
+                        merged[q] = p
+            if len(merged) > 0:
+                self._mergeStates(merged)
+        return self
+
+    def _mergeStates(self, merged):
+        """Merges states (in place)
+        :param dict<int, int> merged: {state: the (unmerged) state which replaces it}
+        """
+        rename = lambda s: merged.get(s, s)
+        delta = dict()
+        for s, trans in self.delta.items():
+            for t, qs in trans.items():
+                delta.setdefault(rename(s), dict()).setdefault(t, set()).update(rename(q) for q in qs)
+        self.delta = delta
+        self.Initial = set(rename(s) for s in self.Initial)
+        self.Final = set(rename(s) for s in self.Final)
+        self.deleteStates(set(merged))
+
     def product(self, other):
+        """The product automaton, which accepts L(self) & L(other).
+        Both automata are split into the same symbol classes, so transitions are paired by
+        class id instead of intersecting every pair of labels, and only the pairs of states
+        reachable from the initial pairs are built.
+        :param InvariantNFA other:
+        :returns InvariantNFA: the product, whose states are named (self state, other state)
+        """
+        new = InvariantNFA()
+        for _ in self._productPairs(other, new):
+            pass
+        return new
+
+    def disjointP(self, other):
+        """Tests if L(self) & L(other) is empty, stopping at the first final pair of states
+        :param InvariantNFA other:
+        :returns bool:
+        """
+        for final in self._productPairs(other, InvariantNFA()):
+            if final:
+                return False
+        return True
+
+    def includedP(self, other):
+        """:param InvariantNFA other:
+        :returns bool: if L(self) is a subset of L(other)
+        ..see: `inclusionCounterexample` to find a word which proves otherwise
+        """
+        return self.inclusionCounterexample(other) is None
+
+    def equivalentP(self, other):
+        """Overridden: (FAdo's determinizes both automata over Sigma, which does not know
+        `chars` and `dotany`)
+        :param InvariantNFA other:
+        :returns bool: if L(self) == L(other)
+        ..see: `equivalenceCounterexample` to find a word which proves otherwise
+        """
+        return self.equivalenceCounterexample(other) is None
+
+    def equivalenceCounterexample(self, other):
+        """:param InvariantNFA other:
+        :returns unicode|None: a shortest word accepted by exactly one of self and other, or
+        None if they are equivalent
+        """
+        mine = self.inclusionCounterexample(other)
+        theirs = other.inclusionCounterexample(self)
+        if mine is None or theirs is None:
+            return theirs if mine is None else mine
+        return mine if len(mine) <= len(theirs) else theirs
+
+    def inclusionCounterexample(self, other):
+        """Searches L(self) - L(other) with the antichain algorithm: the pairs (state of self,
+        subset of other's states reached by the same word) are explored breadth-first over the
+        symbol classes of both automata, and a pair is skipped when a pair with the same state
+        of self and a subset of its subset was seen, since any word rejected from the larger
+        subset is rejected from the smaller one too.
+        :param InvariantNFA other:
+        :returns unicode|None: a shortest word in L(self) but not in L(other), or None if
+        L(self) is a subset of L(other)
+        ..see: M. De Wulf, L. Doyen, T. A. Henzinger, J.-F. Raskin. Antichains: A New Algorithm
+               for Checking Universality of Finite Automata. CAV 2006
+        """
+        seq_self = self.dup().elimEpsilon()
+        seq_other = other.dup().elimEpsilon()
+        classes = SymbolClasses(seq_self, seq_other)
+        s_segments, o_segments = dict(), dict()
+
+        antichain = dict() # {state of self: list of the minimal subsets of other seen with it}
+        def visit(p, subset):
+            """:returns bool: if (p, subset) is not subsumed, adding it to the antichain"""
+            seen = antichain.get(p, [])
+            if any(smaller <= subset for smaller in seen):
+                return False
+            antichain[p] = [larger for larger in seen if not subset <= larger] + [subset]
+            return True
+
+        queue = Deque()
+        initial = frozenset(seq_other.Initial)
+        for p in seq_self.Initial:
+            if visit(p, initial):
+                queue.insert_right((p, initial, None))
+
+        while not queue.isEmpty():
+            p, subset, path = queue.pop_left()
+            if seq_self.finalP(p) and not any(seq_other.finalP(q) for q in subset):
+                word = []
+                while path is not None:
+                    sym, path = path
+                    word.append(sym)
+                return u"".join(reversed(word))
+
+            # cut the classes read by p wherever the successors of p or of the subset change
+            p_next = classes.segments(seq_self, p, s_segments)
+            q_next = [classes.segments(seq_other, q, o_segments) for q in subset]
+            cuts = set(hi + 1 for _, hi, _ in p_next)
+            cuts.update(lo for lo, _, _ in p_next)
+            for segments in q_next:
+                cuts.update(lo for lo, _, _ in segments)
+                cuts.update(hi + 1 for _, hi, _ in segments)
+            cuts = sorted(cuts)
+
+            successors = dict() # {(successors of p, successors of subset): symbol}
+            pointers = [0] * len(q_next)
+            i = 0
+            for lo, end in zip(cuts, cuts[1:]):
+                while i < len(p_next) and p_next[i][1] < lo:
+                    i += 1
+                if i == len(p_next):
+                    break
+                if p_next[i][0] > lo:
+                    continue
+
+                succ = set()
+                for k, segments in enumerate(q_next):
+                    while pointers[k] < len(segments) and segments[pointers[k]][1] < lo:
+                        pointers[k] += 1
+                    if pointers[k] < len(segments) and segments[pointers[k]][0] <= lo:
+                        succ.update(segments[pointers[k]][2])
+                key = (p_next[i][2], frozenset(succ))
+                if key not in successors or not classes.printableP(successors[key]):
+                    successors[key] = classes.example(lo, end - 1)
+
+            for (p_succ, subset_succ), sym in successors.items():
+                for p2 in p_succ:
+                    if visit(p2, subset_succ):
+                        queue.insert_right((p2, subset_succ, (sym, path)))
+        return None
+
+    def _productPairs(self, other, new):
+        """Builds the product of self and other into `new`
+        :param InvariantNFA other:
+        :param InvariantNFA new: the (empty) automaton to build the product into
+        :yields bool: if the pair of states which was just added to new is final
+        """
         # both self and other must be e-free
         seq_self = self.dup().elimEpsilon()
         seq_other = other.dup().elimEpsilon()
+        classes = SymbolClasses(seq_self, seq_other)
+
+        # labels of either automaton are reused when they name exactly the same classes
+        labels = dict()
+        for aut in (seq_self, seq_other):
+            for trans in aut.delta.values():
+                for t in trans:
+                    labels.setdefault(classes.runsOf(t), t)
+        new.setSigma(labels.values())
 
         # note: s_... refers to `self` variables, and o_... refers to `other` variables
-        new = InvariantNFA()
-        notDone = set()
+        s_segments, o_segments = dict(), dict()
+        index = dict() # {(s, o): state index in new}
+        notDone = []
+        def addPair(pair):
+            new.States.append(pair) # pairs are unique by index, so skip addState's O(n) check
+            index[pair] = len(new.States) - 1
+            notDone.append(pair)
+            final = seq_self.finalP(pair[0]) and seq_other.finalP(pair[1])
+            if final:
+                new.addFinal(index[pair])
+            return final
 
-        # initial state(s)
         for s_initial in seq_self.Initial:
             for o_initial in seq_other.Initial:
-                so_index = new.addState((s_initial, o_initial))
-                new.addInitial(so_index)
-                notDone.add((s_initial, o_initial, so_index))
+                yield addPair((s_initial, o_initial))
+                new.addInitial(index[(s_initial, o_initial)])
 
-        # propagate
         while len(notDone) > 0:
-            s_current, o_current, so_index = notDone.pop()
-
-            s_next = seq_self.delta.get(s_current, dict()).items()
-            o_next = seq_other.delta.get(o_current, dict()).items()
-
-            for s_trans, s_states in s_next:
-                for o_trans, o_states in o_next:
-                    # note: both s_trans and o_trans will be reex_ext#uatom instances
-                    so_trans = s_trans.intersect(o_trans)
-                    if so_trans is None:
-                        continue
-
-                    destinations = set((s, o) for s in s_states for o in o_states)
-                    for dest in destinations:
-                        index = None
-                        try:
-                            index = new.stateIndex(dest)
-                        except:
-                            index = new.addState(dest)
-                            notDone.add((dest[0], dest[1], index))
-
-                        new.addTransition(so_index, so_trans, index)
-                        if seq_self.finalP(dest[0]) and seq_other.finalP(dest[1]):
-                            new.addFinal(index)
-        return new
+            s_current, o_current = pair = notDone.pop()
+            s_next = classes.segments(seq_self, s_current, s_segments)
+            o_next = classes.segments(seq_other, o_current, o_segments)
+
+            # sweep both (sorted) segment lists, collecting the classes read by each destination
+            destinations = dict()
+            i = j = 0
+            while i < len(s_next) and j < len(o_next):
+                s_lo, s_hi, s_states = s_next[i]
+                o_lo, o_hi, o_states = o_next[j]
+                lo, hi = max(s_lo, o_lo), min(s_hi, o_hi)
+                if lo <= hi:
+                    for dest in ((s, o) for s in s_states for o in o_states):
+                        runs = destinations.setdefault(dest, list())
+                        if len(runs) > 0 and runs[-1][1] == lo - 1:
+                            runs[-1] = (runs[-1][0], hi)
+                        else:
+                            runs.append((lo, hi))
+                if s_hi < o_hi:
+                    i += 1
+                else:
+                    j += 1
+
+            # merge the destinations by their classes, so each label is hashed once per state
+            # (labels hash by their repr) instead of once per transition through addTransition
+            byRuns = dict()
+            for dest, runs in destinations.items():
+                if dest not in index:
+                    yield addPair(dest)
+                byRuns.setdefault(tuple(runs), set()).add(index[dest])
+            if len(byRuns) > 0:
+                trans = new.delta[index[pair]] = dict()
+                for runs, dests in byRuns.items():
+                    label = labels.get(runs, None)
+                    if label is None:
+                        label = labels[runs] = classes.label(runs)
+                        new.addSigma(label)
+                    trans[label] = dests
 
     def witness(self):
         """Witness of non emptiness
@@ -200,6 +547,7 @@ class InvariantNFA(fa.NFA):
         isFinal = any(map(lambda s: self.finalP(s), targets))
         targets.remove(state)
 
+        self.delTransition(state, "@epsilon", state) # an epsilon self-loop (e.g., of nfaFollow on a?*) is not in targets
         for target in targets:
             self.delTransition(state, "@epsilon", target)
 
@@ -269,8 +617,9 @@ class EnumInvariantNFA(object):
         self.lengthProductTrim = dict()
         self.tmin = dict() # {k: v}
                            # {word_length: {state_index: minWord}}
-        self.memo_longest = -1
         self.memo_shortest = dict()
+        self._sampler = None
+        self._stats = None
 
     def __iter__(self):
         for word in self.enum(float("inf")):
@@ -278,7 +627,15 @@ class EnumInvariantNFA(object):
 
     def ewp(self):
         """:returns bool: if L(aut) includes the empty word"""
-        return self.aut.ewp()
+        return self.stats().ewp()
+
+    def stats(self):
+        """Gives access to the (memoized) statistics of L(aut)
+        :returns LanguageStats:
+        """
+        if self._stats is None:
+            self._stats = LanguageStats(self.aut)
+        return self._stats
 
     def minWord(self, length, start=None):
         """Finds the minimal word of length in L(aut) and memoizes the value
@@ -291,9 +648,11 @@ class EnumInvariantNFA(object):
             length = self.shortestWordLength()
         if length is None:
             return None
-
-        if length == 0:
-            return u"" if self.aut.ewp() else None
+        if start is None: # (the statistics are of L(aut), not of the words from start)
+            if self.stats().rejectsLength(length):
+                return None
+            if length == 0:
+                return u""
         nfa = self._sized(length)
         if len(nfa.Final) == 0:
             return None
@@ -344,35 +703,20 @@ class EnumInvariantNFA(object):
         :param unicode current: the current word to succeed
         :returns unicode|NoneType: the next word after current, or None if current is the last
         word in its cross-section
+        ..note: to succeed many words use `self.crossSection(len(current))` instead, which does
+                not re-simulate the prefix for every word
         """
-        current = list(current)
-        length = len(current)
-        nfa = self._sized(length)
-        stack = Deque([nfa.Initial])
+        enumerator = self.crossSection(len(current))
+        enumerator.seek(current)
+        return next(enumerator, None)
 
-        for c in current[:-1]:
-            stack.insert_right(nfa.evalSymbol(stack.peek_right(), c))
-
-        while len(stack) > 0:
-            possibleStates = stack.pop_right()
-            lastSym = None if len(current) == 0 else current.pop() # to succeed
-
-            for s in possibleStates:
-                t, nxt = nfa.minTransition(s, lastSym)
-                if t is None:
-                    continue
-
-                # find tmin from any in states
-                minWord = None
-                for u in nxt:
-                    word = self.minWord(length, start=u)
-                    if word < minWord or minWord is None:
-                        minWord = word
-
-                if minWord is not None:
-                    return reduce(lambda p, c: p + c, current, u"") + t + minWord
-
-        return None
+    def crossSection(self, length):
+        """:param int length: the length of the words to enumerate
+        :returns CrossSectionEnumerator: an iterator through the length cross-section of L(aut)
+        """
+        if self.stats().rejectsLength(length):
+            return CrossSectionEnumerator(InvariantNFA(), length)
+        return CrossSectionEnumerator(self._sized(length), length)
 
     def enumCrossSection(self, lo, hi=None):
         """Yield words with length in [lo, hi] in L(aut)
@@ -383,12 +727,14 @@ class EnumInvariantNFA(object):
         if hi is None:
             hi = lo
 
-        n = lo
+        stats = self.stats()
+        if stats.empty():
+            return
+        n = max(lo, stats.shortest)
+        hi = min(hi, stats.longest)
         while n <= hi:
-            current = self.minWord(n)
-            while current is not None:
-                yield current
-                current = self.nextWord(current)
+            for word in self.crossSection(n):
+                yield word
             n += 1
 
     def enum(self, n):
@@ -410,48 +756,45 @@ class EnumInvariantNFA(object):
         """Generates a random word in length's cross-section
         :param int length: the length of the desired word
         :returns unicode: the random word, or None if the cross-section is empty
+        ..note: words are drawn uniformly from the cross-section; see `WordSampler`
         """
-        nfa = self._sized(length)
-        if length == 0:
-            return u"" if self.ewp() else None
-        elif len(nfa.Final) == 0:
-            return None
-
-        word = u""
-        current = next(iter(nfa.Initial))
-        while not nfa.finalP(current):
-            rndtrans = WeightedRandomItem()
-            transitions = nfa.delta[current]
-            for trans, succ in transitions.items():
-                rndtrans.add(len(succ), (trans, succ))
+        return self.sampler().word(length)
 
-            trans, succ = rndtrans.get()
-            word += trans.random()
-            current = list(succ)[randint(0, len(succ) - 1)]
-        return word
+    def sampler(self):
+        """Gives access to the (memoized) uniform word sampler of L(aut)
+        :returns WordSampler:
+        """
+        if self._sampler is None:
+            self._sampler = WordSampler(self.aut, self.stats())
+        return self._sampler
 
     def shortestWordLength(self, gte=0):
         """Finds the shortest word length greater than or equal to gte
         :returns int|None:
         """
+        stats = self.stats()
+        if stats.empty() or gte > stats.longest:
+            return None
+        if gte <= stats.shortest:
+            return stats.shortest
         if gte in self.memo_shortest:
             return self.memo_shortest[gte]
 
-        current = Deque(self.aut.Initial)
-        visited = set()
+        # simulate the subsets reached at each depth; once a subset repeats past gte every
+        # following depth has been seen as well
+        current = frozenset(s for s in self.aut.Initial if s in stats.coaccessible)
+        seen = set()
         depth = 0
-        while not current.isEmpty():
-            next = Deque()
-            for s in current:
-                if depth >= gte and self.aut.finalP(s):
+        while len(current) > 0 and depth <= stats.longest:
+            if depth >= gte:
+                if any(self.aut.finalP(s) for s in current):
                     self.memo_shortest[gte] = depth
                     return depth
-                visited.add(s)
-
-                for child in self.aut.stateChildren(s):
-                    if child not in visited:
-                        next.insert_right(child)
-            current = next
+                if current in seen:
+                    break
+                seen.add(current)
+            current = frozenset(q for s in current for q in self.aut.stateChildren(s, True)
+                                if q in stats.coaccessible)
             depth += 1
 
         self.memo_shortest[gte] = None
@@ -460,30 +803,9 @@ class EnumInvariantNFA(object):
     def longestWordLength(self):
         """Finds the length of the longest word accepted by L(aut)
         ..note: commonly inf
+        :returns int|float|None: None if L(aut) is empty
         """
-        if self.memo_longest != -1:
-            return self.memo_longest
-
-        if not self.aut.acyclicP():
-            self.memo_longest = float("inf")
-            return float("inf")
-
-        depth = dict([(x, 0) for x in self.aut.Initial])
-        stack = Deque(self.aut.Initial)
-        while len(stack) > 0:
-            u = stack.pop_left() # consider all v's for transitions u --> v
-            for successors in self.aut.delta.get(u, dict()).values():
-                for v in successors:
-                    if depth[u] + 1 > depth.get(v, -1):
-                        depth[v] = depth[u] + 1
-                        stack.insert_right(v)
-
-        maxDepth = 0
-        for s in self.aut.Final:
-            maxDepth = max(maxDepth, depth.get(s, 0))
-
-        self.memo_longest = maxDepth
-        return maxDepth
+        return self.stats().longest
 
     def _sized(self, size):
         """Computes and memoizes the product of self.aut and lengthNFA of size `size`
@@ -495,4 +817,665 @@ class EnumInvariantNFA(object):
             nfa = self.aut.product(InvariantNFA.lengthNFA(size)).trim()
             self.lengthProductTrim[size] = nfa
             self.tmin[size] = dict()
-        return self.lengthProductTrim[size]
\ No newline at end of file
+        return self.lengthProductTrim[size]
+
+class LanguageStats(object):
+    """Statistics of L(aut) gathered in one linear-time pass over an InvariantNFA.
+
+    The strongly connected components are found with an iterative version of Tarjan's algorithm,
+    which lists them in reverse topological order, so the longest distance of every state to a
+    final state is known once its component is popped. Shortest distances to a final state come
+    from a 0-1 breadth-first search over the reversed transitions (@epsilon weighs 0).
+    ..note: states that can not reach a final state have no distances (None)
+    """
+    INF = float("inf")
+
+    def __init__(self, aut):
+        """:param InvariantNFA aut: any InvariantNFA (@epsilon transitions are allowed)"""
+        self.aut = aut
+        succ = dict([(s, list()) for s in xrange(len(aut.States))])
+        pred = dict([(s, list()) for s in xrange(len(aut.States))])
+        for s, trans in aut.delta.items():
+            for t, qs in trans.items():
+                w = 0 if t == "@epsilon" else 1
+                for q in qs:
+                    succ[s].append((q, w))
+                    pred[q].append((s, w))
+
+        self.accessible = self._reach(aut.Initial, succ)
+        self.coaccessible = self._reach(aut.Final, pred)
+        self.shortestTo = self._shortestDistances(pred)
+        self.sccs, self.sccOf = self._tarjan(succ)
+        self.longestTo = self._longestDistances(succ)
+
+        useful = [i for i in aut.Initial if i in self.coaccessible]
+        self.shortest = min(self.shortestTo[i] for i in useful) if useful else None
+        self.longest = max(self.longestTo[i] for i in useful) if useful else None
+
+    def empty(self):
+        """:returns bool: if L(aut) is empty"""
+        return self.shortest is None
+
+    def ewp(self):
+        """:returns bool: if L(aut) includes the empty word"""
+        return self.shortest == 0
+
+    def finite(self):
+        """:returns bool: if L(aut) is finite"""
+        return self.longest != LanguageStats.INF
+
+    def rejectsLength(self, length):
+        """Tells when a cross-section is known to be empty without looking at its words
+        :param int length:
+        :returns bool: True if no word of `length` can be in L(aut)
+        """
+        return self.shortest is None or length < self.shortest or length > self.longest
+
+    @staticmethod
+    def _reach(sources, edges):
+        """:returns set<int>: the states reachable from sources by following edges"""
+        seen = set(sources)
+        stack = list(seen)
+        while len(stack) > 0:
+            for q, _ in edges[stack.pop()]:
+                if q not in seen:
+                    seen.add(q)
+                    stack.append(q)
+        return seen
+
+    def _shortestDistances(self, pred):
+        """0-1 BFS from the final states over reversed transitions
+        :returns dict<int, int>: {state: the length of the shortest word it accepts}
+        """
+        dist = dict([(f, 0) for f in self.aut.Final])
+        queue = Deque(self.aut.Final)
+        while not queue.isEmpty():
+            q = queue.pop_left()
+            for s, w in pred[q]:
+                if dist[q] + w < dist.get(s, LanguageStats.INF):
+                    dist[s] = dist[q] + w
+                    if w == 0:
+                        queue.insert_left(s)
+                    else:
+                        queue.insert_right(s)
+        return dist
+
+    @staticmethod
+    def _tarjan(succ):
+        """Iterative Tarjan's strongly connected components
+        :returns Tuple(list<list<int>>, dict<int, int>): the components in reverse topological
+        order, and {state: index of its component}
+        """
+        index, low = dict(), dict()
+        onStack = set()
+        stack = []
+        sccs = []
+        sccOf = dict()
+        for root in succ:
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            onStack.add(root)
+            work = [(root, iter(succ[root]))]
+            while len(work) > 0:
+                v, edges = work[-1]
+                descended = False
+                for q, _ in edges:
+                    if q not in index:
+                        index[q] = low[q] = len(index)
+                        stack.append(q)
+                        onStack.add(q)
+                        work.append((q, iter(succ[q])))
+                        descended = True
+                        break
+                    elif q in onStack:
+                        low[v] = min(low[v], index[q])
+                if descended:
+                    continue
+
+                work.pop()
+                if len(work) > 0:
+                    u = work[-1][0]
+                    low[u] = min(low[u], low[v])
+                if low[v] == index[v]:
+                    scc = []
+                    while True:
+                        q = stack.pop()
+                        onStack.discard(q)
+                        sccOf[q] = len(sccs)
+                        scc.append(q)
+                        if q == v:
+                            break
+                    sccs.append(scc)
+        return sccs, sccOf
+
+    def _longestDistances(self, succ):
+        """Longest distances to a final state, propagated through the components in reverse
+        topological order. A component containing a symbol transition is a cycle, which makes
+        the distance of every coaccessible state reaching it infinite.
+        :returns dict<int, int|float>: {state: the length of the longest word it accepts}
+        """
+        dist = dict()
+        for cid, scc in enumerate(self.sccs):
+            if scc[0] not in self.coaccessible:
+                continue
+            best = 0 if any(self.aut.finalP(s) for s in scc) else None
+            for s in scc:
+                for q, w in succ[s]:
+                    if self.sccOf[q] == cid:
+                        if w > 0:
+                            best = LanguageStats.INF
+                    elif q in dist and (best is None or dist[q] + w > best):
+                        best = dist[q] + w
+            for s in scc:
+                dist[s] = best
+        return dist
+
+class CrossSectionEnumerator(object):
+    """An iterator through the words of one cross-section of an automaton in radix order.
+
+    The set of states reached after each prefix of the current word is kept on a stack between
+    words, so succeeding a word only backtracks the suffix which changes. Enumerating k words of
+    length n costs amortized time per emitted character instead of O(k * n * |NFA|).
+    """
+    def __init__(self, nfa, length):
+        """:param InvariantNFA nfa: the trim product of an automaton and `InvariantNFA.lengthNFA(length)`
+        i.e., every state it reaches after i symbols accepts some word of length - i
+        :param int length: the length of the words to enumerate
+        """
+        self.nfa = nfa
+        self.length = length
+        self.word = None  # list<unicode> the last yielded word
+        self.stack = None # stack[i] is the set of states reached after reading word[:i]
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        """:returns unicode: the next word of the cross-section
+        :raises StopIteration: when the cross-section is exhausted
+        """
+        if self.stack is None: # first word
+            self.word = []
+            self.stack = [set(self.nfa.Initial)]
+            if len(self.nfa.Final) == 0 or not self._fill():
+                self.stack = []
+        elif len(self.stack) > 0 and not self._succeed(len(self.word) - 1):
+            self.stack = []
+
+        if len(self.stack) == 0:
+            raise StopIteration()
+        return u"".join(self.word)
+
+    __next__ = next
+
+    def seek(self, current):
+        """Positions the enumerator such that the next word is the successor of current
+        :param unicode current: a word with the same length as the cross-section
+        """
+        self.word = list(current)
+        self.stack = [set(self.nfa.Initial)]
+        for sym in self.word:
+            states = self._step(self.stack[-1], sym)
+            if len(states) == 0:
+                break
+            self.stack.append(states)
+
+        # current[:len(stack) - 1] is a viable prefix, so `next` succeeds from its last position
+        depth = min(len(self.stack) - 1, self.length - 1)
+        del self.stack[depth + 1:]
+        del self.word[depth + 1:]
+
+    def _succeed(self, depth):
+        """Replaces word[depth:] by the smallest suffix that makes the word larger
+        :param int depth: the deepest position that may change
+        :returns bool: if a larger word exists
+        """
+        while depth >= 0:
+            del self.stack[depth + 1:]
+            sym, states = self._minStep(self.stack[depth], self.word[depth])
+            if sym is not None:
+                del self.word[depth:]
+                self.word.append(sym)
+                self.stack.append(states)
+                return self._fill()
+            depth -= 1
+        return False
+
+    def _fill(self):
+        """Completes the word with the smallest symbols until it reaches the cross-section length
+        :returns bool: if the word could be completed
+        """
+        while len(self.word) < self.length:
+            sym, states = self._minStep(self.stack[-1], None)
+            if sym is None:
+                return False
+            self.word.append(sym)
+            self.stack.append(states)
+        return True
+
+    def _minStep(self, states, label=None):
+        """Finds the smallest symbol greater than label that can be read from states
+        :param set<int> states: the current states
+        :param unicode|None label: the non-inclusive lower-bound of the symbol
+        :returns Tuple(unicode, set<int>): the symbol and the states it reaches, or (None, None)
+        """
+        minSym = None
+        successors = None
+        for s in states:
+            for t, qs in self.nfa.delta.get(s, dict()).items():
+                if t == "@epsilon":
+                    continue
+                sigma = t.next(label)
+                if sigma is None or (minSym is not None and minSym < sigma):
+                    continue
+                if minSym is None or sigma < minSym:
+                    minSym = sigma
+                    successors = set(qs)
+                else:
+                    successors.update(qs)
+        return minSym, successors
+
+    def _step(self, states, sym):
+        """:returns set<int>: the states reached from states by reading sym"""
+        res = set()
+        for s in states:
+            for t, qs in self.nfa.delta.get(s, dict()).items():
+                if t != "@epsilon" and type(t.derivative(sym)) is reex_ext.uepsilon:
+                    res.update(qs)
+        return res
+
+
+class SymbolClasses(object):
+    """A partition of the alphabet (every unicode ordinal) into disjoint intervals, called
+    symbol classes, such that the label of every transition in the given automata is
+    exactly a union of classes. All symbols of one class are indistinguishable to the
+    automata, so algorithms can work on class ids instead of symbols or label intersections.
+    """
+    PRINTABLE = (UniUtil.ord(u" "), 0xFFFF) # the symbols used by `dotany` and `chars` enumeration
+
+    def __init__(self, *auts):
+        """:param InvariantNFA auts: the automata whose labels must be unions of classes"""
+        self._labels = dict() # label: tuple of class ids
+        self._runs = dict()   # label: tuple of runs of class ids
+        self.explicit = set() # classes which are named by a positive label (uatom or chars)
+
+        bounds = set([0, sys.maxunicode + 1, self.PRINTABLE[0], self.PRINTABLE[1] + 1])
+        labels = set()
+        for aut in auts:
+            for trans in aut.delta.values():
+                for t in trans:
+                    if t != "@epsilon":
+                        labels.add(t)
+
+        for t in labels:
+            for lo, hi in self._ordRanges(t):
+                bounds.add(lo)
+                bounds.add(hi + 1)
+        self.starts = sorted(bounds)[:-1] # class i is [starts[i], starts[i+1] - 1]
+        self.ends = [s - 1 for s in self.starts[1:]] + [sys.maxunicode]
+
+        for t in labels:
+            if type(t) is reex_ext.uatom or (type(t) is reex_ext.chars and not t.neg):
+                self.explicit.update(self.classesOf(t))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _ordRanges(self, label):
+        """:returns list<Tuple(int, int)>: the inclusive ordinal ranges listed by label
+        ..note: negated chars and dotany list no ranges"""
+        if type(label) is reex_ext.dotany:
+            return []
+        elif type(label) is reex_ext.chars:
+            return [(UniUtil.ord(a), UniUtil.ord(b)) for a, b in label.ranges]
+        else:
+            o = UniUtil.ord(label.val)
+            return [(o, o)]
+
+    def classOf(self, symbol):
+        """:param unicode symbol: a single character
+        :returns int: the id of the class containing symbol"""
+        return bisect.bisect_right(self.starts, UniUtil.ord(symbol)) - 1
+
+    def classesOf(self, label):
+        """Finds the classes whose union is exactly the symbols accepted by label
+        :param reex_ext.uatom label: a transition label (uatom, chars or dotany)
+        :returns tuple<int>: sorted ids of the classes
+        """
+        ids = self._labels.get(label, None)
+        if ids is None:
+            listed = list()
+            for lo, hi in self._ordRanges(label):
+                first = bisect.bisect_right(self.starts, lo) - 1
+                last = bisect.bisect_right(self.starts, hi) - 1
+                listed.extend(xrange(first, last + 1))
+
+            if type(label) is reex_ext.dotany:
+                ids = tuple(xrange(len(self)))
+            elif type(label) is reex_ext.chars and label.neg:
+                excluded = set(listed)
+                ids = tuple(i for i in xrange(len(self)) if i not in excluded)
+            else:
+                ids = tuple(listed)
+            self._labels[label] = ids
+        return ids
+
+    def runsOf(self, label):
+        """The classes of a label as runs of consecutive class ids
+        :param reex_ext.uatom label: a transition label (uatom, chars or dotany)
+        :returns tuple<Tuple(int, int)>: sorted, disjoint and non-adjacent inclusive runs
+        """
+        runs = self._runs.get(label, None)
+        if runs is None:
+            runs = self._runs[label] = SymbolClasses.runs(self.classesOf(label))
+        return runs
+
+    @staticmethod
+    def runs(ids):
+        """Groups class ids into runs of consecutive ids
+        :param iterable<int> ids: sorted and distinct class ids
+        :returns tuple<Tuple(int, int)>: sorted, disjoint and non-adjacent inclusive runs
+        """
+        runs = []
+        for cid in ids:
+            if len(runs) > 0 and runs[-1][1] == cid - 1:
+                runs[-1] = (runs[-1][0], cid)
+            else:
+                runs.append((cid, cid))
+        return tuple(runs)
+
+    def segments(self, aut, state, memo):
+        """Splits the transitions of a state into runs of classes which reach the same states
+        :param InvariantNFA aut: an e-free automaton whose labels are unions of these classes
+        :param int state: the state index in aut
+        :param dict memo: memoizes the segments of each state of aut
+        :returns list<Tuple(int, int, frozenset<int>)>: sorted disjoint (first class id, last
+        class id, successors) segments which only cover classes read from state
+        """
+        segments = memo.get(state, None)
+        if segments is None:
+            runs = [(lo, hi, qs) for t, qs in aut.delta.get(state, dict()).items()
+                    for lo, hi in self.runsOf(t)]
+            cuts = sorted(set([lo for lo, _, _ in runs] + [hi + 1 for _, hi, _ in runs]))
+            segments = []
+            for lo, end in zip(cuts, cuts[1:]):
+                succ = set()
+                for a, b, qs in runs:
+                    if a <= lo and end - 1 <= b:
+                        succ.update(qs)
+                if len(succ) == 0:
+                    continue
+                succ = frozenset(succ)
+                if len(segments) > 0 and segments[-1][1] == lo - 1 and segments[-1][2] == succ:
+                    segments[-1] = (segments[-1][0], end - 1, succ)
+                else:
+                    segments.append((lo, end - 1, succ))
+            memo[state] = segments
+        return segments
+
+    def label(self, runs):
+        """Builds a transition label for a union of classes
+        :param tuple<Tuple(int, int)> runs: sorted runs of class ids (see `runsOf`)
+        :returns reex_ext.uatom: a uatom, chars or dotany that accepts exactly the classes' symbols
+        ..note: unions that include the first or the last class are written as negated chars (like
+                the labels they come from), since `chars.next` only enumerates negated chars from
+                the first printable symbol
+        """
+        if runs == ((0, len(self) - 1),):
+            return reex_ext.dotany()
+        elif len(runs) == 1 and runs[0][0] == runs[0][1] and self.size(runs[0][0]) == 1:
+            return reex_ext.uatom(self.symbol(runs[0][0]))
+
+        neg = runs[0][0] == 0 or runs[-1][1] == len(self) - 1
+        if neg: # complement the runs
+            bounds = [-1] + [x for lo, hi in runs for x in (lo, hi)] + [len(self)]
+            runs = [(bounds[k] + 1, bounds[k + 1] - 1) for k in xrange(0, len(bounds), 2)
+                    if bounds[k] + 1 <= bounds[k + 1] - 1]
+        ranges = [(UniUtil.chr(self.starts[lo]), UniUtil.chr(self.ends[hi])) for lo, hi in runs]
+        return reex_ext.chars(ranges, neg=neg)
+
+    def example(self, lo, hi):
+        """:returns unicode: a symbol of the classes lo..hi, printable if possible"""
+        first = max(lo, self.classOf(UniUtil.chr(self.PRINTABLE[0])))
+        if first <= min(hi, self.classOf(UniUtil.chr(self.PRINTABLE[1]))):
+            return self.symbol(first)
+        return self.symbol(lo)
+
+    def printableP(self, symbol):
+        """:returns bool: if symbol is in the range used by enumeration"""
+        return self.PRINTABLE[0] <= UniUtil.ord(symbol) <= self.PRINTABLE[1]
+
+    def size(self, cid):
+        """:returns int: the number of symbols in class cid"""
+        return self.ends[cid] - self.starts[cid] + 1
+
+    def weight(self, cid):
+        """The number of symbols in class cid that are considered by random generation. Classes
+        outside of the printable range only count when they are explicitly named by a label.
+        :returns int:
+        """
+        if cid in self.explicit or (self.PRINTABLE[0] <= self.starts[cid] and self.ends[cid] <= self.PRINTABLE[1]):
+            return self.size(cid)
+        return 0
+
+    def symbol(self, cid, offset=0):
+        """:returns unicode: the offset-th symbol of class cid"""
+        return UniUtil.chr(self.starts[cid] + offset)
+
+
+class WordSampler(object):
+    """Draws words uniformly at random from the cross-sections of L(aut).
+
+    Words (not paths) are counted on the subset construction of aut over symbol classes, so
+    ambiguous automata are not biased towards words with many accepting paths. Every class
+    contributes its number of symbols (`SymbolClasses.weight`), which is how `chars` and
+    `dotany` transitions are weighted. A word is then unranked from one uniformly chosen index
+    in O(n * |subset transitions|).
+    """
+    def __init__(self, aut, stats=None):
+        """:param InvariantNFA aut: must be an e-free InvariantNFA
+        :param LanguageStats|None stats: the statistics of L(aut) (to skip empty cross-sections)
+        """
+        self.aut = aut
+        self.stats = stats if stats is not None else LanguageStats(aut)
+        self.classes = SymbolClasses(aut)
+        self.initial = frozenset(aut.Initial)
+        self._succ = dict()  # subset: list of (weight, successor subset, [(weight, class id)])
+        self._count = dict() # (subset, remaining length): number of words
+
+    def _successors(self, subset):
+        """Memoized transitions of a subset where classes with the same successor subset
+        are grouped together
+        :param frozenset subset: the set of current states
+        :returns list<Tuple(int, frozenset, list<Tuple(int, int)>)>:
+        """
+        groups = self._succ.get(subset, None)
+        if groups is None:
+            byClass = dict()
+            for s in subset:
+                for t, qs in self.aut.delta.get(s, dict()).items():
+                    for cid in self.classes.classesOf(t):
+                        byClass.setdefault(cid, set()).update(qs)
+
+            bySubset = dict()
+            for cid, qs in byClass.items():
+                w = self.classes.weight(cid)
+                if w > 0:
+                    bySubset.setdefault(frozenset(qs), list()).append((w, cid))
+
+            groups = [(sum(w for w, _ in cls), succ, sorted(cls, key=lambda x: x[1]))
+                      for succ, cls in bySubset.items()]
+            self._succ[subset] = groups
+        return groups
+
+    def count(self, length):
+        """The number of words of a length in L(aut)
+        :param int length:
+        :returns int|long: the exact size of the cross-section
+        """
+        if self.stats.rejectsLength(length):
+            return 0
+        return self._countFrom(self.initial, length)
+
+    def _countFrom(self, subset, length):
+        """Iteratively counts the words of a length accepted from a subset of states"""
+        if (subset, length) in self._count:
+            return self._count[(subset, length)]
+
+        # forward: find the subsets which are reachable at each depth
+        layers = [set([subset])]
+        for depth in xrange(length):
+            nxt = set()
+            for current in layers[-1]:
+                if (current, length - depth) not in self._count:
+                    nxt.update(succ for _, succ, _ in self._successors(current))
+            layers.append(nxt)
+
+        # backward: count the words of the remaining length from each subset
+        for depth in xrange(length, -1, -1):
+            remaining = length - depth
+            for current in layers[depth]:
+                if (current, remaining) in self._count:
+                    continue
+                if remaining == 0:
+                    n = 1 if any(self.aut.finalP(s) for s in current) else 0
+                else:
+                    n = 0
+                    for w, succ, _ in self._successors(current):
+                        n += w * self._count[(succ, remaining - 1)]
+                self._count[(current, remaining)] = n
+        return self._count[(subset, length)]
+
+    def unrank(self, length, index):
+        """Finds the index-th word of a cross-section (in the sampler's internal order)
+        :param int length: the length of the word
+        :param int|long index: 0 <= index < self.count(length)
+        :returns unicode: the word
+        """
+        word = []
+        subset = self.initial
+        for remaining in xrange(length, 0, -1):
+            for w, succ, cls in self._successors(subset):
+                block = self._countFrom(succ, remaining - 1)
+                if index < w * block:
+                    symbolIndex, index = divmod(index, block)
+                    for cw, cid in cls:
+                        if symbolIndex < cw:
+                            word.append(self.classes.symbol(cid, symbolIndex))
+                            break
+                        symbolIndex -= cw
+                    subset = succ
+                    break
+                index -= w * block
+        return u"".join(word)
+
+    def word(self, length, rng=random):
+        """Draws one word uniformly at random from the length cross-section of L(aut)
+        :param int length: the length of the desired word
+        :param random.Random rng: the source of randomness
+        :returns unicode|None: the random word, or None if the cross-section is empty
+        """
+        total = self.count(length)
+        if total == 0:
+            return None
+        return self.unrank(length, rng.randrange(total))
+
+    def sample(self, length, k, rng=random, distinct=False):
+        """Draws k words uniformly at random from the length cross-section of L(aut)
+        :param int length: the length of the desired words
+        :param int k: the number of words to draw
+        :param random.Random rng: the source of randomness
+        :param bool distinct: if the words must be different (draws without replacement), in
+                              which case at most self.count(length) words are returned
+        :returns list<unicode>: the random words
+        """
+        total = self.count(length)
+        if total == 0:
+            return []
+        if not distinct:
+            return [self.unrank(length, rng.randrange(total)) for _ in xrange(k)]
+
+        chosen = set()
+        while len(chosen) < min(k, total):
+            chosen.add(rng.randrange(total))
+        return [self.unrank(length, index) for index in chosen]
+
+
+class LazyDFA(object):
+    """Decides the membership of many words in L(aut) with the subset construction of aut over
+    symbol classes (see `SymbolClasses`). The construction is lazy: only the subsets and the
+    transitions that the words reach are built, and they are shared by every later word, so a
+    word costs one memoized lookup per symbol once the common paths are known.
+    """
+    def __init__(self, aut):
+        """:param InvariantNFA aut: the automaton (it can have epsilon transitions)"""
+        self.aut = aut
+        self.classes = SymbolClasses(aut)
+        self.initial = self._close(aut.Initial)
+        self._delta = dict() # (subset, class id): subset
+        self._final = dict() # subset: if it has a final state
+
+    def _close(self, states):
+        """:returns frozenset<int>: the epsilon closure of states"""
+        closure = set()
+        for s in states:
+            if s not in closure:
+                closure.update(self.aut.epsilonClosure(s))
+        return frozenset(closure)
+
+    def step(self, subset, cid):
+        """:returns frozenset<int>: the subset reached from subset by reading a symbol of class cid"""
+        nxt = self._delta.get((subset, cid), None)
+        if nxt is None:
+            states = set()
+            for s in subset:
+                for t, qs in self.aut.delta.get(s, dict()).items():
+                    if t != "@epsilon" and any(lo <= cid <= hi for lo, hi in self.classes.runsOf(t)):
+                        states.update(qs)
+            nxt = self._close(states)
+            self._delta[(subset, cid)] = nxt
+        return nxt
+
+    def finalP(self, subset):
+        final = self._final.get(subset, None)
+        if final is None:
+            final = any(self.aut.finalP(s) for s in subset)
+            self._final[subset] = final
+        return final
+
+    def evalWordP(self, word):
+        """:returns bool: if word is in L(aut)"""
+        subset = self.initial
+        for sym in word:
+            subset = self.step(subset, self.classes.classOf(sym))
+            if len(subset) == 0:
+                return False
+        return self.finalP(subset)
+
+    def evalWordsP(self, words):
+        """Decides the membership of a batch of words. They are visited in sorted order so the
+        subsets of the prefix shared with the previous word are reused, like walking a trie.
+        :param list<unicode> words: the batch
+        :returns list<bool>: if each word of the batch is in L(aut)
+        """
+        results = [False] * len(words)
+        previous = u""
+        path = [self.initial] # path[i] is the subset reached by previous[:i]
+        for index in sorted(xrange(len(words)), key=words.__getitem__):
+            word = words[index]
+            common = 0
+            limit = min(len(word), len(previous), len(path) - 1)
+            while common < limit and word[common] == previous[common]:
+                common += 1
+            del path[common + 1:]
+            subset = path[common]
+            for sym in word[common:]:
+                if len(subset) == 0:
+                    break
+                subset = self.step(subset, self.classes.classOf(sym))
+                path.append(subset)
+            results[index] = len(path) == len(word) + 1 and self.finalP(subset)
+            previous = word
+        return results
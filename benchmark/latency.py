@@ -0,0 +1,118 @@
+"""Per-word evaluation latencies, which `benchmark.py` records in its latency mode (see
+`Benchmarker#measure()`) into the table out_word_latency.
+
+The latencies of each expression and method are kept in a `Histogram` with logarithmic buckets
+(like an HDR histogram): it has a bounded size whatever the number of words, its percentiles are
+within PRECISION of the exact ones, and the histograms of many iterations or expressions are merged
+by adding their counts.
+"""
+import ctypes
+import ctypes.util
+import math
+import marshal
+import os
+import timeit
+import zlib
+
+LOWEST = 1e-7       # seconds; smaller latencies are counted in the first bucket
+PRECISION = 0.01    # the relative width of a bucket
+PERCENTILES = [50, 95, 99]
+
+class _timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+def _monotonicClock():
+    """:returns function: which returns the seconds of a monotonic clock with nanosecond resolution
+    (clock_gettime(CLOCK_MONOTONIC), which Python 2 does not expose), or the best timer of `timeit`
+    if it is unavailable
+    """
+    CLOCK_MONOTONIC = 1 # linux/time.h
+    try:
+        librt = ctypes.CDLL(ctypes.util.find_library("rt") or "librt.so.1", use_errno=True)
+        clock_gettime = librt.clock_gettime
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(_timespec)]
+    except (OSError, AttributeError):
+        return timeit.default_timer
+    spec = _timespec()
+    ref = ctypes.byref(spec)
+    def _clock():
+        if clock_gettime(CLOCK_MONOTONIC, ref) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        return spec.tv_sec + spec.tv_nsec * 1e-9
+    return _clock
+
+clock = _monotonicClock()
+
+class Histogram(object):
+    """The counts of latencies in buckets whose bounds grow by a factor of 1 + PRECISION"""
+    _LOG_BASE = math.log(1 + PRECISION)
+
+    def __init__(self, latencies=[]):
+        """:param iterable<float> latencies: seconds to add"""
+        self.counts = dict() # bucket: number of latencies
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+        for t in latencies:
+            self.add(t)
+
+    @classmethod
+    def bucket(cls, t):
+        """:returns int: the bucket which counts a latency of t seconds"""
+        return 0 if t <= LOWEST else int(math.log(t / LOWEST) / cls._LOG_BASE) + 1
+
+    @classmethod
+    def upper(cls, bucket):
+        """:returns float: the largest latency counted by bucket"""
+        return LOWEST * (1 + PRECISION) ** bucket
+
+    def add(self, t):
+        b = Histogram.bucket(t)
+        self.counts[b] = self.counts.get(b, 0) + 1
+        self.n += 1
+        self.total += t
+        self.max = max(self.max, t)
+
+    def merge(self, other):
+        """Adds the counts of other to this histogram
+        :returns Histogram: self
+        """
+        for b, count in other.counts.iteritems():
+            self.counts[b] = self.counts.get(b, 0) + count
+        self.n += other.n
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentile(self, p):
+        """:param float p: 0 < p <= 100
+        :returns float|None: the latency which p percent of the latencies are less than or equal to
+            (the upper bound of its bucket, or the maximum), or None if there are no latencies
+        """
+        if self.n == 0:
+            return None
+        rank = max(1, int(math.ceil(self.n * p / 100.0)))
+        seen = 0
+        for b in sorted(self.counts):
+            seen += self.counts[b]
+            if seen >= rank:
+                return min(Histogram.upper(b), self.max)
+        return self.max
+
+    def summary(self):
+        """:returns list<float|None>: the PERCENTILES and the maximum"""
+        return [self.percentile(p) for p in PERCENTILES] + [self.max if self.n > 0 else None]
+
+    def dumps(self):
+        """:returns str: the compressed histogram (see `loads()`)"""
+        return zlib.compress(marshal.dumps((self.counts, self.n, self.total, self.max)))
+
+    @staticmethod
+    def loads(data):
+        """:param str|buffer data: see `Histogram#dumps()`
+        :returns Histogram:
+        """
+        h = Histogram()
+        h.counts, h.n, h.total, h.max = marshal.loads(zlib.decompress(data))
+        return h
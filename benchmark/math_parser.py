@@ -0,0 +1,130 @@
+"""A single pass, non-recursive parser for the `benchmark/re.lark` format which builds `reex_ext`
+trees directly, instead of building the Lark parse tree and transforming every node of it.
+
+It accepts exactly the expressions which the Lark parser accepts, tokenized the same way as Lark's
+contextual lexer does (see the notes in `parse` and `_chars`). A syntax error raises
+`errors.MathParseError`, which is a `lark.LarkError`.
+"""
+import errors
+from reex_ext import uatom, chars, dotany, uepsilon, anchor, ustar, uoption, uconcat, udisj
+
+_ESCAPED = {u"r": u"\r", u"n": u"\n", u"t": u"\t"} # symbol_esc
+_FOLLOW = set(u"*? )") # the first characters of the tokens which can follow an expression
+
+def _error(text, i, expected):
+    found = "the end" if i >= len(text) else repr(text[i])
+    return errors.MathParseError(text, i, "expected {0}, not {1}".format(expected, found))
+
+def _charsSym(text, i):
+    """:returns Tuple(unicode, int): the chars_sym starting at i, and the index after it"""
+    if i < len(text) and text[i] == u"\\":
+        i += 1
+    if i >= len(text) or text[i] == u"\n": # /./ does not match a new line
+        raise _error(text, i, "a symbol")
+    return unicode(text[i]), i + 1
+
+def _chars(text, i):
+    """Parses pos_chars or neg_chars
+    :param int i: the index of the opening "["
+    :returns Tuple(chars, int): the character class, and the index after its closing "]"
+    ..note: as Lark's contextual lexer only considers the tokens which the parser accepts, "]" and
+            "-" are symbols where a class can not end or a range can not continue. Yet the parser
+            state after the end of a range is shared with the one after a symbol, so "-" right
+            after a range is a range's "-" and is an error.
+    """
+    neg = text.startswith(u"[^", i)
+    i += 2 if neg else 1
+    items = []
+    afterRange = False
+    while True:
+        if items and i < len(text) and text[i] == u"]":
+            i += 1
+            if i < len(text) and text[i] not in _FOLLOW: # Lark fails to read it before making the class
+                raise _error(text, i, "'*', '?', ' ', ' + ', ')' or the end")
+            return chars(items, neg=neg), i
+        if afterRange and i < len(text) and text[i] == u"-":
+            raise _error(text, i, "a symbol or ']'")
+
+        lo, i = _charsSym(text, i)
+        if i < len(text) and text[i] == u"-":
+            hi, i = _charsSym(text, i + 1)
+            items.append((lo, hi))
+            afterRange = True
+        else:
+            items.append(lo)
+            afterRange = False
+
+def parse(text):
+    """Converts a `benchmark/re.lark` formatted string into a FAdo regexp tree
+    :param unicode|str text: the expression (see `Converter#math()`)
+    :returns uregexp: the regexp tree
+    :raises errors.MathParseError: if text does not follow the grammar
+    :raises UnicodeDecodeError: if text is a str with non-ascii symbols (pass them as unicode)
+    ..note: every token which can start an expression is tried from the longest to the shortest (as
+            Lark does), so "@any", "@epsilon", "<ASTART>", "<AEND>", "[^" and "\\r", "\\n", "\\t"
+            take precedence over their first symbol, and "(" or "[" always open a group or class
+    """
+    if type(text) is str:
+        text = text.decode("ascii")
+    n = len(text)
+    groups = [] # each open "(" as [udisj|uconcat|None, first operand|None]
+    i = 0
+    while True:
+        # an expression starts at i
+        if i >= n:
+            raise _error(text, i, "an expression")
+        c = text[i]
+        if c == u"<" and text.startswith(u"<ASTART>", i):
+            re = anchor(text[i:i + 8])
+            i += 8
+        elif c == u"<" and text.startswith(u"<AEND>", i):
+            re = anchor(text[i:i + 6])
+            i += 6
+        elif c == u"@" and text.startswith(u"@epsilon", i):
+            re = uepsilon()
+            i += 8
+        elif c == u"@" and text.startswith(u"@any", i):
+            re = dotany()
+            i += 4
+        elif c == u"[":
+            re, i = _chars(text, i)
+        elif c == u"(":
+            groups.append([None, None])
+            i += 1
+            continue
+        elif c == u"\\" and i + 1 < n and text[i + 1] in _ESCAPED:
+            re = uatom(_ESCAPED[text[i + 1]])
+            i += 2
+        else:
+            sym, i = _charsSym(text, i) # symbol: ["\\"] /./
+            re = uatom(sym)
+
+        # reduce every expression which ends at i
+        while True:
+            while i < n and (text[i] == u"*" or text[i] == u"?"):
+                re = ustar(re) if text[i] == u"*" else uoption(re)
+                i += 1
+
+            if len(groups) == 0:
+                if i == n:
+                    return re
+                raise _error(text, i, "'*', '?' or the end")
+
+            group = groups[-1]
+            if group[0] is None:
+                if text.startswith(u" + ", i):
+                    group[0] = udisj
+                    i += 3
+                elif i < n and text[i] == u" ":
+                    group[0] = uconcat
+                    i += 1
+                else:
+                    raise _error(text, i, "'*', '?', ' ' or ' + '")
+                group[1] = re
+                break # the second operand starts at i
+            elif i < n and text[i] == u")":
+                re = group[0](group[1], re)
+                groups.pop()
+                i += 1
+            else:
+                raise _error(text, i, "'*', '?' or ')'")
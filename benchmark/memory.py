@@ -0,0 +1,144 @@
+"""The memory measurements of `benchmark.py` (see `Benchmarker#measure()`), saved in the table
+out_memory.
+
+Python 2 has no tracemalloc, so the peak memory of an operation is how much it raised the peak
+resident set size of the process (see `PeakMemory`). On Linux the peak (VmHWM of /proc/self/status)
+is reset before the operation by writing 5 to /proc/self/clear_refs, so nothing runs during the
+operation and its time is unchanged. Elsewhere a thread samples the resident set size every
+SAMPLE_INTERVAL seconds, which takes the GIL from the operation while it samples.
+
+Both count pages, so the peak memory of an operation is a lower bound of what it allocates: memory
+which earlier operations freed but the process kept (pymalloc arenas, free pages of the C heap) is
+reused without growing the resident set. Before the operation the unreachable objects are collected
+and the free memory of the C heap is returned to the system (see `_trim()`), which makes it depend
+less on what ran before, but the peaks are still not comparable across methods: only the retained
+size is.
+
+The retained size of a structure is the sum of `sys.getsizeof()` over every object reachable from it
+(see `deepSizeof()`).
+"""
+import collections
+import ctypes
+import ctypes.util
+import gc
+import sys
+import threading
+import types
+
+import psutil
+
+SAMPLE_INTERVAL = 0.001     # seconds between the samples of the resident set size, without clear_refs
+
+# objects which are not part of a structure, even if it refers to them
+_SHARED = (type, types.ClassType, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+    types.MethodType, types.CodeType, types.FrameType)
+
+def _mallocTrim():
+    """:returns function|None: malloc_trim of the C library (glibc), if it has one"""
+    try:
+        return ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6").malloc_trim
+    except (OSError, AttributeError):
+        return None
+
+_malloc_trim = _mallocTrim()
+
+def _trim():
+    """Collects the unreachable objects and returns the free memory of the C heap to the system, so
+    less of the memory an operation allocates is reused without growing the resident set
+    """
+    gc.collect()
+    if _malloc_trim is not None:
+        _malloc_trim(0)
+
+def _rss():
+    """:returns int: the bytes of the resident set of this process (not of the process which imported
+        this module, in a forked worker)
+    """
+    return psutil.Process().memory_info().rss
+
+def _resetPeak():
+    """Resets the peak resident set size of this process to its current size
+    :returns bool: if it could be reset (Linux 4.0 or later)
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except (IOError, OSError):
+        return False
+
+def _peakRSS():
+    """:returns int: the bytes of the peak resident set of this process since `_resetPeak()`"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    raise IOError("VmHWM is not in /proc/self/status")
+
+class _Sampler(threading.Thread):
+    """Keeps the largest resident set size of this process until `#stop()`"""
+    def __init__(self):
+        super(_Sampler, self).__init__()
+        self.daemon = True
+        self.peak = _rss()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(SAMPLE_INTERVAL):
+            self.peak = max(self.peak, _rss())
+
+    def stop(self):
+        """:returns int: the peak bytes"""
+        self._stopped.set()
+        self.join()
+        return max(self.peak, _rss())
+
+class PeakMemory(object):
+    """The bytes the peak memory of the process grew by within this context, a lower bound of the memory
+    allocated within it (see above):
+        with PeakMemory() as peak:
+            nfa = pmre.toInvariantNFA(method)
+        print(peak.bytes)
+    """
+    def __init__(self):
+        self.bytes = None
+
+    def __enter__(self):
+        self._sampler = None
+        _trim()
+        self._baseline = _rss()
+        if not _resetPeak():
+            self._sampler = _Sampler()
+            self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        peak = _peakRSS() if self._sampler is None else self._sampler.stop()
+        self.bytes = max(0, peak - self._baseline)
+        return False
+
+def deepSizeof(obj):
+    """:returns int: the bytes of obj and every object reachable from it through containers,
+        attributes and slots, each counted once (classes, modules and functions are not counted)
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while len(stack) > 0:
+        o = stack.pop()
+        if id(o) in seen or isinstance(o, _SHARED):
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, dict):
+            stack.extend(o.iterkeys())
+            stack.extend(o.itervalues())
+        elif isinstance(o, (list, tuple, set, frozenset, collections.deque)):
+            stack.extend(o)
+        if hasattr(o, "__dict__"):
+            stack.append(o.__dict__)
+        slots = getattr(type(o), "__slots__", ())
+        for slot in [slots] if isinstance(slots, basestring) else slots:
+            if hasattr(o, slot):
+                stack.append(getattr(o, slot))
+    return total
@@ -0,0 +1,56 @@
+"""This mini experiment measures the throughput of cross-section enumeration. The
+stateful `CrossSectionEnumerator` keeps the states of every prefix between words,
+whereas succeeding each word independently with `EnumInvariantNFA#nextWord` has to
+re-simulate the whole prefix for every word.
+
+Running:
+    From the root directory:
+    $ python -m benchmark.mini_experiments.enum_throughput
+
+Output:
+    One row per expression and cross-section length with the number of words enumerated
+    and the words per second of both approaches.
+"""
+
+from __future__ import print_function
+import itertools
+import time
+from ..convert import Converter
+
+EXPRESSIONS = [
+    u"(0 + 1)*",
+    u"([a-f] + [0-9])*",
+    u"((a + (a b)) + (b a))*",
+    u"(((0 [^0]) + 1)* @any)",
+    u"(((x y) + (y x))* [a-c]*)",
+]
+LENGTHS = [4, 8, 16, 32]
+MAX_WORDS = 2000    # words enumerated per cross-section
+
+def by_nextWord(enum, length):
+    words = 0
+    current = enum.minWord(length)
+    while current is not None and words < MAX_WORDS:
+        words += 1
+        current = enum.nextWord(current)
+    return words
+
+def by_enumerator(enum, length):
+    return sum(1 for _ in itertools.islice(enum.crossSection(length), MAX_WORDS))
+
+def throughput(ftn, enum, length):
+    t = time.time()
+    words = ftn(enum, length)
+    return words, words / max(time.time() - t, 1e-9)
+
+convert = Converter()
+print("Expression".ljust(30), "Length".ljust(8), "#Words".ljust(8), "nextWord/s".ljust(14), "enumerator/s".ljust(14), "speedup")
+print("-"*90)
+for expr in EXPRESSIONS:
+    enum = convert.math(expr).toInvariantNFA("nfaPDDAG").enumNFA()
+    for length in LENGTHS:
+        enum._sized(length) # build the length product outside of the measurements
+        _, slow = throughput(by_nextWord, enum, length)
+        words, fast = throughput(by_enumerator, enum, length)
+        print(expr.encode("utf-8").ljust(30), str(length).ljust(8), str(words).ljust(8),
+            ("%.0f" % slow).ljust(14), ("%.0f" % fast).ljust(14), "%.1fx" % (fast / slow))
@@ -0,0 +1,55 @@
+"""This mini experiment compares converting every programmer's expression of the database table
+`expressions` one at a time with `Converter#FAdoize()` (one round trip to `benchmark/parse.js` per
+expression) to converting them all with `Converter#FAdoize_many()` (pipelined over a pool of
+workers). Both must return the same formatted expression (or both fail) for every expression.
+
+Running:
+    From the root directory:
+    $ python -m benchmark.mini_experiments.fadoize_throughput [processes ...]
+
+Output:
+    The number of expressions, disagreements, and the throughput (expressions per second) of
+    `FAdoize` and of `FAdoize_many` with each number of processes (1, 2, 4 and the cpu count
+    if none are given)
+"""
+
+from __future__ import print_function
+import sys
+import time
+import multiprocessing
+from ..util import DBWrapper
+from ..convert import Converter
+from ..errors import URegexpError
+
+def describe(result):
+    """:returns unicode: result, or the type of error it is"""
+    return result if not isinstance(result, BaseException) else type(result).__name__
+
+expressions = [x[0] for x in DBWrapper().selectall("""
+    SELECT DISTINCT re_prog
+    FROM expressions
+    WHERE re_prog IS NOT NULL;
+""")]
+processes = [int(x) for x in sys.argv[1:]] or sorted(set([1, 2, 4, multiprocessing.cpu_count()]))
+
+convert = Converter()
+convert.initNodeProcs(max(processes)) # startup is not measured
+print("Expressions:", len(expressions))
+
+t = time.time()
+single = []
+for expr in expressions:
+    try:
+        single.append(convert.FAdoize(expr))
+    except (URegexpError, Exception) as e:
+        single.append(e)
+t_single = time.time() - t
+print("FAdoize:                 {:9.1f} expressions/s".format(len(expressions) / t_single))
+
+for n in processes:
+    t = time.time()
+    many = convert.FAdoize_many(expressions, processes=n)
+    t_many = time.time() - t
+    disagreements = sum(1 for a, b in zip(single, many) if describe(a) != describe(b))
+    print("FAdoize_many({:3d} procs): {:9.1f} expressions/s ({:.1f}x), {} disagreements" \
+        .format(n, len(expressions) / t_many, t_single / t_many, disagreements))
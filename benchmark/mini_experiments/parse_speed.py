@@ -0,0 +1,57 @@
+"""This mini experiment compares the hand-written `math_parser.py` to the Lark parser of
+`benchmark/re.lark` on every expression of the database table `expressions`. Both parsers must
+return the same tree (or both fail) for every expression.
+
+Running:
+    From the root directory:
+    $ python -m benchmark.mini_experiments.parse_speed
+
+Output:
+    The number of expressions, disagreements, and the total parse time of both parsers
+    (the best of REPEAT runs, without partial matching and without the parse cache).
+"""
+
+from __future__ import print_function
+import sys
+import time
+from lark import LarkError
+from ..util import DBWrapper
+from ..convert import Converter
+
+REPEAT = 3
+
+def parseAll(convert, expressions):
+    """:returns Tuple(float, list): the time it took to parse every expression, and each result"""
+    results = []
+    t = time.time()
+    for expr in expressions:
+        try:
+            results.append(convert.math(expr, cached=False))
+        except LarkError:
+            results.append(LarkError)
+    return time.time() - t, results
+
+sys.setrecursionlimit(12000)
+expressions = [x[0].decode("utf-8") for x in DBWrapper().selectall("""
+    SELECT DISTINCT re_math
+    FROM expressions
+    WHERE re_math NOT LIKE '%Error%';
+""")]
+
+fast, lark = Converter(), Converter(useLark=True)
+t_fast = t_lark = float("inf")
+for _ in xrange(REPEAT):
+    t, fastResults = parseAll(fast, expressions)
+    t_fast = min(t_fast, t)
+    t, larkResults = parseAll(lark, expressions)
+    t_lark = min(t_lark, t)
+
+disagreements = 0
+for expr, a, b in zip(expressions, fastResults, larkResults):
+    if repr(a) != repr(b):
+        disagreements += 1
+        print("Disagreement on", expr.encode("utf-8")[:100])
+
+print("Expressions:", len(expressions), "Disagreements:", disagreements)
+print("Lark parser:    {:.3f}s".format(t_lark))
+print("math_parser.py: {:.3f}s ({:.1f}x)".format(t_fast, t_lark / max(t_fast, 1e-9)))
@@ -0,0 +1,69 @@
+"""This mini experiment verifies `prog_parser.py` against `benchmark/parse.js` on every programmer's
+expression of the database table `expressions` (the column re_prog): formatting an expression with
+`parse.js` and parsing it with `Converter#math()` must build the same tree (or both fail) as
+`Converter(useProgParser=True)#prog()` does without Node.js. `prog_parser.py` stays opt-in until
+this check passes.
+
+Running:
+    From the root directory:
+    $ python -m benchmark.mini_experiments.prog_parser_check
+
+Output:
+    Each disagreement, the number of expressions and disagreements, and the total time of both ways
+    (`parse.js` is given a pool of workers, see `Converter#FAdoize_many()`)
+"""
+
+from __future__ import print_function
+import sys
+import time
+from ..util import DBWrapper
+from ..convert import Converter
+from ..errors import URegexpError
+
+def describe(result):
+    """:returns str: the tree, or the type of error it is"""
+    return "error: " + type(result).__name__ if isinstance(result, BaseException) else repr(result)
+
+sys.setrecursionlimit(12000)
+expressions = [x[0] for x in DBWrapper().selectall("""
+    SELECT DISTINCT re_prog
+    FROM expressions
+    WHERE re_prog IS NOT NULL;
+""")]
+
+convert, node = Converter(useProgParser=True), Converter()
+node.initNodeProcs() # startup is not measured
+
+t = time.time()
+fromNode = []
+for formatted in node.FAdoize_many(expressions):
+    if isinstance(formatted, BaseException):
+        fromNode.append(formatted)
+        continue
+    try:
+        fromNode.append(node.math(formatted, cached=False))
+    except (URegexpError, Exception) as e:
+        fromNode.append(e)
+t_node = time.time() - t
+
+t = time.time()
+fromPython = []
+for expr in expressions:
+    try:
+        fromPython.append(convert.prog(expr, partialMatch=False))
+    except (URegexpError, Exception) as e:
+        fromPython.append(e)
+t_python = time.time() - t
+
+disagreements = 0
+for expr, a, b in zip(expressions, fromNode, fromPython):
+    a, b = describe(a), describe(b)
+    if a != b and not (a.startswith("error: ") and b.startswith("error: ")): # both fail
+        disagreements += 1
+        print("Disagreement on", repr(expr)[:100])
+        print("    parse.js:      ", a[:200])
+        print("    prog_parser.py:", b[:200])
+
+print("Expressions:", len(expressions), "Disagreements:", disagreements)
+print("parse.js + math: {:.3f}s".format(t_node))
+print("prog_parser.py:  {:.3f}s ({:.1f}x)".format(t_python, t_node / max(t_python, 1e-9)))
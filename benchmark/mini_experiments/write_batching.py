@@ -0,0 +1,144 @@
+"""This mini experiment compares the two ways benchmark results have been written to the database, on
+a temporary copy of the in_tests/out_tests schema with synthetic times (no expression is benchmarked):
+    per statement:  every worker process opens the database and commits each statement, as
+                    `Benchmarker#benchmark()` did in every forked process
+    single writer:  workers send their results to the `scheduler.py` process, which saves finished
+                    expressions in batches of one transaction each (`Benchmarker#save()`, WAL mode)
+
+Running:
+    From the root directory:
+    $ python -m benchmark.mini_experiments.write_batching [expressions [workers ...]]
+
+Output:
+    For 1, 4 and 16 workers (or the ones given) and 1000 expressions (or the number given): the
+    commits, the wall time, and the statements which failed because the database was locked
+"""
+
+from __future__ import print_function
+import sys
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import random
+import multiprocessing
+from ..util import DBWrapper
+from ..benchmark import Benchmarker, UNSOLVED_TIME
+from ..scheduler import Scheduler
+
+METHODS = ["pdo", "backtrack", "nfaPDRPN", "nfaPDO", "nfaPDDAG", "nfaPosition", "nfaFollow",
+    "nfaThompson", "nfaGlushkov", "re", "regex"]
+
+def createTables(name, expressions):
+    db = DBWrapper(name)
+    db.executescript("""
+        CREATE TABLE in_tests (re_math TEXT, n_evalA INTEGER, n_evalR INTEGER, length INTEGER,
+            itersleft INTEGER, error TEXT, words_hash TEXT);
+        CREATE INDEX in_tests_re_math ON in_tests (re_math);
+        CREATE TABLE out_tests (re_math TEXT, method TEXT, t_pre REAL, t_evalA REAL, t_evalR REAL,
+            timed_out TEXT DEFAULT '', PRIMARY KEY (re_math, method));
+        CREATE TABLE words (re_math TEXT, version INTEGER, hash TEXT, n_evalA INTEGER, n_evalR INTEGER,
+            accepted BLOB, rejected BLOB, PRIMARY KEY (re_math, version));
+        CREATE TABLE out_word_latency (re_math TEXT, method TEXT, accepting INTEGER, n INTEGER, p50 REAL,
+            p95 REAL, p99 REAL, max REAL, histogram BLOB, PRIMARY KEY (re_math, method, accepting));
+        CREATE TABLE out_memory (re_math TEXT, method TEXT, m_pre INTEGER, m_eval INTEGER,
+            m_retained INTEGER, nstates INTEGER, ntrans INTEGER, PRIMARY KEY (re_math, method));
+        CREATE TABLE out_phases (re_math TEXT, method TEXT, phase TEXT, seconds REAL, count INTEGER,
+            PRIMARY KEY (re_math, method, phase));
+        CREATE TABLE out_counters (re_math TEXT, method TEXT, counter TEXT, value INTEGER,
+            PRIMARY KEY (re_math, method, counter));
+    """)
+    db.executemany("INSERT INTO in_tests VALUES (?, -1, -1, ?, 1, '', '');",
+        [(re_math, len(re_math)) for re_math in expressions])
+
+def times():
+    return (random.random(), random.random(), random.random(), "", None,
+        [("parse", random.random(), 1), ("toInvariantNFA", random.random(), 1)], None)
+
+def perStatement(args):
+    """The statements `Benchmarker#benchmark()` committed one by one for each expression
+    :returns Tuple(int, int): the commits, and the statements which failed since the database was locked
+    """
+    name, expressions = args
+    db = None
+    locked = 0
+    while db is None: # the tables are set up by every connection
+        try:
+            db = DBWrapper(name)
+        except sqlite3.OperationalError:
+            locked += 1
+    for re_math in expressions:
+        try:
+            db.selectall("SELECT n_evalA, n_evalR FROM in_tests WHERE re_math==?;", [re_math])
+            db.execute("DELETE FROM out_tests WHERE re_math==?;", [re_math])
+            db.execute("UPDATE in_tests SET itersleft=1 WHERE re_math==?;", [re_math])
+            for method in METHODS:
+                db.execute("INSERT OR IGNORE INTO out_tests VALUES (?, ?, ?, ?, ?, '');",
+                    [re_math, method, UNSOLVED_TIME, UNSOLVED_TIME, UNSOLVED_TIME])
+            for method in METHODS:
+                for column, t in zip(["t_pre", "t_evalA", "t_evalR"], times()):
+                    db.execute("UPDATE out_tests SET {0}=? WHERE re_math=? AND method=? AND {0}>?;".format(column),
+                        [t, re_math, method, t])
+            db.execute("UPDATE in_tests SET itersleft=itersleft-1, n_evalA=10, n_evalR=10 WHERE re_math=?;",
+                [re_math])
+        except sqlite3.OperationalError: # database is locked
+            locked += 1
+    return db.commits, locked
+
+class Synthetic(object):
+    """A worker's Benchmarker which only makes up times"""
+    latency = False
+
+    def words(self, re_math):
+        return [u"a"] * 10, [u"b"] * 10
+
+    def wordsHash(self, re_math):
+        return "synthetic"
+
+    def unsavedWords(self, re_math):
+        return None
+
+    def forgetWords(self):
+        pass
+
+    def latencyRows(self, re_math, method, histograms):
+        return []
+
+    def measure(self, re_math, method, latencies=None):
+        return times()
+
+expressions = [u"(a{0} + b)*".format(i) for i in xrange(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)]
+workers = [int(x) for x in sys.argv[2:]] or [1, 4, 16]
+directory = tempfile.mkdtemp()
+benchmarker = Benchmarker()
+
+print("Expressions:", len(expressions), "Methods:", len(METHODS))
+print("Workers  Way            Commits    Wall time  Locked")
+try:
+    for nworkers in workers:
+        name = os.path.join(directory, "per_statement_{0}.db".format(nworkers))
+        createTables(name, expressions)
+        pool = multiprocessing.Pool(nworkers)
+        t = time.time()
+        results = pool.map(perStatement, [(name, expressions[i::nworkers]) for i in xrange(nworkers)])
+        t = time.time() - t
+        pool.close()
+        print(str(nworkers).ljust(8), "per statement".ljust(14), str(sum(x[0] for x in results)).ljust(10),
+            "{:.2f}s".format(t).ljust(10), sum(x[1] for x in results))
+
+        name = os.path.join(directory, "single_writer_{0}.db".format(nworkers))
+        createTables(name, expressions)
+        benchmarker.db = DBWrapper(name)
+        benchmarker.db.useWAL()
+        scheduler = Scheduler(Synthetic, nworkers, minFree=0)
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w") # without the progress of every expression
+        t = time.time()
+        scheduler.run(benchmarker, dict((re_math, METHODS) for re_math in expressions))
+        t = time.time() - t
+        sys.stdout = stdout
+        scheduler.close()
+        print(str(nworkers).ljust(8), "single writer".ljust(14), str(benchmarker.db.commits).ljust(10),
+            "{:.2f}s".format(t).ljust(10), 0)
+finally:
+    shutil.rmtree(directory)
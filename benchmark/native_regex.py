@@ -0,0 +1,88 @@
+"""Translates uregexp trees into patterns of Python's backtracking engines, the `re` and `regex`
+modules, so they can be benchmarked as the methods "re" and "regex" (see `benchmark.py`).
+
+A word is in the partial matching language of a tree (see `uregexp#partialMatch()`) if and only if
+the pattern of the tree (without partial matching) is found in it by `search`: <ASTART> and <AEND>
+become \\A and \\Z, and @any matches any symbol (with DOTALL).
+"""
+import re as pyre
+
+import regex
+
+import errors
+from util import timeLimited
+from reex_ext import uconcat, udisj, ustar, uoption, uepsilon, uemptyset, uatom, chars, dotany, anchor
+
+METHODS = {"re": pyre, "regex": regex}
+
+# the precedence of a pattern: only patterns of higher precedence can be operands without a group
+_DISJ, _CONCAT, _REPEAT, _ATOM = range(4)
+_ANCHORS = {"<ASTART>": u"\\A", "<AEND>": u"\\Z"}
+
+def _escape(symbol):
+    """:returns unicode: the pattern matching symbol, inside or outside of a character class"""
+    return symbol if symbol.isalnum() or symbol == u"_" else u"\\" + symbol
+
+def _group(translation, precedence):
+    """:returns unicode: the pattern of translation with at least the given precedence"""
+    pattern, p = translation
+    return pattern if p >= precedence else u"(?:" + pattern + u")"
+
+def _translate(re):
+    """:returns Tuple(unicode, int): the pattern of re and its precedence"""
+    t = type(re)
+    if t is uconcat:
+        return _group(_translate(re.arg1), _CONCAT) + _group(_translate(re.arg2), _CONCAT), _CONCAT
+    elif t is udisj:
+        return _translate(re.arg1)[0] + u"|" + _translate(re.arg2)[0], _DISJ
+    elif t is ustar:
+        return _group(_translate(re.arg), _ATOM) + u"*", _REPEAT
+    elif t is uoption:
+        return _group(_translate(re.arg), _ATOM) + u"?", _REPEAT
+    elif t is anchor: # anchors and the empty pattern can not be repeated without a group
+        return _ANCHORS[re.label], _CONCAT
+    elif t is uepsilon:
+        return u"", _CONCAT
+    elif t is uemptyset:
+        return u"(?!)", _ATOM
+    elif t is dotany:
+        return u".", _ATOM
+    elif t is chars:
+        ranges = u"".join(_escape(a) if a == b else _escape(a) + u"-" + _escape(b) for a, b in re.ranges)
+        return u"[" + (u"^" if re.neg else u"") + ranges + u"]", _ATOM
+    elif t is uatom:
+        return _escape(re.val), _ATOM
+    raise TypeError("cannot translate " + repr(re))
+
+def pattern(re):
+    """:param uregexp re: the regexp tree, without partial matching
+    :returns unicode: the equivalent pattern for the `re` and `regex` modules (with DOTALL)
+    """
+    return _translate(re)[0]
+
+def compile(re, method):
+    """Compiles the pattern of re without using the cache of compiled patterns of the module
+    :param str method: "re" or "regex"
+    :returns: the compiled pattern
+    :raises NativeRegexError: if the module cannot compile the pattern (e.g., if it is too large)
+    """
+    module = METHODS[method]
+    translation = pattern(re)
+    module.purge()
+    try:
+        return module.compile(translation, module.DOTALL | module.UNICODE)
+    except (pyre.error, regex.error, OverflowError, AssertionError, RuntimeError) as e:
+        raise errors.NativeRegexError(method, translation, str(e))
+
+def evalWordMethod(re, method, timeout=None, compiled=None):
+    """:param uregexp re: the regexp tree, without partial matching
+    :param str method: "re" or "regex"
+    :param float|None timeout: the maximum number of seconds the evaluation of one word can take, if any
+    :param compiled: the pattern of re compiled by `compile()`, which is compiled if not given
+    :returns function: which decides if a word is in the partial matching language of re, and raises
+        EvalTimeoutError if it takes longer than timeout (see `util.timeLimited()`)
+    """
+    search = (compiled or compile(re, method)).search
+    def evalWordP(word):
+        return search(word) is not None
+    return evalWordP if timeout is None else timeLimited(evalWordP, timeout)
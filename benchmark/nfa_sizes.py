@@ -19,6 +19,10 @@ import dill
 
 import util
 import convert
+import fa_binary
+from artifact_cache import ArtifactCache
+
+NFA_TIMEOUT = 120   # seconds one construction can take before its process is stopped (see `NFASizes#generate_db()`)
 
 class NFASizes():
     """Use as a command-line utility using `make sizes` unless extracting from the
@@ -62,10 +66,12 @@ class NFASizes():
                 t = time.time()
                 nfa = re.toInvariantNFA(method)
                 t = time.time() - t
+                nfa.compact()
                 cursor.execute("""
                     INSERT INTO nfas(re_math, method, nfa, nstates, ntrans, time, length)
                     VALUES(?, ?, ?, ?, ?, ?, ?);
-                """, [re_math_encoded, method, dill.dumps(nfa), len(nfa.States), nfa.countTransitions(), t, re.treeLength()])
+                """, [re_math_encoded, method, buffer(fa_binary.dumps(nfa)), len(nfa.States), nfa.countTransitions(), t, re.treeLength()])
+                self._insert_reduction(cursor, re_math_encoded, method, nfa)
 
             pm = re.partialMatch()
             pmstr = str(pm).decode("utf-8")
@@ -75,12 +81,29 @@ class NFASizes():
                 t = time.time()
                 nfa = pm.toInvariantNFA(method)
                 t = time.time() - t
+                nfa.compact()
                 cursor.execute("""
                     INSERT INTO nfas(re_math, method, nfa, nstates, ntrans, time, length)
                     VALUES(?, ?, ?, ?, ?, ?, ?);
-                """, [pmstr, method, dill.dumps(nfa), len(nfa.States), nfa.countTransitions(), t, pm.treeLength()])
+                """, [pmstr, method, buffer(fa_binary.dumps(nfa)), len(nfa.States), nfa.countTransitions(), t, pm.treeLength()])
+                self._insert_reduction(cursor, pmstr, method, nfa)
         self._db_exec(f)
 
+    def _insert_reduction(self, cursor, re_math, method, nfa):
+        """Passes a copy of nfa through the reduction pipeline (`InvariantNFA#reduce`) and saves the
+        size of the NFA after each stage
+        """
+        t = time.time()
+        report = nfa.dup().reduce()
+        t = time.time() - t
+        cursor.executemany("""
+            INSERT OR REPLACE INTO nfa_reductions(re_math, method, stage, step, nstates, ntrans)
+            VALUES(?, ?, ?, ?, ?, ?);
+        """, [[re_math, method, stage, step, nstates, ntrans]
+            for step, (stage, nstates, ntrans) in enumerate(report)])
+        cursor.execute("UPDATE nfa_reductions SET time=? WHERE re_math==? AND method==?;",
+            [t, re_math, method])
+
     def generate_db(self):
         """This saves all relevant NFA's sourced from practical regexps passed through
         all supported constructions. The resulting database should be approximately 600 mb.
@@ -101,23 +124,33 @@ class NFASizes():
                 length  INTEGER,
                 PRIMARY KEY (re_math, method)
             );
+
+            CREATE TABLE IF NOT EXISTS nfa_reductions (
+                re_math TEXT,
+                method  TEXT,
+                stage   TEXT,
+                step    INTEGER,
+                nstates INTEGER,
+                ntrans  INTEGER,
+                time    REAL,
+                PRIMARY KEY (re_math, method, stage)
+            );
         """))
 
         n = 0
         total = len(expressions) * len(methods)
         converter = convert.Converter()
+        cache = ArtifactCache()
         for re_math_encoded, re_math_parsable in expressions:
             print("\r{}\r{}/{}: {}".format(" "*120, n, total, re_math_encoded[:100]), end="")
-            re = converter.math(re_math_parsable)
+            re = cache.tree(converter, re_math_parsable)
             for method in methods:
+                proc = None
                 try:
                     proc = multiprocessing.Process(target=lambda: self._generate_one(re, re_math_encoded, method))
                     proc.start()
-                    t = time.time()
-                    while proc.is_alive():
-                        if time.time() - t > 120:
-                            proc.terminate()
-                            raise Exception(re_math_encoded + " took too long to calculate " + method)
+                    if not util.stopAfter(proc, NFA_TIMEOUT):
+                        print("\n{0} timed out after {1}s on {2}".format(method, NFA_TIMEOUT, re_math_encoded[:100]))
 
                 except KeyboardInterrupt:
                     if proc is not None and proc.is_alive():
@@ -138,6 +171,10 @@ class NFASizes():
         """Retrieve a NFA from the database given a regular expression and construction method.
         If no such NFA exists for that method, this returns None.
 
+        Note: the NFA is compact (see `InvariantNFA#compact()`), so its state names are its indexes.
+            NFAs are saved in the binary format of `fa_binary.py`, but databases created before it
+            (e.g., the "release" download) contain dill pickles which are still loaded
+
         Completion notes: (see `#print_completeness()`)
         - to get partial derivative NFA, use nfaPDDAG as your method (not nfaPDO or nfaRPN)
         - the Thompson construction is likely to be incomplete as well (since this construction has a
@@ -150,8 +187,25 @@ class NFASizes():
         result = self._db_exec(f)
         if result is None:
             return None
+        elif fa_binary.binaryP(result[0]):
+            return fa_binary.loads(result[0])
         else:
-            return dill.loads(result[0])
+            return dill.loads(str(result[0]))
+
+    def view(self, expression, method):
+        """Like `#extract()`, but only reads the size and structure of the NFA from the database
+        (see `fa_binary.NFAView`) without decoding its transition labels
+        :returns NFAView|None:
+        """
+        def f(cursor):
+            cursor.execute("SELECT nfa FROM nfas WHERE re_math==? AND method==?;", [expression, method])
+            return cursor.fetchone()
+
+        result = self._db_exec(f)
+        if result is None or not fa_binary.binaryP(result[0]):
+            return None
+        else:
+            return fa_binary.NFAView(result[0])
 
     def print_completeness(self):
         """Prints to stdout the number of NFAs for each construction type and the time it took to make them.
@@ -171,6 +225,25 @@ class NFASizes():
         print("-----------------------------")
         self._db_exec(f)
 
+    def print_reductions(self):
+        """Prints to stdout the average NFA size after each stage of the reduction pipeline
+        (`InvariantNFA#reduce`) for each construction type.
+        """
+        def f(cursor):
+            cursor.execute("""
+                SELECT method, step, stage, count(*), avg(nstates), avg(ntrans), sum(time)
+                FROM nfa_reductions
+                GROUP BY method, step, stage
+                ORDER BY method, step;
+            """)
+            for method, _, stage, count, nstates, ntrans, sum_time in cursor.fetchall():
+                print(method[len("nfa"):].ljust(12), stage.ljust(20), str(count).ljust(6),
+                    "{:.1f}".format(nstates).ljust(10), "{:.1f}".format(ntrans).ljust(10),
+                    sum_time if stage == "construction" else "")
+        print("construction stage                count  avg(nstates) avg(ntrans) sum(reduce time)")
+        print("----------------------------------------------------------------------------------")
+        self._db_exec(f)
+
     def build_common_regexps(self):
         """Creates the common_re table if it does not exist. This table contains a set
         of regular expressions that could be converted into NFA's using every algorithm
@@ -251,6 +324,7 @@ if __name__ == "__main__":
         print("\n")
         print("C. Construct NFA's for yourself (rather than quick download)")
         print("P. Print completeness of each algorithm")
+        print("R. Print reduction pipeline sizes of each algorithm")
         print("D. Display graph")
         print("Q. Quit")
         choice = raw_input("Choose menu option: ").upper().lstrip()
@@ -262,6 +336,9 @@ if __name__ == "__main__":
         elif choice == "P":
             sizes.print_completeness()
             raw_input("\nPress Enter to continue... ")
+        elif choice == "R":
+            sizes.print_reductions()
+            raw_input("\nPress Enter to continue... ")
         elif choice == "D":
             print("\nDrawing NFA size graph by construction algorithm...")
             res = util.parseIntSafe(raw_input("How detailed should the graph be (higher=less detailed): "), 10)
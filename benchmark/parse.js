@@ -1,25 +1,29 @@
 /*
 The regexp-tree library is very widely used (over 900,000 public GitHub projects use it).
 
-This process is created from the main Python process, and listens to stdin expressions to
-parse. The expressions are parsed and formatted, then printed into stdout as a standard
-output object.
+This process is created from the main Python process, and listens to stdin for requests: one JSON
+object per line, {"id": ..., "expression": ..., "logs": true|false}. Each expression is parsed and
+formatted, then its response is printed into stdout as one JSON line with the same id. Requests can
+be pipelined: they are answered in order, without waiting for the previous response to be read.
 
-See details in benchmark/convert.py#FAdoize
+See details in benchmark/convert.py#FAdoize_many
 */
 const regexp = require("regexp-tree")
+const readline = require("readline")
 
 const REP_LIMIT = 1000 // maximum # of repetitions allowed before using kleene star instead
 
 /*
-LISTEN AND RESPOND TO DATA INPUTS
+LISTEN AND RESPOND TO REQUESTS
 */
-process.stdin.on("data", (data) => {
-    data = data.toString()
+readline.createInterface({ input: process.stdin, terminal: false }).on("line", (line) => {
+    const request = JSON.parse(line)
+    let data = request.expression
     if (data.endsWith("\r\n")) data = data.substring(0, data.length - 2)
     else if (data.endsWith("\n")) data = data.substring(0, data.length - 1)
 
     const output = {
+        id: request.id,
         logs: ["--[start]--"],
         error: 0,
         formatted: 0
@@ -42,7 +46,9 @@ process.stdin.on("data", (data) => {
         output.error = e.stack
     }
     finally {
-        console.log(JSON.stringify(output))
+        if (!request.logs && output.error === 0)
+            output.logs = [] // only needed to explain errors
+        process.stdout.write(JSON.stringify(output) + "\n")
     }
 });
 
@@ -28,6 +28,7 @@ Compressed Regular Expressions  Manipulation
    Free Software Foundation, Inc., 675 Mass Ave, Cambridge, MA 02139, USA."""
 
 import reex_ext
+import spans
 from fa_ext import InvariantNFA
 
 
@@ -264,6 +265,10 @@ class dag(object):
 
 
 def pddag(self):
-    return dag(self).NFA()
+    with spans.span("dag"):
+        d = dag(self)
+        spans.count("nodes", d.count)
+    with spans.span("NFA"):
+        return d.NFA()
 
 setattr(reex_ext.uregexp,'nfaPDDAG', pddag)
\ No newline at end of file
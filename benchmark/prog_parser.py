@@ -0,0 +1,307 @@
+"""An in-process replacement for `benchmark/parse.js`: parses the expressions of programmers (the
+subset of JavaScript's syntax, with the "u" flag, which `parse.js` supports) and builds the `reex_ext`
+tree which `Converter#math()` would build from the output of `parse.js`, without formatting it.
+
+The supported syntax is: alternatives "|", groups "(...)", "(?:...)" and "(?<name>...)", the anchors
+"^" and "$", "." and the classes "\\d", "\\w", "\\s" (and their negations), character classes "[...]"
+and "[^...]", the repetitions "*", "+", "?", "{x}", "{x,}" and "{x,y}" (greedy or lazy), and escapes.
+Anything else (e.g., lookarounds, "\\b" or backreferences) raises `errors.FAdoizeError`, as `parse.js`
+does.
+
+..note: the quirks of formatting into `benchmark/re.lark` are kept so both give the same tree, e.g.,
+        "\\f" and "\\v" are the letters "f" and "v", and so are "\\t", "\\n", "\\r" and "\\b" in a class
+"""
+import errors
+from reex_ext import uatom, chars, dotany, uepsilon, anchor, ustar, uoption, uconcat, udisj
+
+REP_LIMIT = 1000 # maximum # of repetitions allowed before using kleene star instead (as in parse.js)
+
+_SYNTAX = set(u"^$\\.*+?()[]{}|/") # the characters which can be escaped anywhere
+_QUANTIFIERS = set(u"*+?{")
+_CLASSES = { # the ranges of \d, \w and \s
+    u"d": [(u"0", u"9")],
+    u"w": [(u"0", u"9"), (u"A", u"Z"), (u"a", u"z"), u"_"],
+    u"s": [u" "],
+}
+_META = {u"t": u"\t", u"n": u"\n", u"r": u"\r", u"f": u"\f", u"v": u"\v", u"b": u"\b"}
+_FORMATTED = {u"t": u"\t", u"n": u"\n", u"r": u"\r"} # the only escapes `benchmark/re.lark` reads as such
+_CLASS_LITERALS = {u"\t": u"t", u"\n": u"n", u"\r": u"r"} # read as "\\t", ... in a formatted class
+
+def parse(text):
+    """Converts a programmer's expression into a FAdo regexp tree
+    :param unicode text: the expression, as sent to `benchmark/parse.js` (see `Converter#FAdoize_many()`)
+    :returns uregexp: the regexp tree
+    :raises errors.FAdoizeError: if `benchmark/parse.js` would throw, or if the formatted expression
+        would be empty (e.g., "a{0}")
+    """
+    if text.endswith(u"\r\n"):
+        text = text[:-2]
+    elif text.endswith(u"\n"):
+        text = text[:-1]
+    return _build(text, _Parser(text).parse())
+
+class _Parser(object):
+    """A recursive descent parser of the syntax, which makes the nodes that `_build` turns into trees:
+    ("atom", unicode), ("chars", list, bool), ("any",), ("anchor", str), ("concat", list<node>),
+    ("disj", node, node), ("star", node), ("plus", node), ("option", node) and ("rep", node, int, int|None)
+    """
+    def __init__(self, text):
+        self.text = text
+        self.i = 0
+
+    def error(self, msg):
+        return errors.FAdoizeError(self.text.encode("utf-8"), "column {0}: {1}".format(self.i, msg))
+
+    def peek(self, offset=0):
+        """:returns unicode: the character at offset from the current index, or u"" past the end"""
+        return self.text[self.i + offset:self.i + offset + 1]
+
+    def parse(self):
+        node = self.disjunction()
+        if self.i < len(self.text):
+            raise self.error("unmatched ')'")
+        return node
+
+    def disjunction(self):
+        node = self.alternative()
+        while self.peek() == u"|":
+            self.i += 1
+            node = ("disj", node, self.alternative())
+        return node
+
+    def alternative(self):
+        terms = []
+        while self.i < len(self.text) and self.peek() not in (u"|", u")"):
+            terms.append(self.term())
+        if len(terms) == 0:
+            raise self.error("empty alternative")
+        return terms[0] if len(terms) == 1 else ("concat", terms)
+
+    def term(self):
+        c = self.peek()
+        if c == u"^" or c == u"$":
+            self.i += 1
+            if self.peek() in _QUANTIFIERS:
+                raise self.error("nothing to repeat")
+            return ("anchor", "<ASTART>" if c == u"^" else "<AEND>")
+        elif c == u"(":
+            node = self.group()
+        elif c == u"[":
+            node = self.characterClass()
+        elif c == u".":
+            self.i += 1
+            node = ("any",)
+        elif c == u"\\":
+            node = self.escape()
+        elif c in _QUANTIFIERS or c == u"}" or c == u"]":
+            raise self.error("nothing to repeat" if c in _QUANTIFIERS else "lone " + repr(c))
+        else:
+            self.i += 1
+            node = ("atom", c)
+
+        if self.peek() in _QUANTIFIERS:
+            node = self.quantifier(node)
+            if self.peek() == u"?": # lazy
+                self.i += 1
+            if self.peek() in _QUANTIFIERS:
+                raise self.error("nothing to repeat")
+        return node
+
+    def group(self):
+        if self.text.startswith(u"(?:", self.i):
+            self.i += 3
+        elif self.text.startswith(u"(?<", self.i) and self.peek(3) not in (u"=", u"!"):
+            end = self.text.find(u">", self.i)
+            if end < 0 or end == self.i + 3:
+                raise self.error("invalid group name")
+            self.i = end + 1
+        elif self.peek(1) == u"?":
+            raise self.error("cannot handle group " + repr(self.text[self.i:self.i + 4]))
+        else:
+            self.i += 1
+        node = self.disjunction()
+        if self.peek() != u")":
+            raise self.error("unterminated group")
+        self.i += 1
+        return node
+
+    def quantifier(self, node):
+        c = self.peek()
+        self.i += 1
+        if c == u"*":
+            return ("star", node)
+        elif c == u"+":
+            return ("plus", node)
+        elif c == u"?":
+            return ("option", node)
+
+        end = self.text.find(u"}", self.i)
+        bounds = self.text[self.i:end].split(u",") if end >= 0 else []
+        number = lambda s: s != u"" and all(d in u"0123456789" for d in s)
+        if not (1 <= len(bounds) <= 2 and number(bounds[0]) and (len(bounds) == 1 or bounds[1] == u"" or number(bounds[1]))):
+            raise self.error("incomplete quantifier")
+        self.i = end + 1
+        lo = int(bounds[0])
+        hi = lo if len(bounds) == 1 else (int(bounds[1]) if bounds[1] else None)
+        if hi is not None and lo > hi:
+            raise self.error("numbers out of order in {} quantifier")
+        return ("rep", node, lo, hi)
+
+    def unicodeEscape(self):
+        """:returns unicode: the character of the "\\uXXXX", "\\uXXXX\\uXXXX" (surrogates) or "\\u{X...}"
+        escape at the current index
+        """
+        text, i = self.text, self.i
+        if text.startswith(u"\\u{", i):
+            end = text.find(u"}", i)
+            digits = text[i + 3:end] if end >= 0 else u""
+            if digits == u"" or not all(d in u"0123456789abcdefABCDEF" for d in digits) or int(digits, 16) > 0x10FFFF:
+                raise self.error("invalid unicode escape")
+            self.i = end + 1
+            return unichr(int(digits, 16))
+
+        hexs = lambda s: len(s) == 4 and all(d in u"0123456789abcdefABCDEF" for d in s)
+        if not hexs(text[i + 2:i + 6]):
+            raise self.error("invalid unicode escape")
+        code = int(text[i + 2:i + 6], 16)
+        self.i = i + 6
+        if 0xD800 <= code <= 0xDBFF and text.startswith(u"\\u", self.i) and hexs(text[self.i + 2:self.i + 6]):
+            low = int(text[self.i + 2:self.i + 6], 16)
+            if 0xDC00 <= low <= 0xDFFF:
+                self.i += 6
+                code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+        return unichr(code)
+
+    def escape(self):
+        e = self.peek(1)
+        if e == u"":
+            raise self.error("\\ at end of pattern")
+        elif e == u"u":
+            return ("atom", self.unicodeEscape())
+        self.i += 2
+        if e in _CLASSES:
+            return ("atom", u" ") if e == u"s" else ("chars", _CLASSES[e], False)
+        elif e.lower() in _CLASSES:
+            return ("chars", _CLASSES[e.lower()], True)
+        elif e == u"b" or e == u"B":
+            raise self.error("cannot handle assertion \\" + e)
+        elif e in _META:
+            return ("atom", _FORMATTED.get(e, e))
+        elif e == u"0" and not self.peek().isdigit():
+            return ("atom", u"\0")
+        elif e.isdigit():
+            raise self.error("cannot handle backreference")
+        elif e in _SYNTAX:
+            return ("atom", e)
+        raise self.error("invalid unicode escape \\" + e)
+
+    def classAtom(self):
+        """:returns list|Tuple(int, unicode): the ranges of a class escape (i.e., \\d, \\w or \\s), or
+        the code point of a character and the symbol it is formatted into
+        """
+        c = self.peek()
+        if c != u"\\":
+            self.i += 1
+            return ord(c), _CLASS_LITERALS.get(c, c)
+
+        e = self.peek(1)
+        if e == u"":
+            raise self.error("\\ at end of pattern")
+        elif e == u"u":
+            c = self.unicodeEscape()
+            return ord(c), _CLASS_LITERALS.get(c, c)
+        self.i += 2
+        if e in _CLASSES:
+            return _CLASSES[e]
+        elif e.lower() in _CLASSES:
+            raise self.error("unsupported negated character class in [...]")
+        elif e in _META:
+            return ord(_META[e]), e
+        elif e == u"0" and not self.peek().isdigit():
+            return 0, u"\0"
+        elif e.isdigit():
+            raise self.error("cannot handle backreference")
+        elif e in _SYNTAX or e == u"-":
+            return ord(e), e
+        raise self.error("invalid unicode escape \\" + e)
+
+    def characterClass(self):
+        self.i += 1
+        neg = self.peek() == u"^"
+        if neg:
+            self.i += 1
+        items = []
+        while self.peek() != u"]":
+            if self.peek() == u"":
+                raise self.error("unterminated character class")
+            lo = self.classAtom()
+            if self.peek() == u"-" and self.peek(1) not in (u"]", u""):
+                self.i += 1
+                hi = self.classAtom()
+                if type(lo) is list or type(hi) is list:
+                    raise self.error("invalid character class range")
+                if lo[0] > hi[0]:
+                    raise self.error("range out of order in character class")
+                items.append((lo[1], hi[1]))
+            elif type(lo) is list:
+                items.extend(lo)
+            else:
+                items.append(lo[1])
+        self.i += 1
+        if len(items) == 0:
+            raise self.error("empty character class")
+        return ("chars", items, neg)
+
+def _concat(trees):
+    """:returns uregexp: the left-recursive concatenation of trees (as `buildConcatRecursively`)"""
+    re = trees[0]
+    for tree in trees[1:]:
+        re = uconcat(re, tree)
+    return re
+
+def _powers(x):
+    """:returns list<int>: the sizes of the optional repetitions which `xMore(x)` of parse.js makes"""
+    sizes = []
+    while x > 0:
+        i, chosen = 1, 0
+        while i + chosen <= x:
+            sizes.append(i)
+            chosen += i
+            i *= 2
+        x -= chosen
+    return sizes
+
+def _build(text, node):
+    """:returns uregexp: a new tree for node (a node repeated by a quantifier is built once per copy)"""
+    kind = node[0]
+    if kind == "atom":
+        return uatom(node[1])
+    elif kind == "chars":
+        return chars(list(node[1]), neg=node[2])
+    elif kind == "any":
+        return dotany()
+    elif kind == "anchor":
+        return anchor(node[1])
+    elif kind == "concat":
+        return _concat([_build(text, n) for n in node[1]])
+    elif kind == "disj":
+        return udisj(_build(text, node[1]), _build(text, node[2]))
+    elif kind == "star":
+        return ustar(_build(text, node[1]))
+    elif kind == "plus":
+        return uconcat(_build(text, node[1]), ustar(_build(text, node[1])))
+    elif kind == "option":
+        return uoption(_build(text, node[1]))
+
+    _, sub, lo, hi = node # "rep"
+    if lo > REP_LIMIT or (hi is not None and hi > REP_LIMIT):
+        return ustar(_build(text, sub))
+    reps = lambda x: _concat([_build(text, sub) for _ in xrange(x)])
+    if lo == hi:
+        if lo == 0:
+            raise errors.FAdoizeError(text.encode("utf-8"), "cannot format a repetition {0}")
+        return reps(lo)
+    elif hi is None:
+        return ustar(_build(text, sub)) if lo == 0 else uconcat(reps(lo), ustar(_build(text, sub)))
+    more = _concat([udisj(uepsilon(), reps(x)) for x in _powers(hi - lo)])
+    return more if lo == 0 else uconcat(reps(lo), more)
@@ -6,6 +6,22 @@ import random
 from util import Deque, RangeList, UniUtil, WeightedRandomItem
 import errors
 import fa_ext
+import spans
+
+_counts = None # the Counter of the open `counters.counting()` the partial derivative evaluators count into, or None
+
+def _countStep(states):
+    """Counts a character a partial derivative evaluator read from states, as memo hits until `_countMiss()`"""
+    _counts["symbols"] += 1
+    _counts["statesVisited"] += states
+    _counts["memoHits"] += states
+    _counts["setAllocations"] += 1
+
+def _countMiss(allocations):
+    """Counts a partial derivative which was not memoized, and the dicts built to memoize it"""
+    _counts["memoHits"] -= 1
+    _counts["memoMisses"] += 1
+    _counts["setAllocations"] += allocations
 
 class uregexp(reex.regexp):
     def __init__(self):
@@ -29,17 +45,26 @@ class uregexp(reex.regexp):
     def _pairGen(self, sample):
         raise NotImplementedError()
 
-    def toInvariantNFA(self, method):
+    def toInvariantNFA(self, method, optimize=False):
         """Convert self into an InvariantNFA using a construction method
         methods include: nfaPD, nfaPDO, nfaPDRPN, nfaPDDAG, nfaPosition, nfaFollow, nfaGlushkov, nfaThompson
+        :param bool optimize: if the NFA is passed through the reduction pipeline
+                              (see `fa_ext.InvariantNFA#reduce`)
         :raises exceptions.UnknownREtoNFAMethod: if the provided method is not recognized
         """
         if method not in set(["nfaPD", "nfaPDO", "nfaPosition", "nfaFollow", "nfaGlushkov", \
                 "nfaThompson", "nfaPDRPN", "nfaPDDAG"]):
             raise errors.UnknownREtoNFAMethod(method)
 
-        nfa = self.toNFA(method)
-        return fa_ext.InvariantNFA(nfa)
+        with spans.span("toInvariantNFA"):
+            with spans.span("construct"):
+                nfa = self.toNFA(method)
+            with spans.span("wrap"):
+                nfa = fa_ext.InvariantNFA(nfa)
+            if optimize:
+                nfa.reduce()
+            spans.count("states", len(nfa.States))
+        return nfa
 
     def nfaPosition(self, lstar=True):
         return fa_ext.InvariantNFA(super(uregexp, self).nfaPosition(lstar))
@@ -66,8 +91,10 @@ class uregexp(reex.regexp):
         Inspired by:
         S. Konstantinidis, et al. "Partial Derivative Automaton by Compressing Regular Expressions"
         """
-        self._memoRPN()
-        compressed = self.compress()
+        with spans.span("memoRPN"):
+            self._memoRPN()
+        with spans.span("compress"):
+            compressed = self.compress()
         todo = Deque([compressed])
         nfa = fa_ext.InvariantNFA()
 
@@ -76,22 +103,25 @@ class uregexp(reex.regexp):
         if compressed.ewp():
             nfa.addFinal(index)
 
-        while len(todo) > 0:
-            re = todo.pop_left()
-            re._memoLF()
-            for transition in re._lf:
-                for pd in re._lf[transition]:
-                    index = None
-                    pd._memoRPN()
-                    try:
-                        index = nfa.addState(pd._rpn)
-                        if pd.ewp():
-                            nfa.addFinal(index)
-                        todo.insert_right(pd)
-                    except common.DuplicateName:
-                        index = nfa.stateIndex(pd._rpn)
-                    nfa.addTransition(nfa.stateIndex(re._rpn), transition, index)
-        self._delAttr("_rpn")
+        with spans.span("derivatives"):
+            while len(todo) > 0:
+                re = todo.pop_left()
+                re._memoLF()
+                for transition in re._lf:
+                    for pd in re._lf[transition]:
+                        index = None
+                        pd._memoRPN()
+                        try:
+                            index = nfa.addState(pd._rpn)
+                            if pd.ewp():
+                                nfa.addFinal(index)
+                            todo.insert_right(pd)
+                        except common.DuplicateName:
+                            index = nfa.stateIndex(pd._rpn)
+                        nfa.addTransition(nfa.stateIndex(re._rpn), transition, index)
+            spans.count("partialDerivatives", len(nfa.States))
+        with spans.span("delAttr"):
+            self._delAttr("_rpn")
         return nfa
 
     def evalWordP_Backtrack(self, word):
@@ -133,11 +163,17 @@ class uregexp(reex.regexp):
         memo = dict() # re.rpn(): {str.sigma: dict(pd.rpn(), pd)}
         current = dict([(self.rpn(), self)])
         for sigma in word:
+            if _counts is not None:
+                _countStep(len(current))
             nxt = dict()
             for pdstr, pd in current.items():
                 if not memo.has_key(pdstr):
+                    if _counts is not None:
+                        _countMiss(2)
                     memo[pdstr] = dict([(sigma, dict([(x.rpn(), x) for x in pd.partialDerivatives(sigma)]))])
                 elif not memo[pdstr].has_key(sigma):
+                    if _counts is not None:
+                        _countMiss(1)
                     memo[pdstr][sigma] = dict([(x.rpn(), x) for x in pd.partialDerivatives(sigma)])
                 nxt.update(memo[pdstr][sigma])
             current = nxt
@@ -154,11 +190,17 @@ class uregexp(reex.regexp):
         memo = dict() # re.rpn(): {str.sigma: dict(pd.rpn(), pd)}
         current = dict([(compressed._rpn, compressed)])
         for sigma in word:
+            if _counts is not None:
+                _countStep(len(current))
             nxt = dict()
             for pdstr, pd in current.items():
                 if not memo.has_key(pdstr):
+                    if _counts is not None:
+                        _countMiss(2)
                     memo[pdstr] = dict([(sigma, dict([(x._rpn, x) for x in pd.partialDerivativesRPN(sigma).values()]))])
                 elif not memo[pdstr].has_key(sigma):
+                    if _counts is not None:
+                        _countMiss(1)
                     memo[pdstr][sigma] = dict([(x._rpn, x) for x in pd.partialDerivativesRPN(sigma).values()])
                 nxt.update(memo[pdstr][sigma])
             current = nxt
@@ -259,7 +301,8 @@ class uregexp(reex.regexp):
         # i.e., "a + bc" => "<ASTART> @any* (a + bc) @any* <AEND>" instead of "@any* (a + bc) @any*"
         # improvement not implemented since benchmarking tests are well underway and this may change the speed of the
         # partial match conversion
-        re = self._pmBoth()
+        with spans.span("partialMatch"):
+            re = self._pmBoth()
         re._partialMatch = 0
         return re
 
@@ -1119,12 +1162,15 @@ class chars(uatom):
 
     def next(self, current=None):
         if not self.neg:
-            i = self.ranges.indexOf(current)
-            if i is -1: # return the first character
+            if current is None: # return the first character
                 if len(self.ranges) >= 1:
                     return self.ranges[0][0]
                 else:
                     return None
+            i = self.ranges.indexOf(current)
+            if i is -1: # return the first character of the next range after current
+                i = self.ranges.search(current)
+                return self.ranges[i][0] if i < len(self.ranges) else None
             rnge = self.ranges[i]
             nxt = UniUtil.chr(UniUtil.ord(current) + 1)
             if nxt <= rnge[1]: # incrmement by one in this range
@@ -12,6 +12,8 @@ import errors
 import util
 import convert
 
+SAVE_BATCH = 1000 # lines whose expressions are FAdoized together (see `CodeSampler#save_expressions()`)
+
 class CodeSampler(object):
     def __init__(self, converter, language, search):
         """Create a new sampler
@@ -95,10 +97,7 @@ class CodeSampler(object):
         """
         expressions = list()
 
-        lineNum = 0
-        for line in lines:
-            lineNum += 1
-            self.save_expression(fromFile, line, lineNum)
+        self.save_expressions([(fromFile, line, lineNum) for lineNum, line in enumerate(lines, 1)])
 
         self.db.execute("""
             UPDATE github_urls
@@ -113,10 +112,12 @@ class CodeSampler(object):
         rows = self.db.selectall("""SELECT re_math, re_prog, line, url, lineNum, lang
                                     FROM expressions WHERE lang=?
                                     ORDER BY re_prog ASC;""", [self.language])
-        for _, _, line, url, lineNum, _ in rows:
-            self.output.overwrite("reprocess_lines:", line)
-            self.db.execute("DELETE FROM expressions WHERE url=? AND lineNum=?;", [url, lineNum])
-            self.save_expression(url, line, lineNum)
+        for start in xrange(0, len(rows), SAVE_BATCH):
+            batch = [(url, line, lineNum) for _, _, line, url, lineNum, _ in rows[start:start + SAVE_BATCH]]
+            for url, line, lineNum in batch:
+                self.output.overwrite("reprocess_lines:", line)
+                self.db.execute("DELETE FROM expressions WHERE url=? AND lineNum=?;", [url, lineNum])
+            self.save_expressions(batch)
 
     def save_expression(self, url, line, lineNum):
         """Save a potential expression to the database if one exists on line"""
@@ -130,24 +131,57 @@ class CodeSampler(object):
             self.output.overwrite("save_expression @ " + line)
 
             formatted = self.converter.FAdoize(expr, validate=True)
-            self.db.execute("""
-                INSERT OR IGNORE INTO expressions (re_math, re_prog, url, lineNum, line, lang)
-                VALUES (?, ?, ?, ?, ?, ?);""", [formatted, expr, url, lineNum, line, self.language])
+            return self._insert_expression(url, line, lineNum, expr, formatted)
+        except (errors.URegexpError, Exception) as e:
+            return self._insert_expression(url, line, lineNum, expr, formatted, e)
+
+    def save_expressions(self, rows):
+        """Like `#save_expression()` for many lines, but their expressions are FAdoized together
+        (see `Converter#FAdoize_many()`)
+        :param list<Tuple(unicode, unicode, int)> rows: the (url, line, lineNum) of each line
+        """
+        found = list() # (url, line, lineNum, expr) of the lines with an expression
+        for url, line, lineNum in rows:
+            try:
+                self.output.overwrite("get_line_expression @ " + line)
+                expr = self.get_line_expression(line)
+                if expr is not None:
+                    found.append((url, line, lineNum, expr))
+            except (errors.URegexpError, Exception) as e:
+                self._insert_expression(url, line, lineNum, "none_found", "not_done", e)
+
+        self.output.overwrite("save_expressions: FAdoize {0} expressions".format(len(found)))
+        results = self.converter.FAdoize_many([expr for _, _, _, expr in found], validate=True)
+        for (url, line, lineNum, expr), formatted in zip(found, results):
+            try:
+                if isinstance(formatted, BaseException):
+                    self._insert_expression(url, line, lineNum, expr, "not_done", formatted)
+                else:
+                    self._insert_expression(url, line, lineNum, expr, formatted)
+            except (errors.URegexpError, Exception) as e:
+                self._insert_expression(url, line, lineNum, expr, formatted, e)
+
+    def _insert_expression(self, url, line, lineNum, expr, formatted, err=None):
+        """Inserts the expression found on line, or the error which prevented it
+        :returns unicode|BaseException: formatted if there is no error, err otherwise
+        """
+        if err is None:
+            re_math = formatted
+        elif isinstance(err, errors.URegexpError):
+            re_math = str(err)
+        else:
+            re_math = "---"
+        self.db.execute("""
+            INSERT OR IGNORE INTO expressions (re_math, re_prog, url, lineNum, line, lang)
+            VALUES (?, ?, ?, ?, ?, ?);""", [re_math, expr, url, lineNum, line, self.language])
+        if err is None:
             return formatted
-        except (errors.URegexpError) as err:
-            self.db.execute("""
-                INSERT OR IGNORE INTO expressions (re_math, re_prog, url, lineNum, line, lang)
-                VALUES (?, ?, ?, ?, ?, ?);""", [str(err), expr, url, lineNum, line, self.language])
-            return err
-        except Exception as e:
-            self.db.execute("""
-                INSERT OR IGNORE INTO expressions (re_math, re_prog, url, lineNum, line, lang)
-                VALUES (?, ?, ?, ?, ?, ?);""", ["---", expr, url, lineNum, line, self.language])
+        if not isinstance(err, errors.URegexpError):
             print("\n\n==> ", expr, "\n==>", formatted, "\n", url, lineNum)
-            print(e)
-            # raise e
+            print(err)
+            # raise err
             raw_input("Press Enter to continue ...")
-            return e
+        return err
 
     # abstractmethod
     def get_line_expression(self, line):
@@ -355,7 +389,7 @@ class RandomSampler():
         """Uniformly select a character class using the provided alphabet."""
         chars_string = "[{}{}]".format("" if self.random.choice([True, False]) else "^",
                 self.random.choice(self._char_classes))
-        return self.converter.math(chars_string)
+        return self.converter.math(chars_string, cached=False) # a new leaf for every position of the tree
 
     def _transform(self, re):
         """Transforms a FAdoly generated regular expression into one with the proper extensions"""
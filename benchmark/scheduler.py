@@ -0,0 +1,293 @@
+"""Schedules the benchmarks of `benchmark.py` over a pool of long-lived worker processes.
+
+Every (re_math, method) pair is a unit of work: a worker times it with `Benchmarker#measure()` and
+sends the times back over its pipe. All the units of an expression go to the same worker, one at a
+time, so the words of the expression are generated once.
+
+Only this process writes to the database: the results of finished expressions are saved in batches,
+one transaction each (see `Benchmarker#save()`). The results of an expression which is not finished
+are never saved, so stopping (or crashing) loses at most the unsaved batch, which is benchmarked again.
+"""
+from __future__ import print_function
+import bisect
+import gc
+import multiprocessing
+import select
+import signal
+import time
+
+import psutil
+
+import errors
+from util import stopAfter
+
+TASK_TIMEOUT = 60 * 60      # seconds one unit can take before its worker is terminated and the expression fails
+MIN_FREE_GB = 5             # no expression is started while less GB of memory is available
+DEFAULT_WEIGHT = 0.01       # predicted seconds per symbol of re_math for a method without results
+WEIGHT_DECAY = 0.9          # how much of the previous weight of a method is kept after each unit
+WRITE_BATCH = 50            # finished or failed expressions saved together in one transaction
+WRITE_INTERVAL = 30         # maximum seconds between the saves of a batch
+CHECKPOINT_INTERVAL = 5 * 60 # seconds between the checkpoints of the write-ahead log
+
+def gbFree():
+    """Returns an integer number of GB free on system"""
+    return psutil.virtual_memory().available / 1000 / 1000 / 1000
+
+def _work(factory, conn):
+    """The loop of a worker: receives units (re_math, method) until None, and sends back
+    (unit, result, error) where result is None or ((hash, n_evalA, n_evalR), times, row, latencies): the
+    words of re_math (see `Benchmarker#words()`), the times of the method (see `Benchmarker#measure()`),
+    the row of the table words if they were generated by this unit (see `Benchmarker#unsavedWords()`)
+    and the latencies of its words if they are recorded (see `Benchmarker#latencyRows()`).
+    error is None, ("memory", message) or ("error", message).
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN) # the scheduler stops the workers
+    gc.disable() # collected between expressions (see `Benchmarker#words()`)
+    benchmarker = factory()
+    while True:
+        unit = conn.recv()
+        if unit is None:
+            break
+        re_math, method = unit
+        try:
+            histograms = dict() if benchmarker.latency else None
+            times = benchmarker.measure(re_math, method, histograms)
+            w_accepted, w_rejected = benchmarker.words(re_math)
+            words = (benchmarker.wordsHash(re_math), len(w_accepted), len(w_rejected))
+            conn.send((unit, (words, times, benchmarker.unsavedWords(re_math),
+                benchmarker.latencyRows(re_math, method, histograms)), None))
+        except MemoryError as error:
+            benchmarker.forgetWords()
+            conn.send((unit, None, ("memory", str(error))))
+        except (errors.FAdoExtError, Exception) as error:
+            benchmarker.forgetWords()
+            conn.send((unit, None, ("error", str(error))))
+    conn.close()
+
+class _Worker(object):
+    """A worker process, with the expression it is benchmarking and its remaining methods"""
+    def __init__(self, factory):
+        self.conn, child = multiprocessing.Pipe()
+        self.proc = multiprocessing.Process(target=_work, args=(factory, child))
+        self.proc.daemon = True
+        self.proc.start()
+        child.close()
+        self.re_math = None
+        self.methods = []
+        self.unit = None
+        self.started = None
+
+    def assign(self, re_math, methods):
+        self.re_math = re_math
+        self.methods = list(methods)
+        self.next()
+
+    def next(self):
+        """Sends the next method of the expression, or frees the worker if there is none"""
+        if len(self.methods) == 0:
+            self.re_math = self.unit = self.started = None
+            return
+        self.unit = (self.re_math, self.methods.pop(0))
+        self.started = time.time()
+        self.conn.send(self.unit)
+
+    def stop(self, terminate=False):
+        """Stops the process, waiting up to a second for an idle one to finish unless terminate"""
+        timeout = 0
+        if not terminate and self.unit is None:
+            try:
+                self.conn.send(None)
+                timeout = 1
+            except (IOError, OSError):
+                pass
+        stopAfter(self.proc, timeout)
+        self.conn.close()
+
+class _Batch(object):
+    """The results of expressions which are saved together (see `Benchmarker#save()`)"""
+    def __init__(self, benchmarker, countIteration):
+        self.benchmarker = benchmarker
+        self.countIteration = countIteration
+        self.unfinished = dict() # re_math: (hash, n_evalA, n_evalR, list<Tuple(str, times)>, latencies)
+        self.finished = []
+        self.failed = []
+        self.words = [] # generated words are saved even if their expression is not finished
+        self.latencies = []
+        self.saved = self.checkpointed = time.time()
+
+    def add(self, re_math, method, words, times, row, latencies):
+        results = self.unfinished.setdefault(re_math, words + ([], []))
+        results[3].append((method, times))
+        results[4].extend(latencies)
+        if row is not None:
+            self.words.append(row)
+
+    def finish(self, re_math):
+        results = self.unfinished.pop(re_math)
+        self.finished.append((re_math,) + results[:4])
+        self.latencies.extend(results[4])
+
+    def fail(self, re_math, error):
+        self.unfinished.pop(re_math, None)
+        self.failed.append((re_math, str(error)))
+
+    def save(self, force=False):
+        """Saves the finished and failed expressions if the batch is full, WRITE_INTERVAL passed or force"""
+        now = time.time()
+        if not force and len(self.finished) + len(self.failed) < WRITE_BATCH and now - self.saved < WRITE_INTERVAL:
+            return
+        if len(self.finished) + len(self.failed) + len(self.words) > 0:
+            self.benchmarker.save(self.finished, self.failed, self.countIteration, self.words, self.latencies)
+            self.finished, self.failed, self.words, self.latencies = [], [], [], []
+        self.saved = now
+        if now - self.checkpointed >= CHECKPOINT_INTERVAL:
+            self.benchmarker.db.checkpoint()
+            self.checkpointed = now
+
+class Scheduler(object):
+    """Benchmarks expressions over nworkers long-lived processes.
+
+    Admission: an expression is only started if at least minFree GB of memory is available. The
+    expression predicted to take the longest is started first so that the slowest ones do not end a run
+    with one worker busy, except under memory pressure (less than 2*minFree GB) where the cheapest is
+    started instead. The prediction is the length of re_math times a weight per method, seeded from the
+    results in out_tests and updated as units finish.
+
+    Timeouts: a word evaluation running for more than MAX_EVAL_WORD_TIME is aborted within its worker,
+    and its method is saved as timed out (see `Benchmarker#measure()`). A unit running for more than
+    taskTimeout seconds (the first unit of an expression also generates its words) has its worker
+    terminated and replaced, and its expression is failed like an error (see `Benchmarker#save()`).
+    """
+    def __init__(self, factory, nworkers=1, taskTimeout=TASK_TIMEOUT, minFree=MIN_FREE_GB):
+        """
+        :param function factory: creates the Benchmarker of a worker, once per worker process
+        :param int nworkers: the number of worker processes
+        """
+        self.factory = factory
+        self.taskTimeout = taskTimeout
+        self.minFree = minFree
+        self.workers = [_Worker(factory) for _ in xrange(nworkers)]
+        self.weights = None
+
+    def close(self):
+        """Stops every worker, terminating the busy ones"""
+        for worker in self.workers:
+            worker.stop()
+        self.workers = []
+
+    def _seedWeights(self, benchmarker):
+        """:returns dict<str, float>: the mean seconds per symbol of re_math of each method in out_tests"""
+        weights = dict()
+        for method, weight in benchmarker.db.selectall("""
+            SELECT tout.method, avg((tout.t_pre + tout.t_evalA + tout.t_evalR) / tin.length)
+            FROM in_tests as tin, out_tests as tout
+            WHERE tin.re_math==tout.re_math
+                AND tin.length>0
+                AND tout.t_pre<1000000.0
+                AND tout.t_evalA<1000000.0
+                AND tout.t_evalR<1000000.0
+            GROUP BY tout.method;
+        """):
+            weights[method] = weight
+        return weights
+
+    def predict(self, length, methods):
+        """:returns float: the predicted seconds to benchmark an expression of length with methods"""
+        return sum(length * self.weights.get(method, DEFAULT_WEIGHT) for method in methods)
+
+    def _learn(self, length, method, elapsed):
+        if length > 0:
+            weight = self.weights.get(method, DEFAULT_WEIGHT)
+            self.weights[method] = WEIGHT_DECAY * weight + (1 - WEIGHT_DECAY) * elapsed / length
+
+    def _replace(self, worker):
+        worker.stop(terminate=True)
+        self.workers[self.workers.index(worker)] = _Worker(self.factory)
+
+    def run(self, benchmarker, todo, countIteration=True):
+        """Benchmarks the methods of every expression of todo, saving the results with benchmarker
+        :param Benchmarker benchmarker: used to save the results, in this process
+        :param dict<unicode, iterable<str>> todo: the methods to benchmark for each re_math
+        :param bool countIteration: if an iteration of each finished expression is counted as done
+            (see `Benchmarker#save()`)
+        :returns int: the number of expressions benchmarked without an error
+        """
+        if self.weights is None:
+            self.weights = self._seedWeights(benchmarker)
+        lengths = dict((re_math.decode("utf-8"), length) for re_math, length in benchmarker.db.selectall(
+            "SELECT re_math, length FROM in_tests;"))
+        pending = sorted((self.predict(lengths[re_math], methods), re_math, tuple(methods))
+            for re_math, methods in todo.iteritems())
+        batch = _Batch(benchmarker, countIteration)
+        ndone = 0
+        start = time.time()
+
+        try:
+            while len(pending) > 0 or any(worker.unit is not None for worker in self.workers):
+                # admit new expressions to the idle workers
+                for worker in self.workers:
+                    if worker.unit is not None or len(pending) == 0:
+                        continue
+                    free = gbFree()
+                    if free < self.minFree:
+                        break
+                    cost, re_math, methods = pending.pop(0 if free < 2 * self.minFree else -1)
+                    print("\nBenchmarking", re_math.encode("utf-8").encode("string-escape")[:100],
+                        "(predicted {:.1f}s) ...".format(cost))
+                    worker.assign(re_math, methods)
+
+                # receive the results
+                busy = dict((worker.conn.fileno(), worker) for worker in self.workers if worker.unit is not None)
+                ready = []
+                if len(busy) > 0:
+                    ready = select.select(busy.keys(), [], [], 0.25)[0]
+                else: # waiting for memory
+                    time.sleep(0.25)
+                for fd in ready:
+                    worker = busy[fd]
+                    try:
+                        unit, result, error = worker.conn.recv()
+                    except (EOFError, IOError): # the worker died, see below
+                        continue
+                    re_math, method = unit
+                    if error is None:
+                        batch.add(re_math, method, *result)
+                        self._learn(lengths[re_math], method, time.time() - worker.started)
+                        worker.next()
+                        if worker.unit is None: # finished the expression
+                            batch.finish(re_math)
+                            ndone += 1
+                            print("\tSuccess", re_math.encode("utf-8").encode("string-escape")[:50],
+                                "({:.1f} expressions/hour)".format(ndone * 3600.0 / (time.time() - start)))
+                    elif error[0] == "memory": # try the remaining methods again later
+                        print("\n" + error[1], "Requeueing", re_math.encode("utf-8").encode("string-escape")[:50])
+                        methods = (method,) + tuple(worker.methods)
+                        bisect.insort(pending, (self.predict(lengths[re_math], methods), re_math, methods))
+                        worker.methods = []
+                        worker.next()
+                    else:
+                        batch.fail(re_math, error[1])
+                        print(error[1])
+                        worker.methods = []
+                        worker.next()
+
+                # enforce the timeouts and replace the workers which died
+                for worker in list(self.workers):
+                    if worker.unit is None:
+                        if not worker.proc.is_alive():
+                            self._replace(worker)
+                        continue
+                    re_math, method = worker.unit
+                    if time.time() - worker.started > self.taskTimeout:
+                        error = "{0} timed out after {1}s".format(method, self.taskTimeout)
+                    elif not worker.proc.is_alive():
+                        error = "{0} stopped its worker with exit code {1}".format(method, worker.proc.exitcode)
+                    else:
+                        continue
+                    batch.fail(re_math, error)
+                    print("\n" + error, "on", re_math.encode("utf-8").encode("string-escape")[:50])
+                    self._replace(worker)
+                batch.save()
+        finally: # the finished expressions are saved, but not the unfinished ones
+            batch.save(force=True)
+        return ndone
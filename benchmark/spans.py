@@ -0,0 +1,123 @@
+"""Hierarchical timings and counters of the phases of a construction, which `benchmark.py` saves in
+the table out_phases (see `Benchmarker#measure()`).
+
+The constructions mark their phases with spans, which nest like the calls:
+    with spans.span("compress"):
+        compressed = self.compress()
+    spans.count("states", len(nfa.States))
+
+Nothing is recorded unless a `recording()` is open: `span()` then returns a shared context which
+does nothing and `count()` returns at once, so an instrumented construction is not slowed down
+outside of the benchmarks. While recording, the spans of the same name under the same parent are
+added together into one `Span` of the tree (e.g., every partialMatch of a parse):
+    with spans.recording() as root:
+        nfa = pmre.toInvariantNFA("nfaPDRPN")
+    root.rows() # [("toInvariantNFA", 0.12, 1), ("toInvariantNFA/construct", 0.11, 1), ...]
+"""
+import collections
+
+from latency import clock
+
+_stack = None # the open spans of the recording, innermost last, or None if nothing is recorded
+
+class Span(object):
+    """The total seconds and calls of a phase, its counters and its sub-phases"""
+    __slots__ = ("name", "seconds", "calls", "counters", "children")
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.calls = 0
+        self.counters = collections.OrderedDict() # name: total
+        self.children = collections.OrderedDict() # name: Span
+
+    def child(self, name):
+        """:returns Span: the sub-phase name, which is added if it is new"""
+        span = self.children.get(name)
+        if span is None:
+            span = self.children[name] = Span(name)
+        return span
+
+    def rows(self, prefix=""):
+        """The sub-phases of this span, depth first, as rows of the table out_phases
+        :returns list<Tuple(str, float|None, int)>: the path of each phase from this span ("a/b"),
+            its seconds and calls, and the path ("a/b:name"), None and total of each counter
+        """
+        rows = []
+        for name, total in self.counters.iteritems():
+            rows.append((prefix + ":" + name, None, total))
+        for name, span in self.children.iteritems():
+            path = prefix + "/" + name if prefix else name
+            rows.append((path, span.seconds, span.calls))
+            rows.extend(span.rows(path))
+        return rows
+
+class _Timer(object):
+    """Times one call of a span while recording"""
+    __slots__ = ("name", "span", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.span = _stack[-1].child(self.name)
+        _stack.append(self.span)
+        self.start = clock()
+        return self.span
+
+    def __exit__(self, *exc_info):
+        self.span.seconds += clock() - self.start
+        self.span.calls += 1
+        if _stack is not None and _stack[-1] is self.span:
+            _stack.pop()
+        return False
+
+class _NoSpan(object):
+    """The span of every phase while nothing is recorded"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+def span(name):
+    """:param str name: of the phase, unique among the phases of its parent
+    :returns: a context which times the phase if a `recording()` is open
+    """
+    if _stack is None:
+        return _NO_SPAN
+    return _Timer(name)
+
+def count(name, n=1):
+    """Adds n to the counter name of the innermost open span, if a `recording()` is open"""
+    if _stack is None:
+        return
+    counters = _stack[-1].counters
+    counters[name] = counters.get(name, 0) + n
+
+def enabled():
+    """:returns bool: if a `recording()` is open, e.g. to skip computing a counter"""
+    return _stack is not None
+
+class recording(object):
+    """Records the spans opened within this context into a tree (see `Span#rows()`). Recordings can
+    be nested: the inner one is recorded on its own, and the outer one resumes after it.
+    """
+    def __init__(self, root=None):
+        """:param Span root: to add the spans to, e.g. of a previous recording (a new one by default)"""
+        self.root = root or Span("")
+
+    def __enter__(self):
+        global _stack
+        self._outer = _stack
+        _stack = [self.root]
+        return self.root
+
+    def __exit__(self, *exc_info):
+        global _stack
+        _stack = self._outer
+        return False
@@ -1,6 +1,11 @@
 from __future__ import print_function
+import hashlib
+import heapq
+import os
+import signal
 import sqlite3
 import sys
+from contextlib import contextmanager
 from random import randint
 
 import errors
@@ -93,6 +98,8 @@ class DBWrapper(object):
         self._connection = sqlite3.connect(self.name)
         self._connection.text_factory = str
         self._cursor = self._connection.cursor()
+        self._depth = 0     # the number of open `#transaction()`s, which commit only when the last one closes
+        self.commits = 0    # the number of commits made by this connection
 
         # setup tables
         self.executescript("""
@@ -138,10 +145,48 @@ class DBWrapper(object):
         """Executes a command with optional parameters"""
         self._commit_rollback(lambda: self._cursor.execute(cmd, params))
 
+    def executemany(self, cmd, rows):
+        """Executes a command once for each parameter list of rows"""
+        self._commit_rollback(lambda: self._cursor.executemany(cmd, rows))
+
+    @contextmanager
+    def transaction(self):
+        """Commits every command executed within this context at once when it closes, or none of
+        them if an exception is raised (nested transactions are part of the outermost one)
+        """
+        self._depth += 1
+        try:
+            yield self
+        except:
+            self._depth -= 1
+            if self._depth == 0:
+                self._connection.rollback()
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            self._connection.commit()
+            self.commits += 1
+
+    def useWAL(self):
+        """Switches the database to write-ahead logging, which lets readers continue while a writer
+        commits, and only syncs to disk at checkpoints (see `#checkpoint()`). The mode is saved in the
+        database file.
+        """
+        self._cursor.execute("PRAGMA journal_mode=WAL;")
+        self._cursor.execute("PRAGMA synchronous=NORMAL;")
+
+    def checkpoint(self):
+        """Copies the committed transactions of the write-ahead log into the database file"""
+        self._cursor.execute("PRAGMA wal_checkpoint(PASSIVE);")
+
     def _commit_rollback(self, ftn):
+        if self._depth > 0: # committed by the transaction
+            ftn()
+            return
         try:
             ftn()
             self._connection.commit()
+            self.commits += 1
         except:
             self._connection.rollback()
             raise
@@ -374,6 +419,47 @@ class WeightedRandomItem():
             mid -= 1
         return self.items[mid][1]
 
+class BottomK(object):
+    """A uniform random sample of at most k distinct strings of a stream of unknown length: the k
+    with the smallest seeded hashes (bottom-k sampling). A string offered again, even after it left
+    the sample, has the same hash, so repeats are not more likely to be sampled, and the sample only
+    depends on the seed and the set of strings offered.
+    """
+    def __init__(self, k, seed=""):
+        """:param int k: the maximum number of strings kept
+        :param str seed: of the hash, so the sample can be repeated
+        """
+        self.k = k
+        self.seed = seed
+        self.seen = 0 # the number of strings offered to the sample, with repeats
+        self._heap = list() # (-hash, string) of the sample: the largest hash first
+        self._members = set()
+
+    def add(self, string):
+        """Offers a string of the stream to the sample
+        :param unicode|str string: which is encoded as utf-8 to hash it
+        """
+        self.seen += 1
+        if string in self._members:
+            return
+        encoded = string.encode("utf-8") if isinstance(string, unicode) else string
+        key = -int(hashlib.sha1(self.seed + encoded).hexdigest()[:16], 16)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, (key, string))
+        elif key > self._heap[0][0]:
+            self._members.discard(heapq.heapreplace(self._heap, (key, string))[1])
+        else:
+            return
+        self._members.add(string)
+
+    @property
+    def items(self):
+        """:returns list<unicode|str>: the sample, by increasing hash"""
+        return [string for _, string in sorted(self._heap, reverse=True)]
+
+    def __len__(self):
+        return len(self._heap)
+
 class Deque(object):
     """Double ended-queue implementation with constant-time operations unless
     otherwise noted.
@@ -585,3 +671,40 @@ def parseIntSafe(val, default):
         return int(val)
     except ValueError:
         return default
+
+def timeLimited(ftn, timeout):
+    """:param float timeout: the maximum number of seconds one call of ftn can take
+    :returns function: which calls ftn and raises EvalTimeoutError if it takes longer than timeout,
+        aborting the call: Python code is interrupted between bytecodes, and the searches of `re` and
+        `regex` check for signals while they backtrack
+    ..note: the timeout uses SIGALRM, whose handler is installed for the duration of each call, so the
+        returned function must be called from the main thread and not within another time limited call
+    """
+    def _onTimeout(signum, frame):
+        raise errors.EvalTimeoutError(timeout)
+
+    def _timeLimited(*args):
+        previous = signal.signal(signal.SIGALRM, _onTimeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            return ftn(*args)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    return _timeLimited
+
+def stopAfter(proc, timeout):
+    """Waits up to timeout seconds for the process proc to finish, and stops it otherwise (terminated,
+    then killed if it ignores SIGTERM) so its CPU is free when this returns
+    :param multiprocessing.Process proc:
+    :returns bool: if proc finished within timeout
+    """
+    proc.join(timeout)
+    if not proc.is_alive():
+        return True
+    proc.terminate()
+    proc.join(1)
+    if proc.is_alive():
+        os.kill(proc.pid, signal.SIGKILL)
+        proc.join()
+    return False
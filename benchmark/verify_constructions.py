@@ -0,0 +1,102 @@
+from __future__ import print_function
+import multiprocessing
+import sys
+import time
+
+import util
+import convert
+import errors
+
+MAX_TIME_PER_EXPRESSION = 120 # seconds an expression's worker spends on it before it is reported as a timeout
+REFERENCE_METHOD = "nfaThompson" # every other construction is compared to this one
+
+_converter = None # created before the worker processes are forked
+
+def _verify_one(args):
+    """Constructs every NFA of one expression (and its partial matching version) and compares
+    them to the reference construction.
+    :param Tuple(str, list<str>) args: the utf-8 encoded re_math, and the construction methods
+    :returns Tuple(str, list<Tuple(str, bool, unicode|None, str)>): the encoded re_math and for
+    each method: (method, partialMatch, counterexample, error), with the error "timeout" last if
+    they took longer than MAX_TIME_PER_EXPRESSION
+    """
+    re_math, methods = args
+    results = []
+    try: # limited in the worker: the time waiting for a busy worker does not count
+        util.timeLimited(_verify, MAX_TIME_PER_EXPRESSION)(re_math, methods, results)
+    except errors.EvalTimeoutError:
+        results.append((REFERENCE_METHOD, False, None, "timeout"))
+    return re_math, results
+
+def _verify(re_math, methods, results):
+    """Appends the results of `_verify_one()` to results as they are found"""
+    try:
+        re = _converter.math(re_math.decode("utf-8"))
+        for partialMatch, regexp in [(False, re), (True, re.partialMatch())]:
+            reference = regexp.toInvariantNFA(REFERENCE_METHOD)
+            for method in methods:
+                if method == REFERENCE_METHOD:
+                    continue
+                try:
+                    nfa = regexp.toInvariantNFA(method)
+                    results.append((method, partialMatch, nfa.equivalenceCounterexample(reference), ""))
+                except Exception as e:
+                    results.append((method, partialMatch, None, repr(e)))
+    except Exception as e:
+        results.append((REFERENCE_METHOD, False, None, repr(e)))
+
+class ConstructionVerifier():
+    """Checks that all NFA constructions accept the same language for every in_tests expression.
+    Expressions are verified in parallel by a pool of worker processes.
+    """
+    def __init__(self, processes=None):
+        """:param int|None processes: the number of worker processes (defaults to the cpu count)"""
+        self.processes = processes if processes is not None else multiprocessing.cpu_count()
+
+    def get_expressions_and_methods(self):
+        db = util.DBWrapper()
+        expressions = [x[0] for x in db.selectall("SELECT re_math FROM in_tests;")]
+        methods = [x[0] for x in db.selectall("SELECT method FROM methods WHERE method LIKE 'nfa%';")]
+        if REFERENCE_METHOD not in methods:
+            methods.append(REFERENCE_METHOD)
+        return (expressions, methods)
+
+    def verify(self):
+        """Verifies every expression and prints the constructions which disagree with the
+        reference construction along with a counterexample word
+        :returns list<Tuple(str, str, bool, unicode|None, str)>: (re_math, method, partialMatch,
+        counterexample, error) of each disagreement or error
+        """
+        global _converter
+        expressions, methods = self.get_expressions_and_methods()
+        _converter = convert.Converter()
+        sys.setrecursionlimit(12000)
+        pool = multiprocessing.Pool(self.processes)
+        failures = []
+        try:
+            pending = [(re_math, pool.apply_async(_verify_one, [(re_math, methods)]))
+                for re_math in expressions]
+            start = time.time()
+            for n, (re_math, result) in enumerate(pending):
+                print("\r{}\r{}/{} ({:.1f}s): {}".format(" "*120, n, len(expressions),
+                    time.time() - start, re_math[:80]), end="")
+                sys.stdout.flush()
+                _, results = result.get(sys.maxint) # (with a timeout, so a KeyboardInterrupt is not deferred)
+
+                for method, partialMatch, counterexample, error in results:
+                    if counterexample is not None or error != "":
+                        failures.append((re_math, method, partialMatch, counterexample, error))
+                        print("\n{} {}(partialMatch={}): {}".format(re_math[:80], method, partialMatch,
+                            error if error != "" else "counterexample " + repr(counterexample)))
+        finally:
+            pool.terminate()
+            pool.join()
+
+        print("\nVerified {} expressions with {} constructions in {:.1f}s: {} disagreements or errors".format(
+            len(expressions), len(methods), time.time() - start, len(failures)))
+        return failures
+
+if __name__ == "__main__":
+    processes = util.parseIntSafe(raw_input("Number of worker processes (default {}): ".format(
+        multiprocessing.cpu_count())), None)
+    ConstructionVerifier(processes).verify()
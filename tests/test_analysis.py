@@ -0,0 +1,111 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from benchmark import analysis
+from benchmark.util import DBWrapper
+
+class TestAnalysis(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(1)
+        self.length = np.tile(np.arange(1, 101), 2)
+        self.method = np.repeat([0, 1], 100)
+        t_pre = 1e-4 * self.length ** np.where(self.method == 0, 1.0, 2.0) * rng.lognormal(0, 0.1, 200)
+        t_evalA = 1e-6 * self.length ** 1.5 * 10
+        t_evalR = t_evalA.copy()
+        t_evalR[[7, 150]] = analysis.UNSOLVED_TIME # timed out
+        self.results = analysis.Results(["linear", "quadratic"], self.method, self.length, t_pre, t_evalA,
+            t_evalR, np.full(200, 10), np.full(200, 10))
+
+    def test_solved(self):
+        self.assertEqual(self.results.solved.sum(), 198)
+        self.assertAlmostEqual(self.results.t_word[0], 1e-6)
+
+    def test_lengthStats(self):
+        table = analysis.lengthStats(self.results, self.results.t_pre, 10)
+        self.assertEqual(list(table["method"][:2]), ["linear", "linear"])
+        self.assertEqual(list(table["bin"][:2]), [0, 10])
+        self.assertEqual(list(table["count"][:2]), [8, 10]) # lengths 1-9 without 8, and 10-19
+        self.assertEqual(list(table["unsolved"][:2]), [1, 0])
+
+        rows = (self.method == 1) & (self.length >= 50) & (self.length < 60) & (self.length != 51)
+        i = list(zip(table["method"], table["bin"])).index(("quadratic", 50))
+        values = self.results.t_pre[rows]
+        self.assertAlmostEqual(table["length"][i], self.length[rows].mean())
+        self.assertAlmostEqual(table["mean"][i], values.mean())
+        for q in analysis.QUANTILES:
+            self.assertAlmostEqual(table["p{0}".format(q)][i], np.percentile(values, q))
+        self.assertLess(table["low"][i], table["mean"][i])
+        self.assertGreater(table["high"][i], table["mean"][i])
+
+    def test_bootstrapMean(self):
+        values = np.random.RandomState(2).normal(1.0, 0.1, 400)
+        low, high = analysis.bootstrapMean(values)
+        self.assertAlmostEqual(high - low, 2 * 1.96 * 0.1 / 20, delta=0.004)
+        normal = analysis.bootstrapMean(np.tile(values, 3)) # the normal approximation
+        self.assertAlmostEqual(normal[1] - normal[0], 2 * 1.96 * 0.1 / np.sqrt(1200), delta=0.002)
+
+    def test_fitExponents(self):
+        table = analysis.fitExponents(self.results)
+        rows = list(zip(table["method"], table["measure"], table["exponent"]))
+        self.assertEqual([row[:2] for row in rows],
+            [("linear", "t_pre"), ("quadratic", "t_pre"), ("linear", "t_word"), ("quadratic", "t_word")])
+        for expected, (_, _, exponent) in zip([1.0, 2.0, 1.5, 1.5], rows):
+            self.assertAlmostEqual(exponent, expected, delta=0.05)
+        self.assertEqual(list(table["n"]), [99, 99, 99, 99])
+        self.assertAlmostEqual(table["coefficient"][2], 1e-6)
+        self.assertAlmostEqual(table["r2"][2], 1.0)
+
+    def test_load_export(self):
+        directory = tempfile.mkdtemp()
+        try:
+            db = DBWrapper(os.path.join(directory, "database.db"))
+            db.executescript("""
+                CREATE TABLE in_tests (re_math TEXT, n_evalA INTEGER, n_evalR INTEGER, length INTEGER);
+                CREATE TABLE out_tests (re_math TEXT, method TEXT, t_pre REAL, t_evalA REAL, t_evalR REAL);
+                CREATE TABLE out_memory (re_math TEXT, method TEXT, m_pre INTEGER, m_eval INTEGER,
+                    m_retained INTEGER, nstates INTEGER, ntrans INTEGER);
+            """)
+            db.executemany("INSERT INTO in_tests VALUES (?, 10, 10, ?);", [("a", 1), ("bb", 2)])
+            db.executemany("INSERT INTO out_tests VALUES (?, ?, ?, ?, ?);",
+                [("a", "re", 1.0, 2.0, 2.0), ("bb", "re", 2.0, 4.0, 4.0), ("a", "pdo", 3.0, 0.0, 0.0)])
+            db.execute("INSERT INTO out_memory VALUES ('bb', 're', 4096, 0, 1000, NULL, NULL);")
+            results = analysis.load(db)
+            self.assertEqual(results.methods, ["pdo", "re"])
+            self.assertEqual(list(results.method), [0, 1, 1])
+            self.assertEqual(sorted(zip(results.length, results.t_pre, results.t_word)),
+                [(1.0, 1.0, 0.2), (1.0, 3.0, 0.0), (2.0, 2.0, 0.4)])
+            self.assertEqual(list(np.isnan(results.m_retained)), [True, True, False])
+            self.assertEqual((results.m_pre[2], results.m_eval[2], results.m_retained[2]), (4096, 0, 1000))
+
+            paths = analysis.export({"exponents": analysis.fitExponents(results)}, os.path.join(directory, "out"))
+            self.assertEqual(open(paths[0]).read().splitlines(),
+                ["method,measure,n,exponent,stderr,coefficient,r2"]) # too few results to fit
+        finally:
+            shutil.rmtree(directory)
+
+    def test_counterStats(self):
+        directory = tempfile.mkdtemp()
+        try:
+            db = DBWrapper(os.path.join(directory, "database.db"))
+            db.execute("CREATE TABLE out_counters (re_math TEXT, method TEXT, counter TEXT, value INTEGER);")
+            db.executemany("INSERT INTO out_counters VALUES (?, ?, ?, ?);", [
+                ("a", "pdo", "words", 2), ("a", "pdo", "symbols", 10), ("a", "pdo", "memoHits", 4),
+                ("bb", "pdo", "words", 4), ("bb", "pdo", "symbols", 10), ("bb", "pdo", "memoHits", 2),
+                ("a", "backtrack", "words", 2), ("a", "backtrack", "backtrackCalls", 6),
+                ("bb", "backtrack", "words", 0), ("bb", "backtrack", "backtrackCalls", 0)])
+            table = analysis.counterStats(db)
+            self.assertEqual(zip(table["method"], table["counter"], table["n"]),
+                [("backtrack", "backtrackCalls", 1), ("pdo", "memoHits", 2), ("pdo", "symbols", 2)])
+            self.assertEqual(list(table["perWord"]), [3.0, 1.25, 3.75])
+            self.assertTrue(np.isnan(table["perSymbol"][0])) # no symbols are read
+            self.assertAlmostEqual(table["perSymbol"][1], 0.3)
+            self.assertAlmostEqual(table["perSymbol"][2], 1.0)
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import errno
+import os
+import shutil
+import tempfile
+
+from benchmark.convert import Converter
+from benchmark.artifact_cache import ArtifactCache
+
+class TestArtifactCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.convert = Converter()
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ArtifactCache(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_key(self):
+        keys = set([self.cache.key("nfa", u"(a b)", "nfaPD"), self.cache.key("nfa", u"(a b)", "nfaPD", True),
+            self.cache.key("nfa", u"(a b)", "nfaThompson"), self.cache.key("tree", u"(a b)"),
+            self.cache.key("nfa", u"(a c)", "nfaPD")])
+        self.assertEqual(len(keys), 5)
+        self.assertEqual(self.cache.key("nfa", u"(a b)", "nfaPD"), self.cache.key("nfa", "(a b)", "nfaPD"))
+
+    def test_tree(self):
+        expr = u"((<ASTART> [a-c]*) (d + \u00e9))"
+        for partialMatch in [False, True]:
+            re = self.cache.tree(self.convert, expr, partialMatch)
+            cached = self.cache.tree(None, expr, partialMatch) # a miss would fail without a converter
+            self.assertEqual(str(cached), str(re))
+            self.assertTrue(cached.evalWordP(u"abd"))
+
+    def test_nfa(self):
+        expr = u"((a [b-d]*) + (a (b c)))"
+        pmre = self.convert.math(expr, partialMatch=True)
+        nfa = self.cache.nfa(pmre, expr, "nfaThompson", partialMatch=True)
+        self.assertEqual(nfa.States, range(len(nfa.States)))
+        cached = self.cache.nfa(None, expr, "nfaThompson", partialMatch=True)
+        self.assertTrue(cached.equivalentP(nfa))
+        self.assertTrue(cached.evalWordP(u"xabdcx"))
+
+        key = self.cache.key("nfa", expr, "nfaThompson", True)
+        self.cache.put(key, "corrupted")
+        self.assertTrue(self.cache.nfa(pmre, expr, "nfaThompson", partialMatch=True).equivalentP(nfa))
+        self.assertNotEqual(self.cache.get(key), "corrupted")
+
+    def test_evict(self):
+        cache = self.cache
+        keys = [cache.key("tree", str(i)) for i in xrange(30)]
+        for i, key in enumerate(keys):
+            cache.put(key, "x" * 1000)
+            os.utime(cache._path(key), (i, i)) # least recently used first
+        cache.maxBytes = 10000
+        cache.evict()
+        self.assertEqual([cache.get(key) is not None for key in keys], [False] * 21 + [True] * 9)
+        self.assertIsNone(cache.get(cache.key("tree", "missing")))
+
+    def test_evict_tmp(self):
+        cache = self.cache
+        cache.maxBytes = 0
+        cache.put(cache.key("tree", "a"), "x")
+        directory = os.path.dirname(cache._path(cache.key("tree", "a")))
+        writing, killed = [tempfile.mkstemp(dir=directory, prefix=".tmp")[1] for _ in xrange(2)]
+        os.utime(killed, (0, 0))
+        cache.evict()
+        self.assertEqual(os.listdir(directory), [os.path.basename(writing)]) # only the artifact is evicted
+
+        original = os.rename
+        def evicted(src, dst): # as if another process removed the temporary file of put
+            os.remove(src)
+            raise OSError(errno.ENOENT, "evicted")
+        os.rename = evicted
+        try:
+            with self.assertRaises(OSError) as raised:
+                cache.put(cache.key("tree", "b"), "x")
+            self.assertEqual(raised.exception.strerror, "evicted") # not the error of the cleanup
+        finally:
+            os.rename = original
@@ -144,6 +144,54 @@ class TestConverter(unittest.TestCase):
             except LarkError:
                 pass
 
+    def test_math_cached(self):
+        import benchmark.convert
+        convert = Converter()
+        re = convert.math(u"(a [b-c]*)")
+        self.assertIs(convert.math(u"(a [b-c]*)"), re)
+        self.assertIsNot(convert.math(u"(a [b-c]*)", cached=False), re)
+        pmre = convert.math(u"(a [b-c]*)", partialMatch=True)
+        self.assertIsNot(pmre, re)
+        self.assertEqual(str(pmre), str(convert.math(u"(a [b-c]*)", partialMatch=True, cached=False)))
+
+        for i in xrange(benchmark.convert.PARSE_CACHE_SIZE - 1):
+            convert.math(u"(a {0})".format(i % 10) + u"?" * (i // 10))
+        self.assertIs(convert.math(u"(a [b-c]*)", partialMatch=True), pmre) # most recently used
+        self.assertIsNot(convert.math(u"(a [b-c]*)"), re) # least recently used, so evicted
+
+    def test_math_parser(self):
+        lark = Converter(useLark=True)
+        exprs = [
+            u"((<ASTART> (a + [^0-9])*) (@any? + @epsilon))", u"(\\n (\\\\ \\())", u"((  )) + \\*)",
+            u"[]]", u"[a-]]", u"[\\]a-c-]", u"[^^]", u"([.+\\-0-9] <AEND>)", u"@an", u"(a* + b?*)",
+            u"(a +b)", u"[a-b-c]", u"[]", u"[z-a]", u"[z-a]x", u"(a b", u"a b", u"(\U0001f1e8\U0001f1e6 + b)",
+        ]
+        for expr in exprs:
+            results = []
+            for convert in [self.convert, lark]:
+                try:
+                    results.append(repr(convert.math(expr, cached=False)))
+                except LarkError:
+                    results.append(LarkError)
+                except BaseException as e:
+                    results.append(type(e))
+            self.assertEqual(results[0], results[1], expr)
+
+    def test_prog_parser(self):
+        # the trees of prog_parser.py are the ones of the expressions formatted by benchmark/parse.js
+        exprs = [
+            (r"[.+\-\w]+", u"([.+\\-0-9A-Za-z_] [.+\\-0-9A-Za-z_]*)"), (r"\^\\circ", u"(((((^ \\\\) c) i) r) c)"),
+            ("a{,1001}", u"a*"), ("a|b|c", u"((a + b) + c)"), ("(?<n>a)(?:b|c)*?", u"(a (b + c)*)"),
+            ("a\\tb\\f", u"(((a \\t) b) f)"), ("[\\t\\n\t]", u"[\\t\\nt]"), ("x\r\n", u"x"), ("//", u"(/ /)"),
+            (u"\\u00e9\\u{1F600}\\uD83D\\uDE00[\\d\\s]", u"(((é \U0001F600) \U0001F600) [0-9 ])"),
+        ]
+        convert = Converter(useProgParser=True)
+        for prog, fado in exprs:
+            self.assertEqual(repr(convert.prog(prog, partialMatch=False)), repr(self.convert.math(fado)), prog)
+
+        for prog in ["a{0}", "a|", "()", "[^]", "a{", "]", "\\-", "a**", "^*", "(?P<x>a)", "[\\w-z]", "\\u12"]:
+            self.assertRaises(FAdoizeError, convert.prog, prog)
+
     def test_anchor_noPartialMatch(self):
         exprs = [
             ("<ASTART>",                "<ASTART>"),
@@ -240,6 +288,18 @@ class TestFAdoize(unittest.TestCase):
     def test_forwardslash(self):
         self.assertEqual(Converter().FAdoize('//'), '(/ /)')
 
+    def test_many(self):
+        exprs = ['\\d', '', 'a(?=b)', '//', '\\\\w'] * 50
+        results = Converter().FAdoize_many(exprs, validate=True, processes=2)
+        self.assertEqual(len(results), len(exprs))
+        for expr, result in zip(exprs, results):
+            if isinstance(result, FAdoizeError):
+                self.assertRaises(FAdoizeError, self.f, expr)
+            else:
+                self.assertEqual(result, self.f(expr))
+        self.assertIsInstance(results[1], FAdoizeError)
+        self.assertEqual(results[3], '(/ /)')
+
     def test_escaping(self):
         self.assertEqual(self.f("\\(\\)"), "(\\( \\))")
         self.assertEqual(self.f("\\[\\]"), "(\\[ \\])")
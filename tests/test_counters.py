@@ -0,0 +1,66 @@
+import unittest
+
+from benchmark import counters
+from benchmark.convert import Converter
+from benchmark.fa_ext import InvariantNFA, CrossSectionEnumerator
+from benchmark import reex_ext
+from benchmark.reex_ext import uregexp, uatom
+
+class TestCounters(unittest.TestCase):
+    def setUp(self):
+        self.pmre = Converter().math(u"((a + b)* c)", partialMatch=True, cached=False)
+
+    def test_nfa(self):
+        nfa = self.pmre.toInvariantNFA("nfaPDO")
+        with counters.counting() as counts:
+            self.assertTrue(nfa.evalWordP(u"xabcx"))
+        self.assertEqual(counts["symbols"], 5)
+        self.assertGreaterEqual(counts["statesVisited"], 5)
+        self.assertGreaterEqual(counts["transitionsExamined"], counts["derivative"])
+        self.assertGreater(counts["derivative"], 0)
+        self.assertGreater(counts["epsilonClosures"], 0)
+        self.assertGreater(counts["setAllocations"], 0)
+
+    def test_pd(self):
+        for evalWordP in [self.pmre.evalWordP_PD, self.pmre.evalWordP_PD_Optimized]:
+            expected = [evalWordP(w) for w in [u"abc", u"ab", u""]]
+            with counters.counting() as counts: # bound before counting: counted all the same
+                self.assertEqual([evalWordP(w) for w in [u"abc", u"ab", u""]], expected)
+            self.assertEqual(counts["symbols"], 5)
+            self.assertEqual(counts["memoHits"] + counts["memoMisses"], counts["statesVisited"])
+            self.assertGreater(counts["memoMisses"], 0)
+            with counters.counting() as counts:
+                self.assertTrue(evalWordP(u"aaac")) # ((a + b)* c) is visited again on each a
+            self.assertGreater(counts["memoHits"], 0)
+
+    def test_backtrack(self):
+        with counters.counting() as counts:
+            self.assertTrue(self.pmre.evalWordP_Backtrack(u"abc"))
+            self.assertFalse(self.pmre.evalWordP_Backtrack(u"ab"))
+        self.assertGreater(counts["backtrackCalls"], 0)
+        self.assertGreater(counts["backtrackSteps"], 0)
+
+    def test_enumeration(self):
+        nfa = Converter().math(u"((a + b)* c)", cached=False).toInvariantNFA("nfaPD")
+        with counters.counting() as counts:
+            words = list(nfa.enumNFA().crossSection(2))
+        self.assertEqual(words, [u"ac", u"bc"])
+        self.assertGreater(counts["statesVisited"], 0)
+
+    def test_restored(self):
+        originals = [InvariantNFA.__dict__["evalSymbol"], uatom.__dict__["derivative"],
+            uregexp.__dict__["evalWordP_PD"], CrossSectionEnumerator.__dict__["_step"]]
+        with counters.counting() as outer:
+            with counters.counting() as inner:
+                uatom(u"a").derivative(u"a")
+            uatom(u"a").derivative(u"b")
+        self.assertEqual((outer["derivative"], inner["derivative"]), (1, 1))
+        self.assertEqual([InvariantNFA.__dict__["evalSymbol"], uatom.__dict__["derivative"],
+            uregexp.__dict__["evalWordP_PD"], CrossSectionEnumerator.__dict__["_step"]], originals)
+        self.assertNotIn("epsilonClosure", InvariantNFA.__dict__) # inherited from FAdo
+        self.assertIsNone(reex_ext._counts)
+        uatom(u"a").derivative(u"a")
+        self.assertEqual(outer["derivative"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import os
+import tempfile
+
+from benchmark.convert import Converter
+from benchmark.errors import NFAFormatError
+from benchmark import fa_binary
+
+class TestFABinary(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.convert = Converter()
+        cls.infa = lambda _, expr, method="nfaPD": cls.convert.math(expr).toInvariantNFA(method)
+
+    def test_roundtrip(self):
+        expr = u"((<ASTART> ([a-c] + b)*) + (@any + ([^a-c\u00e9] + \U0001F600)))"
+        for method in ["nfaPD", "nfaPDDAG", "nfaPDRPN", "nfaFollow", "nfaThompson"]:
+            for infa in [self.infa(expr, method), self.convert.math(expr).partialMatch().toInvariantNFA(method)]:
+                loaded = fa_binary.loads(fa_binary.dumps(infa))
+                self.assertEqual(loaded.States, range(len(infa.States)))
+                self.assertEqual((loaded.Initial, loaded.Final), (infa.Initial, infa.Final))
+                self.assertEqual(loaded.countTransitions(), infa.countTransitions())
+                self.assertTrue(loaded.equivalentP(infa), method)
+                self.assertTrue(loaded.evalWordP(u"\U0001F600"))
+                self.assertEqual(fa_binary.dumps(loaded), fa_binary.dumps(infa))
+
+    def test_view(self):
+        infa = self.infa(u"((a [b-d]*) + (a (b c)))", "nfaThompson")
+        data = fa_binary.dumps(infa)
+        view = fa_binary.NFAView(buffer(data))
+        self.assertEqual((view.nstates, view.ntrans), (len(infa.States), infa.countTransitions()))
+        self.assertEqual(set(view.initial()), infa.Initial)
+        self.assertEqual(set(view.final()), infa.Final)
+        for s in xrange(view.nstates):
+            self.assertEqual(view.finalP(s), s in infa.Final)
+            transitions = set((view.label(l), d) for l, d in view.transitions(s))
+            self.assertEqual(transitions, set((t, d) for t, ds in infa.delta.get(s, dict()).items() for d in ds))
+
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            fa_binary.dump(infa, path)
+            view = fa_binary.load(path)
+            self.assertEqual(view.ntrans, infa.countTransitions())
+            self.assertTrue(view.toInvariantNFA().evalWordP(u"abdc"))
+            view.data.close()
+        finally:
+            os.remove(path)
+
+    def test_errors(self):
+        data = fa_binary.dumps(self.infa(u"(a b)"))
+        self.assertTrue(fa_binary.binaryP(data))
+        self.assertFalse(fa_binary.binaryP("\x80\x02ccopy_reg"))
+        self.assertRaises(NFAFormatError, fa_binary.loads, data[:-4])
+        self.assertRaises(NFAFormatError, fa_binary.loads, data[:4] + "\x02" + data[5:])
@@ -1,8 +1,10 @@
 # coding: utf-8
 import unittest
+import random
 
 from benchmark.convert import Converter
-from benchmark.fa_ext import InvariantNFA
+from benchmark.fa_ext import InvariantNFA, LanguageStats, LazyDFA, SymbolClasses
+from benchmark.reex_ext import uatom, chars, dotany
 from benchmark.util import radixOrder
 
 class TestInvariantNFA(unittest.TestCase):
@@ -60,13 +62,38 @@ class TestInvariantNFA(unittest.TestCase):
         self.infa = lambda expr: self.convert.math(expr).toInvariantNFA("nfaPosition")
         self.runner()
 
+    def test_elimEpsilon(self):
+        for method in ["nfaFollow", "nfaThompson"]:
+            infa = self.convert.math(u"a?*").toInvariantNFA(method).elimEpsilon()
+            self.assertFalse(any("@epsilon" in trans for trans in infa.delta.values()), method)
+            self.assertTrue(infa.evalWordP(u"aaa"))
+            self.assertTrue(infa.evalWordP(u""))
+
     def runner(self):
         self.run_acyclicP()
+        self.run_dup()
         self.run_product()
+        self.run_disjointP()
+        self.run_equivalentP()
+        self.run_reduce()
         self.run_witness()
         self.run_ewp()
         self.run_membership()
 
+    def run_dup(self):
+        infa = self.infa(u"(([a-c] + @any) [^0-9]*)")
+        cpy = infa.dup()
+        self.assertIs(type(cpy), InvariantNFA)
+        self.assertEqual((cpy.States, cpy.Initial, cpy.Final, cpy.delta),
+            (infa.States, infa.Initial, infa.Final, infa.delta))
+
+        cpy.addFinal(cpy.addState())
+        for s in list(cpy.delta):
+            cpy.delta[s].clear()
+        self.assertNotEqual(len(cpy.States), len(infa.States))
+        self.assertTrue(infa.evalWordP(u"bxy"))
+        self.assertFalse(cpy.evalWordP(u"bxy"))
+
     def run_acyclicP(self):
         infa = self.infa(u"((0 (a + b)*) 0)")
         self.assertFalse(infa.acyclicP())
@@ -96,6 +123,67 @@ class TestInvariantNFA(unittest.TestCase):
         self.assertTrue(len4.evalWordP("001a"))
         self.assertFalse(prod.evalWordP("001a"))
 
+        # overlapping labels of both automata are merged by symbol class
+        prod = self.infa(u"(([^a-c] + [b-f]) ([^x] + x)*)").product(self.infa(u"([a-e] + @any)*"))
+        for w in [u"b", u"d", u"ex", u"zzz", u"Ωxa"]:
+            self.assertTrue(prod.evalWordP(w), w)
+        for w in [u"", u"a", u"ab"]:
+            self.assertFalse(prod.evalWordP(w), w)
+
+    def run_disjointP(self):
+        self.assertFalse(self.infa(u"(a + b)*").disjointP(self.infa(u"(b a)")))
+        self.assertFalse(self.infa(u"[^0-9]*").disjointP(self.infa(u"(@any a)")))
+        self.assertTrue(self.infa(u"[^0-9]").disjointP(self.infa(u"[3-5]")))
+        self.assertTrue(self.infa(u"(a a)*").disjointP(self.infa(u"(a (a a)*)")))
+        self.assertTrue(self.infa(u"(a + b)").disjointP(InvariantNFA.lengthNFA(2)))
+
+        # a nullable body under a star leaves epsilon self-loops (e.g., in nfaFollow) to eliminate
+        for expr in [u"a?*", u"(a + b?)*"]:
+            infa = self.infa(expr)
+            self.assertFalse(infa.disjointP(self.infa(u"(a a)")), expr)
+            self.assertTrue(infa.disjointP(self.infa(u"c")), expr)
+            self.assertTrue(infa.product(self.infa(u"(a a)")).evalWordP(u"aa"), expr)
+            self.assertTrue(self.infa(u"(a a)").includedP(infa), expr)
+
+    def run_equivalentP(self):
+        for expr in [u"((a + (a b)) + (b a))*", u"(((0 [^0]) + 1)* @any)", u"((\\+ + -) (√ ([0-9] [0-9]*)))",
+                u"a?*", u"(a + b?)*", u"(((a a) + a?)* + (c b*))"]: # nullable bodies under a star
+            for pm in (False, True):
+                re = self.convert.math(expr)
+                if pm:
+                    re = re.partialMatch()
+                infa = self.infa(str(re).decode("utf-8"))
+                for method in ["nfaThompson", "nfaPDDAG"]:
+                    self.assertTrue(infa.equivalentP(re.toInvariantNFA(method)), (expr, method, pm))
+
+        ab = self.infa(u"(a + b)*")
+        astarbstar = self.infa(u"(a* b*)")
+        self.assertTrue(astarbstar.includedP(ab))
+        self.assertFalse(ab.includedP(astarbstar))
+        self.assertEqual(ab.inclusionCounterexample(astarbstar), u"ba")
+        self.assertEqual(ab.equivalenceCounterexample(astarbstar), u"ba")
+        self.assertFalse(ab.equivalentP(astarbstar))
+
+        self.assertEqual(self.infa(u"@any").inclusionCounterexample(self.infa(u"[^a]")), u"a")
+        self.assertEqual(self.infa(u"[^a]").inclusionCounterexample(self.infa(u"[b-z]")), u" ")
+        self.assertEqual(self.infa(u"(a + @epsilon)").equivalenceCounterexample(self.infa(u"a")), u"")
+        self.assertTrue(self.infa(u"([^a-c] + [b-f])").equivalentP(self.infa(u"[^a]")))
+        self.assertEqual(self.infa(u"a?*").equivalenceCounterexample(self.infa(u"(a + b?)*")), u"b")
+        self.assertIsNone(self.infa(u"(a + b?)*").inclusionCounterexample(self.infa(u"(a + b)*")))
+
+    def run_reduce(self):
+        for expr in [u"((a + (a b)) + (b a))*", u"(((0 [^0]) + 1)* @any)", u"(([^a-c] + [b-f]) ([^x] + x)*)"]:
+            infa = self.infa(expr)
+            reduced = infa.dup()
+            report = reduced.reduce()
+            self.assertEqual([stage for stage, _, _ in report],
+                ["construction", "trim", "mergeParallelLabels", "mergeSimilarStates"])
+            self.assertEqual(report[0][1:], (len(infa.States), infa.countTransitions()))
+            self.assertEqual(report[-1][1:], (len(reduced.States), reduced.countTransitions()))
+            for (_, n0, t0), (_, n1, t1) in zip(report, report[1:]):
+                self.assertLessEqual((n1, t1), (n0, t0))
+            self.assertTrue(infa.equivalentP(reduced), expr)
+
     def run_witness(self):
         def _f(expr):
             infa = self.infa(expr)
@@ -196,6 +284,7 @@ class TestEnumInvariantNFA(unittest.TestCase):
         self.run_minWord_None()
         self.run_nextWord()
         self.run_enumCrossSection()
+        self.run_crossSection()
         self.run_enum()
         self.run_randomWord()
         self.run_wordlen()
@@ -207,6 +296,14 @@ class TestEnumInvariantNFA(unittest.TestCase):
         self.assertEqual(self.infaEnum("((a b) c)")[1].minWord(4), None)
         self.assertEqual(self.infaEnum("((a b) c)?")[1].minWord(0), "")
 
+    def test_minWord_start(self):
+        enum = self.construct("((a b) c)?", "nfaFollow", False)[1]
+        nfa = enum._sized(3)
+        _, states = nfa.minTransition(next(iter(nfa.Initial)))
+        self.assertEqual([enum.minWord(3, s) for s in states], [u"bc"]) # the rest of the word
+        final = next(iter(enum._sized(0).Final))
+        self.assertEqual((enum.minWord(0), enum.minWord(0, final)), (u"", u""))
+
     def run_minWord_None(self):
         self.assertEqual(self.infaEnum("(a + b)*")[1].minWord(None), "")
         self.assertEqual(self.infaEnum("[a-fbcdef]*")[1].minWord(None), "")
@@ -234,6 +331,25 @@ class TestEnumInvariantNFA(unittest.TestCase):
         self.assertEqual(len(lang), sum(2**x for x in xrange(0, 6)))
         self.verifyRadix(lang)
 
+    def run_crossSection(self):
+        infa, enum = self.infaEnum("((a + (a b)) + (b a))*")
+        enumerator = enum.crossSection(6)
+        lang = list(enumerator)
+        self.assertEqual(len(lang), 28)
+        self.verifyRadix(lang)
+        for w in lang:
+            self.assertTrue(infa.evalWordP(w))
+        self.assertIsNone(next(enumerator, None))
+
+        enumerator = enum.crossSection(6)
+        enumerator.seek(lang[10])
+        self.assertEqual(list(enumerator), lang[11:])
+
+        enumerator = enum.crossSection(2)
+        enumerator.seek(u"bb") # not a prefix of any word
+        self.assertEqual(list(enumerator), [])
+        self.assertEqual(list(enum.crossSection(0)), [u""])
+
     def run_enum(self):
         _, enum = self.infaEnum(u"((a + α) (b + β))*")
         lang = list(enum.enum(50))
@@ -258,6 +374,184 @@ class TestEnumInvariantNFA(unittest.TestCase):
         self.assertEqual(enum.shortestWordLength(11), 11)
         self.assertEqual(enum.longestWordLength(), 30)
 
+class TestReduction(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.convert = Converter()
+
+    def test_mergeParallelLabels(self):
+        nfa = InvariantNFA()
+        nfa.addInitial(nfa.addState())
+        nfa.addFinal(nfa.addState())
+        nfa.addTransition(0, uatom(u"a"), 1)
+        nfa.addTransition(0, uatom(u"b"), 1)
+        nfa.addTransition(0, chars([(u"c", u"f")]), 1)
+        nfa.addTransition(0, chars([u"x"], neg=True), 0)
+        nfa.addTransition(0, uatom(u"x"), 0)
+        nfa.mergeParallelLabels()
+        self.assertEqual(nfa.delta[0], {chars([(u"a", u"f")]): set([1]), dotany(): set([0])})
+        self.assertEqual(SymbolClasses.runs([0, 1, 2, 5, 7, 8]), ((0, 2), (5, 5), (7, 8)))
+        self.assertEqual(SymbolClasses.runs([]), ())
+
+    def test_mergeSimilarStates(self):
+        # (a b + a c)* b is recognized by 2 states once the states after each `a` are merged
+        nfa = self.convert.math(u"((a (b + c)) + (a (c + b)))*").toInvariantNFA("nfaPosition")
+        reduced = nfa.dup().mergeSimilarStates()
+        self.assertLess(len(reduced.States), len(nfa.States))
+        self.assertTrue(nfa.equivalentP(reduced))
+
+        # forward: b and c (both final), backward: both a's (reached from the initial state)
+        nfa = self.convert.math(u"((a b) + (a c))").toInvariantNFA("nfaPosition")
+        self.assertEqual(len(nfa.States), 5)
+        reduced = nfa.dup().mergeSimilarStates()
+        self.assertEqual(len(reduced.States), 3)
+        self.assertTrue(nfa.equivalentP(reduced))
+
+    def test_optimize(self):
+        expr = u"((<ASTART> ([a-c] + b)*) + (@any + ([a-c] + b))*)"
+        for method in ["nfaPD", "nfaPDDAG", "nfaPosition", "nfaFollow", "nfaGlushkov", "nfaThompson"]:
+            infa = self.convert.math(expr).toInvariantNFA(method)
+            optimized = self.convert.math(expr).toInvariantNFA(method, optimize=True)
+            self.assertLessEqual(len(optimized.States), len(infa.States))
+            self.assertTrue(optimized.equivalentP(infa), method)
+
+    def test_compact(self):
+        expr = u"((a [b-d]*) + (a (b c)))"
+        for method in ["nfaPDRPN", "nfaPDDAG", "nfaThompson"]:
+            infa = self.convert.math(expr).toInvariantNFA(method)
+            cpy = infa.dup()
+            names = cpy.compact()
+            self.assertEqual(names, infa.States)
+            self.assertEqual(cpy.States, range(len(infa.States)))
+            self.assertTrue(cpy.equivalentP(infa), method)
+            self.assertTrue(cpy.evalWordP(u"abdc"))
+            self.assertFalse(cpy.evalWordP(u"aba"))
+
+class TestLanguageStats(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.convert = Converter()
+        cls.stats = lambda _, expr, method="nfaPD": LanguageStats(
+            cls.convert.math(expr).toInvariantNFA(method))
+
+    def test_lengths(self):
+        for method in ["nfaPD", "nfaThompson", "nfaGlushkov", "nfaFollow"]:
+            stats = self.stats(u"((x (x x)) + ((y y) (y y?)))", method)
+            self.assertEqual((stats.shortest, stats.longest), (3, 4), method)
+            self.assertTrue(stats.finite())
+            self.assertFalse(stats.ewp())
+
+            stats = self.stats(u"((a (b + c)) + (a (b c)*))", method)
+            self.assertEqual((stats.shortest, stats.longest), (1, float("inf")), method)
+            self.assertFalse(stats.finite())
+
+            stats = self.stats(u"(a + @epsilon)", method)
+            self.assertEqual((stats.shortest, stats.longest), (0, 1), method)
+            self.assertTrue(stats.ewp())
+
+        stats = LanguageStats(InvariantNFA.lengthNFA(3, 5))
+        self.assertEqual((stats.shortest, stats.longest), (3, 5))
+        self.assertEqual([stats.rejectsLength(n) for n in xrange(7)],
+            [True, True, True, False, False, False, True])
+
+    def test_states(self):
+        nfa = InvariantNFA()
+        for i in xrange(5):
+            nfa.addState(i)
+        nfa.addInitial(0)
+        nfa.addFinal(2)
+        nfa.addTransition(0, u"a", 1)
+        nfa.addTransition(1, u"b", 0)
+        nfa.addTransition(1, u"c", 2)
+        nfa.addTransition(0, u"d", 3) # 3 is a dead end
+        nfa.addTransition(4, u"e", 2) # 4 is not accessible
+
+        stats = LanguageStats(nfa)
+        self.assertEqual(stats.accessible, set([0, 1, 2, 3]))
+        self.assertEqual(stats.coaccessible, set([0, 1, 2, 4]))
+        self.assertEqual(stats.shortestTo, {0: 2, 1: 1, 2: 0, 4: 1})
+        self.assertEqual(stats.longestTo[4], 1)
+        self.assertEqual(stats.longestTo[0], float("inf"))
+        self.assertEqual(sorted(map(sorted, stats.sccs)), [[0, 1], [2], [3], [4]])
+        self.assertEqual((stats.shortest, stats.longest), (2, float("inf")))
+
+        nfa.delFinal(2)
+        stats = LanguageStats(nfa)
+        self.assertTrue(stats.empty())
+        self.assertTrue(stats.rejectsLength(0))
+
+    def test_enum(self):
+        enum = self.convert.math(u"((x (x x)) + ((y y) (y y?)))").toInvariantNFA("nfaPD").enumNFA()
+        self.assertEqual(enum.shortestWordLength(), 3)
+        self.assertEqual(enum.shortestWordLength(4), 4)
+        self.assertIsNone(enum.shortestWordLength(5))
+        self.assertEqual(enum.longestWordLength(), 4)
+        self.assertEqual(list(enum.enum(10)), [u"xxx", u"yyy", u"yyyy"])
+        self.assertEqual(list(enum.crossSection(7)), [])
+        self.assertIsNone(enum.minWord(2))
+        self.assertEqual(enum.sampler().count(5), 0)
+
+        enum = self.convert.math(u"(a (b b)*)").toInvariantNFA("nfaPD").enumNFA()
+        self.assertEqual(enum.shortestWordLength(2), 3)
+        self.assertEqual(enum.shortestWordLength(4), 5)
+
+class TestWordSampler(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.convert = Converter()
+        cls.sampler = lambda _, expr: cls.convert.math(expr).toInvariantNFA("nfaPD").enumNFA().sampler()
+
+    def test_count(self):
+        fib = self.sampler(u"(a + (a b))*")
+        self.assertEqual([fib.count(n) for n in xrange(8)], [1, 1, 2, 3, 5, 8, 13, 21])
+
+        classes = self.sampler(u"((\\+ + -) (√ ([0-9] [0-9]*)))")
+        self.assertEqual([classes.count(n) for n in xrange(6)], [0, 0, 0, 20, 200, 2000])
+
+        # ambiguous: each word of (a + a)* has 2^n accepting paths, but is counted once
+        self.assertEqual(self.sampler(u"(a + a)*").count(10), 1)
+
+    def test_word(self):
+        infa = self.convert.math(u"(((0 [^0]) + 1)* @any)").toInvariantNFA("nfaPD")
+        sampler = infa.enumNFA().sampler()
+        self.assertIsNone(sampler.word(0))
+        for length in xrange(1, 20):
+            word = sampler.word(length)
+            self.assertEqual(len(word), length)
+            self.assertTrue(infa.evalWordP(word), word.encode("utf-8"))
+
+    def test_uniform(self):
+        sampler = self.sampler(u"(a + (a b))*")
+        counts = dict()
+        for word in sampler.sample(3, 6000, random.Random(1)):
+            counts[word] = counts.get(word, 0) + 1
+        self.assertEqual(set(counts), set([u"aaa", u"aab", u"aba"]))
+        for n in counts.values():
+            self.assertTrue(1700 < n < 2300, counts)
+
+    def test_sample_distinct(self):
+        sampler = self.sampler(u"(0 + 1)*")
+        words = sampler.sample(4, 100, random.Random(1), distinct=True)
+        self.assertEqual(len(words), 16)
+        self.assertEqual(len(set(words)), 16)
+
+class TestLazyDFA(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.convert = Converter()
+
+    def test_evalWordP(self):
+        r = random.Random(1)
+        alphabet = u"ab01~\u00e9 "
+        words = [u""] + [u"".join(r.choice(alphabet) for _ in xrange(r.randint(1, 6))) for _ in xrange(400)]
+        for expr in [u"((a + (a b))* [^0-9])", u"((<ASTART> a*) + (@any (0 + 1)))", u"(\u00e9 + @epsilon)*"]:
+            for method in ["nfaPDDAG", "nfaThompson"]: # nfaThompson has epsilon transitions
+                nfa = self.convert.math(expr, partialMatch=True).toInvariantNFA(method)
+                dfa = LazyDFA(nfa)
+                expected = [nfa.evalWordP(word) for word in words]
+                self.assertEqual([dfa.evalWordP(word) for word in words], expected, expr)
+                self.assertEqual(LazyDFA(nfa).evalWordsP(words), expected, expr)
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
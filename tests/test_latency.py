@@ -0,0 +1,44 @@
+import unittest
+
+from benchmark.latency import Histogram, clock, PRECISION
+
+class TestHistogram(unittest.TestCase):
+    def test_percentile(self):
+        h = Histogram([i * 1e-3 for i in xrange(1, 101)]) # 1ms to 100ms
+        self.assertEqual(h.n, 100)
+        self.assertAlmostEqual(h.max, 0.1)
+        for p, exact in [(50, 0.05), (95, 0.095), (99, 0.099), (100, 0.1)]:
+            self.assertGreaterEqual(h.percentile(p), exact * (1 - 1e-9))
+            self.assertLessEqual(h.percentile(p), exact * (1 + PRECISION))
+        self.assertAlmostEqual(h.summary()[-1], 0.1)
+
+    def test_empty(self):
+        self.assertEqual(Histogram().summary(), [None, None, None, None])
+
+    def test_tiny(self):
+        h = Histogram([0.0, 1e-9])
+        self.assertEqual(h.counts.keys(), [0])
+        self.assertEqual(h.percentile(100), 1e-9)
+
+    def test_merge(self):
+        latencies = [i * 1e-4 for i in xrange(1, 51)]
+        merged = Histogram(latencies[:20]).merge(Histogram(latencies[20:]))
+        whole = Histogram(latencies)
+        self.assertEqual(merged.counts, whole.counts)
+        self.assertEqual(merged.n, whole.n)
+        self.assertAlmostEqual(merged.total, whole.total)
+        self.assertEqual(merged.summary(), whole.summary())
+
+    def test_dumps(self):
+        h = Histogram([1e-5, 2e-3, 2e-3, 0.5])
+        loaded = Histogram.loads(buffer(h.dumps()))
+        self.assertEqual((loaded.counts, loaded.n, loaded.total, loaded.max), (h.counts, h.n, h.total, h.max))
+
+class TestClock(unittest.TestCase):
+    def test_monotonic(self):
+        times = [clock() for _ in xrange(1000)]
+        self.assertEqual(times, sorted(times))
+        self.assertGreater(times[-1], times[0])
+
+if __name__ == "__main__":
+    unittest.main()
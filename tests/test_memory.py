@@ -0,0 +1,56 @@
+import unittest
+import sys
+import time
+
+from benchmark import memory
+
+class _Node(object):
+    def __init__(self, children):
+        self.children = children
+
+class _Slotted(object):
+    __slots__ = ("value",)
+    def __init__(self, value):
+        self.value = value
+
+class TestMemory(unittest.TestCase):
+    def test_deepSizeof(self):
+        leaf = _Node([])
+        shared = [1.5] * 3
+        tree = _Node([leaf, leaf, _Node(shared), shared])
+        self.assertEqual(memory.deepSizeof(leaf), sys.getsizeof(leaf) + sys.getsizeof(leaf.__dict__)
+            + sys.getsizeof("children") + sys.getsizeof([]))
+        self.assertGreater(memory.deepSizeof(tree), memory.deepSizeof(leaf) + memory.deepSizeof(shared))
+        self.assertEqual(memory.deepSizeof(shared), sys.getsizeof(shared) + sys.getsizeof(1.5)) # once each
+
+        big = _Slotted(range(10000))
+        self.assertGreater(memory.deepSizeof(big), sys.getsizeof(big.value))
+        self.assertEqual(memory.deepSizeof({"f": len, "m": unittest}), sys.getsizeof({"f": len, "m": unittest})
+            + sys.getsizeof("f") + sys.getsizeof("m")) # functions and modules are shared
+
+    def _allocate(self):
+        with memory.PeakMemory() as peak:
+            data = bytearray(64 * 1024 * 1024)
+            data[::4096] = b"x" * len(data[::4096]) # the pages are resident
+            time.sleep(0.05)
+            del data
+        self.assertGreater(peak.bytes, 60 * 1024 * 1024)
+        self.assertLess(peak.bytes, 128 * 1024 * 1024)
+
+        with memory.PeakMemory() as peak:
+            pass
+        self.assertLess(peak.bytes, 4 * 1024 * 1024)
+
+    def test_PeakMemory(self):
+        self._allocate()
+
+    def test_PeakMemory_sampled(self): # without /proc/self/clear_refs
+        resetPeak = memory._resetPeak
+        memory._resetPeak = lambda: False
+        try:
+            self._allocate()
+        finally:
+            memory._resetPeak = resetPeak
+
+if __name__ == "__main__":
+    unittest.main()
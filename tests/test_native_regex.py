@@ -0,0 +1,47 @@
+# coding: utf-8
+import unittest
+import random
+
+from benchmark.convert import Converter
+from benchmark.errors import EvalTimeoutError
+from benchmark import native_regex
+
+class TestNativeRegex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.convert = Converter()
+
+    def test_pattern(self):
+        exprs = [
+            (u"((a* (0 + 1)) <AEND>)",          u"a*(?:0|1)\\Z"),
+            (u"(<ASTART> (@epsilon + a)*)",     u"\\A(?:|a)*"),
+            (u"((\\( \\)) [^\\]\\-\\^ ])",      u"\\(\\)[^\\ \\-\\]\\^]"),
+            (u"(@any (. [a-cé]?))",             u".\\.[a-cé]?"),
+        ]
+        for expr, pattern in exprs:
+            self.assertEqual(native_regex.pattern(self.convert.math(expr)), pattern)
+
+    def test_partialMatch(self):
+        exprs = [
+            u"((<ASTART> ([a-c] + b)*) + (@any + ([^a-cé] + \U0001F600)))", u"((a* (0 + 1)) <AEND>)",
+            u"((<ASTART> a*) <AEND>)", u"(<ASTART> + b)*", u"(\\n (\\t  ))", u"((a (b + @epsilon)) <AEND>)",
+        ]
+        r = random.Random(1)
+        alphabet = u"abc01é\U0001F600 \n\t"
+        words = [u""] + [u"".join(r.choice(alphabet) for _ in xrange(r.randint(1, 5))) for _ in xrange(500)]
+        for expr in exprs:
+            nfa = self.convert.math(expr, partialMatch=True).toInvariantNFA("nfaPD")
+            for method in native_regex.METHODS:
+                evalWordP = native_regex.evalWordMethod(self.convert.math(expr), method, 1.0)
+                for word in words:
+                    self.assertEqual(evalWordP(word), nfa.evalWordP(word), method + " " + repr(word))
+
+    def test_timeout(self):
+        re = self.convert.math(u"(((a + (a a)) (a + (a a))*) c)")
+        for method in native_regex.METHODS:
+            evalWordP = native_regex.evalWordMethod(re, method, 0.05)
+            self.assertRaises(EvalTimeoutError, evalWordP, u"a" * 80)
+            self.assertTrue(evalWordP(u"aac"))
+
+if __name__ == "__main__":
+    unittest.main()
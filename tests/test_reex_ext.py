@@ -93,6 +93,9 @@ class TestChars(unittest.TestCase):
         self.assertEqual(self.posHex.next(), u"0")
         self.assertEqual(self.posHex.next(u"9"), u"a")
         self.assertEqual(self.posHex.next(u"f"), None)
+        self.assertEqual(self.posHex.next(u"!"), u"0")
+        self.assertEqual(self.posHex.next(u"Z"), u"a")
+        self.assertEqual(self.posHex.next(u"z"), None)
 
         self.assertEqual(self.negHex.next(), u" ")
         self.assertEqual(self.negHex.next(u"$"), u"%")
@@ -0,0 +1,92 @@
+import unittest
+import time
+
+from benchmark.scheduler import Scheduler
+from benchmark.errors import AnchorError
+
+class _DB(object):
+    def __init__(self, lengths):
+        self.lengths = lengths
+
+    def selectall(self, query, *args):
+        if "out_tests" in query:
+            return [("slow", 1.0)]
+        return [(re_math.encode("utf-8"), length) for re_math, length in self.lengths.items()]
+
+class _Benchmarker(object):
+    """Times nothing: "slow" sleeps, "fails" raises and "dies" exits the worker"""
+    def __init__(self, lengths=None):
+        self.latency = True
+        self.db = _DB(lengths or dict())
+        self.saved = dict()
+        self.finished = []
+        self.failed = dict()
+        self.saves = 0
+        self.savedWords = []
+        self.latencies = []
+
+    def words(self, re_math):
+        return [u"a"] * len(re_math), [u"b"]
+
+    def wordsHash(self, re_math):
+        return "hash of " + re_math
+
+    def unsavedWords(self, re_math):
+        return (re_math, 1)
+
+    def forgetWords(self):
+        pass
+
+    def latencyRows(self, re_math, method, histograms):
+        return [(re_math, method, True, "histogram")]
+
+    def measure(self, re_math, method, latencies=None):
+        if method == "slow":
+            time.sleep(5)
+        elif method == "fails":
+            raise AnchorError(re_math, "not allowed")
+        elif method == "dies":
+            raise SystemExit(3)
+        return (0.1, 0.2, 0.3)
+
+    def save(self, finished, failed=[], countIteration=True, words=[], latencies=[]):
+        self.saves += 1
+        self.latencies.extend(latencies)
+        self.savedWords.extend(words)
+        for re_math, wordsHash, n_evalA, n_evalR, results in finished:
+            for method, times in results:
+                self.saved[(re_math, method)] = (wordsHash, n_evalA, n_evalR, times)
+            self.finished.append(re_math)
+        for re_math, error in failed:
+            self.failed[re_math] = error
+
+class TestScheduler(unittest.TestCase):
+    def test_run(self):
+        todo = {u"a": ["x", "y"], u"bb": ["x", "fails", "y"], u"ccc": ["dies", "x"], u"dddd": ["y", "slow"]}
+        parent = _Benchmarker(dict((re_math, len(re_math)) for re_math in todo))
+        scheduler = Scheduler(_Benchmarker, 2, taskTimeout=0.5, minFree=0)
+        try:
+            self.assertEqual(scheduler.run(parent, todo), 1)
+        finally:
+            scheduler.close()
+
+        self.assertEqual(parent.saves, 1) # the results of every expression are saved in one batch
+        self.assertEqual(parent.finished, [u"a"])
+        self.assertEqual(sorted(parent.failed), [u"bb", u"ccc", u"dddd"])
+        self.assertIn("not allowed", parent.failed[u"bb"])
+        self.assertIn("exit code 3", parent.failed[u"ccc"])
+        self.assertIn("timed out", parent.failed[u"dddd"])
+        self.assertEqual(sorted(parent.saved), [(u"a", "x"), (u"a", "y")]) # not of the failed expressions
+        self.assertEqual(parent.saved[(u"a", "x")], ("hash of a", 1, 1, (0.1, 0.2, 0.3)))
+        self.assertIn((u"bb", 1), parent.savedWords) # generated words are saved with the failed expressions
+        self.assertEqual(sorted(parent.latencies), [(u"a", "x", True, "histogram"), (u"a", "y", True, "histogram")])
+
+    def test_predict(self):
+        scheduler = Scheduler(_Benchmarker, 0)
+        scheduler.weights = {"slow": 1.0}
+        self.assertAlmostEqual(scheduler.predict(10, ["slow", "other"]), 10.1)
+        scheduler._learn(10, "slow", 20.0)
+        self.assertAlmostEqual(scheduler.weights["slow"], 1.1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from benchmark import spans
+from benchmark.convert import Converter
+
+class TestSpans(unittest.TestCase):
+    def test_disabled(self):
+        self.assertFalse(spans.enabled())
+        with spans.span("a") as span:
+            spans.count("n")
+        self.assertIsNone(span)
+
+    def test_nested(self):
+        with spans.recording() as root:
+            self.assertTrue(spans.enabled())
+            for i in xrange(3):
+                with spans.span("a"):
+                    with spans.span("b"):
+                        spans.count("n", 2)
+            with spans.span("c"):
+                pass
+        self.assertFalse(spans.enabled())
+        rows = root.rows()
+        self.assertEqual([(phase, calls) for phase, _, calls in rows],
+            [("a", 3), ("a/b", 3), ("a/b:n", 6), ("c", 1)])
+        self.assertIsNone(rows[2][1])
+        self.assertGreaterEqual(rows[0][1], rows[1][1])
+
+    def test_resume(self):
+        root = spans.Span("")
+        for _ in xrange(2):
+            with spans.recording(root):
+                with spans.recording() as inner: # recorded on its own
+                    with spans.span("inner"):
+                        pass
+                with spans.span("outer"):
+                    pass
+        self.assertEqual([(phase, calls) for phase, _, calls in root.rows()], [("outer", 2)])
+        self.assertEqual([(phase, calls) for phase, _, calls in inner.rows()], [("inner", 1)])
+
+    def test_exception(self):
+        with spans.recording() as root:
+            with self.assertRaises(ValueError):
+                with spans.span("a"):
+                    raise ValueError()
+            with spans.span("b"):
+                pass
+        self.assertEqual([phase for phase, _, _ in root.rows()], ["a", "b"])
+
+    def test_constructions(self):
+        convert = Converter()
+        with spans.recording() as root:
+            pmre = convert.math(u"((a + b)* c)", partialMatch=True, cached=False)
+            pmre.toInvariantNFA("nfaPDRPN")
+            pmre.toInvariantNFA("nfaPDDAG", optimize=True)
+        phases = [phase for phase, _, _ in root.rows()]
+        for phase in ["parse", "partialMatch", "toInvariantNFA", "toInvariantNFA/construct",
+                "toInvariantNFA/construct/compress", "toInvariantNFA/construct/derivatives",
+                "toInvariantNFA/construct/dag", "toInvariantNFA/construct/NFA", "toInvariantNFA/wrap",
+                "toInvariantNFA/trim", "toInvariantNFA:states"]:
+            self.assertIn(phase, phases)
+        calls = dict((phase, calls) for phase, _, calls in root.rows())
+        self.assertEqual(calls["toInvariantNFA"], 2)
+        self.assertEqual(calls["toInvariantNFA/trim"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
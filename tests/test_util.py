@@ -1,6 +1,14 @@
 import unittest
+import os
+import random
+import shutil
+import tempfile
+import signal
+import time
+import multiprocessing
 
-from benchmark.util import RangeList, WeightedRandomItem, Deque
+from benchmark.util import RangeList, WeightedRandomItem, Deque, DBWrapper, BottomK, timeLimited, stopAfter
+from benchmark.errors import EvalTimeoutError
 
 class TestRangeList(unittest.TestCase):
     @classmethod
@@ -266,6 +274,108 @@ class TestDeque(unittest.TestCase):
             self.assertEqual(d.pop_left(), l[0])
             l = l[1:]
 
+class TestBottomK(unittest.TestCase):
+    def test_add(self):
+        sample = BottomK(10)
+        for i in xrange(5):
+            sample.add(str(i))
+        self.assertEqual(sorted(sample.items), list("01234"))
+        for i in xrange(5, 1000):
+            sample.add(str(i))
+        self.assertEqual(len(sample), 10)
+        self.assertEqual(sample.seen, 1000)
+
+        again = BottomK(10)
+        for i in reversed(xrange(1000)): # the order does not matter
+            again.add(unicode(i))
+        self.assertEqual(again.items, sample.items)
+        self.assertNotEqual(BottomK(10, "seed").items, sample.items)
+
+    def test_uniform(self):
+        counts = [0] * 10
+        for seed in xrange(3000):
+            sample = BottomK(3, str(seed))
+            for i in xrange(10):
+                sample.add(str(i))
+            for i in sample.items:
+                counts[int(i)] += 1
+        for n in counts:
+            self.assertTrue(800 < n < 1000, counts)
+
+    def test_repeated(self):
+        inSample = 0
+        for seed in xrange(2000):
+            sample = BottomK(2, str(seed))
+            for word in list(u"abcd") + [u"a"] * 6: # "a" was a mutation of many words
+                sample.add(word)
+            self.assertEqual(len(set(sample.items)), 2)
+            inSample += u"a" in sample.items
+        self.assertTrue(900 < inSample < 1100, inSample) # as likely as each of b, c and d: 2 / 4
+
+class TestDBWrapper(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db = DBWrapper(os.path.join(self.directory, "database.db"))
+        self.db.useWAL()
+        self.db.execute("CREATE TABLE t (a INTEGER PRIMARY KEY, b TEXT);")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_transaction(self):
+        commits = self.db.commits
+        with self.db.transaction():
+            self.db.executemany("INSERT INTO t (a, b) VALUES (?, ?);", [(1, "x"), (2, "y")])
+            with self.db.transaction():
+                self.db.execute("UPDATE t SET b='z' WHERE a=2;")
+        self.assertEqual(self.db.commits, commits + 1)
+        self.assertEqual(self.db.selectall("SELECT a, b FROM t ORDER BY a;"), [(1, "x"), (2, "z")])
+
+        with self.assertRaises(ValueError): # nothing is saved
+            with self.db.transaction():
+                self.db.execute("DELETE FROM t WHERE a=1;")
+                raise ValueError()
+        self.assertEqual(self.db.commits, commits + 1)
+        self.assertEqual(self.db.selectall("SELECT a, b FROM t ORDER BY a;"), [(1, "x"), (2, "z")])
+        self.db.checkpoint()
+
+def _spin():
+    while True:
+        pass
+
+class TestTimeouts(unittest.TestCase):
+    def test_timeLimited(self):
+        def backtrack(n): # exponential, like evalWordP_Backtrack on (a + a)*
+            return n > 0 and (backtrack(n - 1) or backtrack(n - 1))
+        ftn = timeLimited(backtrack, 0.05)
+        t = time.time()
+        self.assertRaises(EvalTimeoutError, ftn, 40)
+        self.assertLess(time.time() - t, 1)
+        self.assertFalse(ftn(3)) # the alarm is cleared after each call
+        time.sleep(0.1)
+
+    def test_timeLimited_many(self):
+        def spin(n):
+            while True:
+                pass
+        first = timeLimited(spin, 0.05)
+        second = timeLimited(lambda n: n, 5) # does not replace the handler of first
+        self.assertEqual(second(1), 1)
+        with self.assertRaises(EvalTimeoutError) as raised:
+            first(0)
+        self.assertEqual(raised.exception.timeout, 0.05)
+        self.assertIs(signal.getsignal(signal.SIGALRM), signal.SIG_DFL) # restored after each call
+
+    def test_stopAfter(self):
+        proc = multiprocessing.Process(target=_spin)
+        proc.start()
+        self.assertFalse(stopAfter(proc, 0.1))
+        self.assertFalse(proc.is_alive())
+
+        proc = multiprocessing.Process(target=time.sleep, args=(0,))
+        proc.start()
+        self.assertTrue(stopAfter(proc, 5))
+
 
 
 
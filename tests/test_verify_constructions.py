@@ -0,0 +1,29 @@
+import unittest
+
+from benchmark import verify_constructions
+from benchmark.convert import Converter
+
+class TestVerifyConstructions(unittest.TestCase):
+    def setUp(self):
+        verify_constructions._converter = Converter()
+
+    def tearDown(self):
+        verify_constructions._converter = None
+        verify_constructions.MAX_TIME_PER_EXPRESSION = 120
+
+    def test_verify_one(self):
+        re_math, results = verify_constructions._verify_one(("a?*", ["nfaFollow", "nfaThompson"]))
+        self.assertEqual(re_math, "a?*")
+        self.assertEqual(results, [("nfaFollow", False, None, ""), ("nfaFollow", True, None, "")])
+
+    def test_timeout(self):
+        verify_constructions.MAX_TIME_PER_EXPRESSION = 0.05
+        expression = "(a + b)*"
+        for _ in xrange(11):
+            expression = "(" + expression + " (a + b)*)"
+        _, results = verify_constructions._verify_one((expression, ["nfaPD", "nfaPosition"] * 200))
+        self.assertEqual(results[-1], ("nfaThompson", False, None, "timeout"))
+        self.assertTrue(all(error == "" for _, _, _, error in results[:-1]))
+
+if __name__ == "__main__":
+    unittest.main()